@@ -0,0 +1,85 @@
+"""Checkpoints of a running algorithm-g, so long CM runs can resume after being interrupted"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from hm01.cluster_tree import ClusterRecord
+from hm01.context import context
+from hm01.graph import IntangibleSubgraph
+
+
+@dataclass
+class Checkpoint:
+    """ A consistent snapshot of algorithm-g
+
+    Every finished task is fully contained in `records` and `labels`, and every task that was queued
+    or running is in `pending`, so resuming reruns exactly the unfinished work.
+
+    params (dict)               : the CM parameters of the run, checked on resume
+    roots (list[str])           : labels of the input clusters, in input order
+    records (list[ClusterRecord]): records of all finished clusters
+    labels (dict[int, str])     : final cluster label of every finished node
+    pending (list)              : (cluster, record) pairs of the unfinished tasks
+    """
+    params: Dict
+    roots: List[str]
+    records: List[ClusterRecord]
+    labels: Dict[int, str]
+    pending: List[Tuple[IntangibleSubgraph, ClusterRecord]]
+
+    @staticmethod
+    def namespace(params: Dict) -> str:
+        """ The prefix of the checkpoint files of a run with these parameters """
+        digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return f"checkpoint-{digest[:10]}-"
+
+    def save(self, seq: int) -> str:
+        """ Write the checkpoint to the working directory and drop the older ones of the same parameters """
+        prefix = Checkpoint.namespace(self.params)
+        path = context.request_subpath(f"{prefix}{seq}.pkl")
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)         # never leave a half-written checkpoint behind
+        for i in range(seq):
+            old = context.request_subpath(f"{prefix}{i}.pkl")
+            if os.path.exists(old):
+                os.remove(old)
+        return path
+
+    @staticmethod
+    def latest_path(params: Dict) -> Optional[str]:
+        """ The latest checkpoint in the working directory written with these parameters, if any """
+        return context.find_latest_checkpoint(Checkpoint.namespace(params))
+
+    @staticmethod
+    def load_latest(params: Dict) -> Optional[Checkpoint]:
+        """ Load the latest checkpoint in the working directory written with these parameters, if any
+
+        Checkpoints of runs with other parameters, e.g. the other parameter sets of a sweep on the same
+        network, are in other namespaces and left alone.
+        """
+        path = Checkpoint.latest_path(params)
+        if path is None:
+            return None
+        with open(path, "rb") as f:
+            checkpoint: Checkpoint = pickle.load(f)
+        if checkpoint.params != params:
+            return None                         # a collision of the namespace hash
+        return checkpoint
+
+    @staticmethod
+    def seq_of(path: str) -> int:
+        return int(os.path.basename(path)[:-len(".pkl")].rsplit("-", 1)[1])
+
+    @staticmethod
+    def clear(params: Dict):
+        """ Remove the checkpoints of a finished run with these parameters """
+        path = Checkpoint.latest_path(params)
+        while path is not None:
+            os.remove(path)
+            path = Checkpoint.latest_path(params)
@@ -1,5 +1,9 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
 from treeswift import Node
-from typing import Optional
 
 class ClusterTreeNode(Node):
     """ (VR) Object to represent a cluster in the mincut/recluster recursion tree 
@@ -11,5 +15,82 @@ class ClusterTreeNode(Node):
     graph_index: str
     num_nodes: int
     cut_size: Optional[int]
+    connectivity_lower_bound: Optional[int] # Set instead of cut_size when the cluster was certified valid (--certify)
     validity_threshold: Optional[float]
-    cm_valid: bool                          # Def CM Valid: The cluster need not be operated on by CM anymore (Note: Every extant cluster is also CM Valid)
\ No newline at end of file
+    cm_valid: bool                          # Def CM Valid: The cluster need not be operated on by CM anymore (Note: Every extant cluster is also CM Valid)
+
+    def apply(self, record: ClusterRecord):
+        """ Annotate this node with the final state of its cluster """
+        self.label = record.label
+        self.graph_index = record.label
+        self.num_nodes = record.num_nodes
+        self.extant = record.extant
+        self.cm_valid = record.cm_valid
+        if record.cut_size is not None:
+            self.cut_size = record.cut_size
+        if record.connectivity_lower_bound is not None:
+            self.connectivity_lower_bound = record.connectivity_lower_bound
+        if record.validity_threshold is not None:
+            self.validity_threshold = record.validity_threshold
+
+
+@dataclass
+class ClusterRecord:
+    """ Compact, picklable state of one cluster tree node, as streamed from the workers to the parent
+
+    `parent` is the label of the parent cluster (None for input clusters, which hang off the root) and
+    `rank` is the position of the cluster among its siblings, so the tree can be assembled in the same
+    shape whatever order the records arrive in. `cut_size` and `validity_threshold` stay None when
+    they were never computed for the cluster. A cluster certified valid without its exact mincut gets
+    `connectivity_lower_bound` instead of `cut_size`.
+    """
+    label: str
+    parent: Optional[str]
+    rank: int
+    num_nodes: int
+    extant: bool = False
+    cm_valid: bool = True
+    cut_size: Optional[int] = None
+    validity_threshold: Optional[float] = None
+    connectivity_lower_bound: Optional[int] = None
+
+
+class TreeAssembler:
+    """ Builds the cluster tree from ClusterRecords that may arrive in any order """
+
+    def __init__(self, keep_records: bool = False):
+        self.lookup: Dict[str, ClusterTreeNode] = {}
+        self.records: Optional[List[ClusterRecord]] = [] if keep_records else None     # for checkpoints
+        self._ranks: Dict[str, int] = {}
+        self._orphans: Dict[str, List[ClusterTreeNode]] = {}   # children whose parent has not arrived yet
+
+    def _node(self, label: str) -> ClusterTreeNode:
+        node = self.lookup.get(label)
+        if node is None:
+            node = ClusterTreeNode()
+            node.label = label
+            self.lookup[label] = node
+        return node
+
+    def add(self, record: ClusterRecord):
+        if self.records is not None:
+            self.records.append(record)
+        node = self._node(record.label)
+        node.apply(record)
+        self._ranks[record.label] = record.rank
+        for child in self._orphans.pop(record.label, []):
+            node.add_child(child)
+        if record.parent is None:
+            return
+        if record.parent in self.lookup:
+            self.lookup[record.parent].add_child(node)
+        else:
+            self._orphans.setdefault(record.parent, []).append(node)
+
+    def finish(self, roots: List[str]) -> List[ClusterTreeNode]:
+        """ Restore the sibling order and return the nodes of the given input clusters """
+        assert not self._orphans, f"Records missing for clusters {list(self._orphans)}"
+        for node in self.lookup.values():
+            if len(node.children) > 1:
+                node.children.sort(key=lambda c: self._ranks[c.label])
+        return [self.lookup[label] for label in roots]
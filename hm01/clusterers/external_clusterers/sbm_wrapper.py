@@ -60,14 +60,8 @@ class SBMClusterer(AbstractClusterer):
 
     def from_existing_clustering(self, filepath) -> List[IntangibleSubgraph]:
         # node_id cluster_id format
-        clusters: Dict[str, IntangibleSubgraph] = {}
-        with open(filepath) as f:
-            for line in f:
-                node_id, cluster_id = line.split()
-                clusters.setdefault(
-                    cluster_id, IntangibleSubgraph([], cluster_id)
-                ).subset.append(int(node_id))
-        return list(v for v in clusters.values() if v.n() > 1)
+        clusters = IntangibleSubgraph.from_assignment_file(filepath)
+        return list(v for v in clusters if v.n() > 1)
 
 def get_clusterer(**kwargs):
     return SBMClusterer(**kwargs)
@@ -6,29 +6,41 @@
 from __future__ import annotations
 
 import importlib
+import itertools
 import json
 import multiprocessing as mp
+import queue
 import sys
 import time
+from contextlib import nullcontext
 from enum import Enum
 from typing import Dict, List, Optional, Tuple, Union, cast
 from hm01.json2membership import json2membership
 from hm01.to_universal import cm2universal
 
 import jsonpickle
-import networkit as nk
+import numpy as np
 import treeswift as ts
 import typer
-from hm01.cluster_tree import ClusterTreeNode
+from hm01.checkpoint import Checkpoint
+from hm01.cluster_tree import ClusterRecord, ClusterTreeNode, TreeAssembler
 from hm01.clusterers.nop_clusterer import NopClusterer
 from hm01.clusterers.ikc_wrapper import IkcClusterer
 from hm01.clusterers.leiden_wrapper import LeidenClusterer, Quality
 # (VR) Change: I removed the context import since we do everything in memory
 # (VR) Change 2: I brought back context just for IKC
 from hm01.context import context
-from hm01.graph import Graph, IntangibleSubgraph, RealizedSubgraph
+from hm01.coordinator import Coordinator
+from hm01.graph import CSRGraph, Graph, IntangibleSubgraph, RealizedSubgraph, realize_clusters
+from hm01.graph_store import is_store, load_csr, load_graph
+from hm01.incremental import IncrementalPlan, PreviousRun, read_edge_delta
+import hm01.mincut as mincut
+from hm01.mincut_cache import MincutCache
 from hm01.mincut_requirement import MincutRequirement
-from hm01.pruner import prune_graph
+from hm01.pruner import prune_clusters, prune_graph
+from hm01.result_stream import RecordCollector, RecordStream
+from hm01.scheduler import order_by_cost, run_dynamic
+from hm01.shared_graph import SharedGraph, SharedGraphHandle, attach
 from structlog import get_logger
 from enum import Enum
 
@@ -45,6 +57,26 @@ class ClustererSpec(str, Enum):
     external = "external"
 
 
+class SubgraphRepresentation(str, Enum):
+    """ How clusters are held in memory while CM works on them """
+    dict = "dict"               # RealizedSubgraph: adjacency sets
+    csr = "csr"                 # CSRSubgraph: NumPy offset and neighbor arrays
+
+
+class GraphBackendSpec(str, Enum):
+    """ Storage of the input network in the main process (see hm01.graph_backend) """
+    networkit = "networkit"
+    csr = "csr"                 # NumPy CSR arrays
+    igraph = "igraph"
+
+
+class StartMethod(str, Enum):
+    """ Multiprocessing start methods supported for the worker pool """
+    fork = "fork"
+    spawn = "spawn"
+    forkserver = "forkserver"
+
+
 def annotate_tree_node(
     node: ClusterTreeNode, 
     graph: Union[
@@ -64,15 +96,6 @@ def annotate_tree_node(
     node.cm_valid = True    
 
 
-def update_cid_membership(
-    subgraph: Union[Graph, IntangibleSubgraph, RealizedSubgraph],
-    node2cids: Dict[int, str],
-):
-    """ (VR) Set nodes within current cluster to its respective cluster id """
-    for n in subgraph.nodes():
-        node2cids[n] = subgraph.index
-
-
 def summarize_graphs(graphs: List[IntangibleSubgraph]) -> str:
     """ (VR) Summarize graphs for logging purposes """
     if not graphs:
@@ -83,39 +106,72 @@ def summarize_graphs(graphs: List[IntangibleSubgraph]) -> str:
         return f"[{', '.join([g.index for g in graphs])}]({len(graphs)})"
 
 
-def initialize_subgraph(
-    nodes_global,
-    adj_global,
-    endpoints_global,
-    begin,
-    end,
-    cluster_id,
-):
-    #
-    # Make the nodes list and cluster edges dictionary.
-    #
-    node_set = set(nodes_global[begin:end].tolist())
-
-    edges = {}
-    for node_a in node_set:
-        endpoints = []
-
-        # Locate neighbors of node_a that are in the node_set.
-        begin = adj_global[node_a]
-        end = adj_global[node_a + 1]
-        for node_b in endpoints_global[begin:end]:
-            if node_b in node_set:
-                endpoints.append(node_b)
+def init_worker(graph_handle: Optional[SharedGraphHandle], config: Dict, record_queue):
+    """ Set up the module state of a pool worker
 
-        edges[node_a] = endpoints
-
-    subgraph = RealizedSubgraph.from_adjlist(node_set, edges, cluster_id)
-    return subgraph, node_set
-
-
-def par_task(stack, node_mapping, node2cids):
+    Nothing is inherited from the parent, so this works the same under the fork, spawn and forkserver
+    start methods. The global graph is attached from shared memory instead of being copied, and results
+    go back to the parent over `record_queue`.
+    """
+    global global_graph
+    global clusterer
+    global requirement
+    global quiet_g
+    global no_prune_g
+    global mincut_type_g
+    global certify_g
+    global split_components_g
+    global mincut_cache_g
+    global split_size_g
+    global record_queue_g
+    global checkpoint_interval_g
+    global subgraph_repr_g
+    sys.setrecursionlimit(1231231234)
+    context.with_working_dir(config["working_dir"])
+
+    global_graph = attach(graph_handle) if graph_handle is not None else None     # remote workers get realized clusters only
+    if config["clusterer_source"] is None:
+        clusterer = config["clusterer"]
+    elif "clusterer" not in globals():
+        # External clusterers come from a file and cannot be pickled, so spawned workers load their own
+        clusterer = load_clusterer(*config["clusterer_source"])
+    requirement = config["requirement"]
+    quiet_g = config["quiet"]
+    no_prune_g = config["no_prune"]
+    mincut_type_g = config["mincut_type"]
+    certify_g = config["certify"]
+    split_components_g = config["split_components"]
+    mincut_cache_g = config["mincut_cache"]
+    mincut.use_cache(mincut_cache_g)
+    split_size_g = config["split_size"]
+    checkpoint_interval_g = config["checkpoint_interval"]
+    subgraph_repr_g = config["subgraph_representation"]
+    record_queue_g = record_queue
+
+
+def par_task(task_id, stack, records):
+    """ Run algorithm-g on the clusters in `stack`
+
+    `records` holds the ClusterRecord of every cluster on the stack. Finished records and final node
+    labels are streamed to the parent as they are produced; the task only returns its id, the number of
+    batches it sent and the clusters it handed back to the shared queue, as (IntangibleSubgraph, ClusterRecord).
+    When checkpointing, the task also hands back its whole stack once the checkpoint interval is over,
+    so no task runs much longer than one interval.
+    """
     # (VR) Main algorithm loop: Recursively cut clusters in stack until they have mincut above threshold
+    stream = RecordStream(record_queue_g, task_id)
+    spilled: List[Tuple[IntangibleSubgraph, ClusterRecord]] = []    # Children handed back to the shared queue for other workers
+    deadline = time.time() + checkpoint_interval_g if checkpoint_interval_g > 0 else None
+    processed = 0
     while stack:
+        if deadline is not None and processed > 0 and time.time() > deadline:
+            for g in stack:
+                intangible = g if isinstance(g, IntangibleSubgraph) else g.to_intangible(global_graph)
+                spilled.append((intangible, records.pop(g.index)))
+            stack.clear()
+            break
+        processed += 1
+
         if not quiet_g:
             log = get_logger()
             log.debug("entered next iteration of loop", queue_size=len(stack))
@@ -129,21 +185,24 @@ def par_task(stack, node_mapping, node2cids):
                 graph_index=intangible_subgraph.index,
             )
 
-        # (VR) Mark nodes in popped cluster with their respective cluster ID
-        update_cid_membership(intangible_subgraph, node2cids)
+        # Get the record of the current cluster
+        record = records.pop(intangible_subgraph.index)
+        tree_record = record
 
         # (VR) If the current cluster is a singleton or empty, move on
         if intangible_subgraph.n() <= 1:
+            stream.label(record.label, list(intangible_subgraph.nodes()))
+            stream.record(record)
             continue
         
         # (VR) Realize the set of nodes contained by the graph (i.e. construct its adjacency list)
         if isinstance(intangible_subgraph, IntangibleSubgraph):
-            subgraph = intangible_subgraph.realize(global_graph)
+            subgraph = intangible_subgraph.realize(global_graph, subgraph_repr_g)
         else:
             subgraph = intangible_subgraph
-
-        # (VR) Get the current cluster tree node
-        tree_node = node_mapping[subgraph.index]
+            if isinstance(subgraph, RealizedSubgraph) and subgraph._graph is None:
+                subgraph._graph = global_graph          # realized up front by the parent, sent without the graph
+        members = list(subgraph.nodes())
 
         # (VR) Log current cluster data after realization
         if not quiet_g:
@@ -162,25 +221,19 @@ def par_task(stack, node_mapping, node2cids):
         if not no_prune_g:
             num_pruned = prune_graph(subgraph, requirement, clusterer)
 
-        # if subgraph.n() <= 1:
-        #     # somehow all nodes have been pruned away and the graph is empty or has one node
-        #     tree_node.cut_size = 0
-        #     tree_node.extant = False
-        #     tree_node.valid = False
-        #     tree_node.validity_threshold = 0
-        #     continue
-
         if subgraph.n() == 0:
-            tree_node.cut_size = 0
-            tree_node.extant = False
-            tree_node.cm_valid = False
+            record.cut_size = 0
+            record.extant = False
+            record.cm_valid = False
+            stream.label(record.label, members)
+            stream.record(record)
             continue
 
         if num_pruned > 0:
             # (VR) Set the cluster cut size to the degree of the removed node
-            tree_node.cut_size = original_mcd
-            tree_node.extant = False                        # (VR) Change: The current cluster has been changed, so its not extant or CM valid anymore
-            tree_node.cm_valid = False
+            record.cut_size = original_mcd
+            record.extant = False                           # (VR) Change: The current cluster has been changed, so its not extant or CM valid anymore
+            record.cm_valid = False
 
             if not quiet_g:
                 log = log.bind(
@@ -191,46 +244,53 @@ def par_task(stack, node_mapping, node2cids):
                 )
                 log.info("pruned graph", num_pruned=num_pruned)
 
-            # (VR) Create a TreeNodeCluster for the pruned cluster and set it as the current node's child
-            new_child = ClusterTreeNode()
-            subgraph.index = f"{subgraph.index}δ"
-            annotate_tree_node(new_child, subgraph)
-            tree_node.add_child(new_child)
-            node_mapping[subgraph.index] = new_child
+            # The pruned nodes keep the label of the cluster they were pruned from
+            pruned = np.array(members, dtype=np.int64)
+            stream.label(record.label, pruned[~subgraph.contains(pruned)].tolist())
 
-            # (VR) Iterate to the new node
-            tree_node = new_child
-            update_cid_membership(subgraph, node2cids)
+            # (VR) Create a record for the pruned cluster as the current cluster's child
+            subgraph.index = f"{subgraph.index}δ"
+            tree_record = ClusterRecord(subgraph.index, record.label, 0, subgraph.n())
 
         # (VR) Compute the mincut and validity threshold of the cluster
-        mincut_res = subgraph.find_mincut(mincut_type_g)
         valid_threshold = requirement.validity_threshold(clusterer, subgraph)
+        # A disconnected cluster can be split into all of its components at once instead of one per mincut
+        mincut_res = mincut.split_components(subgraph) if split_components_g else None
+        certified = None
+        if mincut_res is None:
+            # When certifying, the exact mincut is only computed for clusters that could not be certified valid
+            certified = mincut.certify(subgraph, valid_threshold, mincut_type_g) if certify_g else None
+            if certified is None:
+                mincut_res = subgraph.find_mincut(mincut_type_g)
+        cut_size = mincut_res[-1] if certified is None else certified[0]
         if not quiet_g:
             log.debug("calculated validity threshold", validity_threshold=valid_threshold)
             log.debug(
                 "mincut computed",
-                cut_size=mincut_res[-1],
+                cut_size=cut_size,
+                certified=certified is not None,
             )
 
         # (VR) Set the current cluster's cut size
-        tree_node.cut_size = mincut_res[-1]
-        tree_node.validity_threshold = valid_threshold
+        if certified is None or certified[1]:
+            tree_record.cut_size = cut_size
+        else:
+            tree_record.connectivity_lower_bound = cut_size     # only known to be above the threshold
+        tree_record.validity_threshold = valid_threshold
 
         # (VR) If the cut size is below validity, split!
-        if mincut_res[-1] <= valid_threshold:    # and mincut_res.get_cut_size >= 0: -> (VR) Change: Commented this out to handle disconnected clusters
-            tree_node.cm_valid = False                      # (VR) Change: The current cluster has been changed, so its not extant or CM valid anymore
-            tree_node.extant = False
+        if cut_size <= valid_threshold:    # and mincut_res.get_cut_size >= 0: -> (VR) Change: Commented this out to handle disconnected clusters
+            tree_record.cm_valid = False                    # (VR) Change: The current cluster has been changed, so its not extant or CM valid anymore
+            tree_record.extant = False
             
             # (VR) Split partitions and set them as children nodes
             partitions = subgraph.cut_by_mincut(mincut_res)
+            placed = set()                                  # Nodes that move on to a child cluster
 
-            for p in partitions:
+            for rank, p in enumerate(partitions):
                 if p.n() > 1:
-                    node = ClusterTreeNode()
-                    annotate_tree_node(node, p)
-                    node.cm_valid = False
-                    tree_node.add_child(node)
-                    node_mapping[p.index] = node
+                    stream.record(ClusterRecord(p.index, tree_record.label, rank, p.n(), cm_valid=False))
+                    partition_label = p.index
                     subp = []
                     if isinstance(clusterer, NopClusterer):
                         p.index += "nop"
@@ -239,28 +299,51 @@ def par_task(stack, node_mapping, node2cids):
                         subp = list(clusterer.cluster_without_singletons(p))
                         subp = [s.realize(p) for s in subp]
 
-                    for sg in subp:
-                        n = ClusterTreeNode()
-                        annotate_tree_node(n, sg)
-                        node_mapping[sg.index] = n
-                        node.add_child(n)
+                    # Keep the first child for this worker and hand every other large child to the
+                    # shared queue, so the subtree of a giant cluster spreads over the free workers
+                    for i, sg in enumerate(subp):
+                        child_record = ClusterRecord(sg.index, partition_label, i, sg.n())
+                        placed.update(sg.nodes())
+                        if split_size_g > 0 and i > 0 and sg.n() >= split_size_g:
+                            spilled.append((sg.to_intangible(global_graph), child_record))
+                        else:
+                            records[sg.index] = child_record
+                            stack.append(sg)
 
-                    stack.extend(subp)
+            # Nodes left out of every child keep the label of the current cluster
+            stream.label(tree_record.label, [u for u in subgraph.nodes() if u not in placed])
 
             # (VR) Log the partitions
             if not quiet_g:
                 log.info("cluster split")
         else:
+            stream.label(tree_record.label, list(subgraph.nodes()))
             if not quiet_g:
                 log.info("cut valid, not splitting anymore")
 
-    return (node_mapping, node2cids)
+        stream.record(record)
+        if tree_record is not record:
+            stream.record(tree_record)
+
+    stream.flush()
+    return (task_id, stream.sent, spilled)
 
 
 def algorithm_g(
     graphs: List[IntangibleSubgraph],
     quiet: bool,
-    cores: int
+    cores: int,
+    cost_order: bool = False,
+    split_size: int = 0,
+    start_method: str = "fork",
+    checkpoint_interval: float = 0,
+    checkpoint_params: Optional[Dict] = None,
+    resume_from: Optional[Checkpoint] = None,
+    shared_graph: Optional[SharedGraph] = None,
+    listen: str = "",
+    authkey: bytes = b"",
+    bulk_realize: bool = False,
+    pre_prune: bool = False,
 ) -> Tuple[List[IntangibleSubgraph], Dict[int, str], ts.Tree]:
     """ (VR) Main algorithm in hm01 
     
@@ -269,55 +352,199 @@ def algorithm_g(
         graph (List[IntangibleSubgraph])                    : list of clusters
         clusterer (Union[IkcClusterer, LeidenClusterer])    : clustering algorithm
         requirement (MincutRequirement)                     : mincut connectivity requirement
+        cost_order (bool)                                   : schedule clusters largest estimated cost first
+        split_size (int)                                    : reclustered children with at least this many nodes
+                                                              become tasks of their own (0 disables this)
+        start_method (str)                                  : multiprocessing start method of the worker pool
+        checkpoint_interval (float)                         : seconds between checkpoints (0 disables checkpointing)
+        checkpoint_params (dict)                            : run parameters recorded in the checkpoints
+        resume_from (Checkpoint)                            : checkpoint to resume from; `graphs` is ignored then
+        shared_graph (SharedGraph)                          : global graph already exported to shared memory, if any
+        listen (str)                                        : HOST:PORT to serve the tasks to remote workers on, instead
+                                                              of running them on a local pool
+        authkey (bytes)                                     : shared secret of the remote workers
+        bulk_realize (bool)                                 : realize all input clusters in one pass over the graph
+                                                              before scheduling them, instead of one by one in the workers
+        pre_prune (bool)                                    : prune all input clusters in one pass over the graph before
+                                                              scheduling them, instead of one by one in the workers
     """
-    # Share quiet variable with processes
-    global quiet_g
-    quiet_g = quiet
-    global no_prune_g
+    # Everything the workers need besides the graph, handed to them by init_worker
+    worker_config = {
+        "clusterer": None if clusterer_source else clusterer,
+        "clusterer_source": clusterer_source,
+        "requirement": requirement,
+        "quiet": quiet,
+        "no_prune": no_prune_g,
+        "mincut_type": mincut_type_g,
+        "certify": certify_g,
+        "split_components": split_components_g,
+        "mincut_cache": mincut_cache_g,
+        "split_size": split_size,
+        "checkpoint_interval": checkpoint_interval,
+        "subgraph_representation": subgraph_repr_g,
+        "working_dir": context._working_dir,
+    }
+
+    if resume_from is not None:
+        roots = resume_from.roots
+        pending = resume_from.pending
+    else:
+        roots = [g.index for g in graphs]
+        # (VR) Input clusters are marked extant by default until they are changed
+        pending = [(g, ClusterRecord(g.index, None, 0, g.n(), extant=True)) for g in graphs]
 
     if not quiet:
         log = get_logger()
         log.info("starting algorithm-g", 
-                 queue_size=len(graphs))
+                 queue_size=len(pending),
+                 resumed=resume_from is not None)
 
     tree = ts.Tree()                                    # (VR) tree: Recursion tree that keeps track of clusters created by serial mincut/reclusters
     tree.root = ClusterTreeNode()                       # (VR) Give this tree an empty root
     annotate_tree_node(tree.root, global_graph)
-    node_mapping: Dict[str, ClusterTreeNode] = {}       # (VR) node_mapping: maps cluster id to cluster tree node  
+    assembler = TreeAssembler(keep_records=checkpoint_interval > 0)   # Builds the cluster tree from the records streamed by the workers
     node2cids: Dict[int, str] = {}                      # (VR) node2cids: Mapping between nodes and cluster ID  
 
-    # (VR) Split data into parititions such that each core handles one partition
-    mapping_split = [{} for _ in range(cores)]
-    stacks = [[] for _ in range(cores)]
-    labeling_split = [{} for _ in range(cores)]
-
-    # (VR) Fill each partition
-    for i, g in enumerate(graphs):
-        n = ClusterTreeNode()
-        annotate_tree_node(n, g)
-        n.extant = True                                 # (VR) Input clusters are marked extant by default until they are changed
-        node_mapping[g.index] = n
-        mapping_split[i % cores][g.index] = n
-        stacks[i % cores].append(g)
-
-    # (VR) Map the algorithm to each partition
-    with mp.Pool(cores) as p:
-        out = p.starmap(par_task,
-            list(
-                zip(
-                    stacks, 
-                    mapping_split, 
-                    labeling_split)))
-
-    # (VR) Merge partitions into single return data
-    for mapping, label_part in out:
-        if mapping is not None:
-            node_mapping.update(mapping)
-        node2cids.update(label_part)
+    def apply_batch(batch):
+        cluster_records, labels = batch
+        for record in cluster_records:
+            assembler.add(record)
+        for cluster, nodes in labels:
+            for n in nodes:
+                node2cids[n] = cluster
+
+    if resume_from is not None:
+        apply_batch((resume_from.records, []))
+        node2cids.update(resume_from.labels)
+
+    # Every input cluster is its own task on a shared queue, so a free worker always picks up the
+    # next pending cluster instead of waiting on a fixed, pre-assigned stack
+    unfinished: Dict[int, Tuple[IntangibleSubgraph, ClusterRecord]] = {}    # tasks queued or running, by task id
+    task_ids = itertools.count()
+
+    def task_of(g, record):
+        task_id = next(task_ids)
+        unfinished[task_id] = (g, record)
+        return (task_id, [g], {g.index: record})
+
+    checkpoint_seq = Checkpoint.seq_of(Checkpoint.latest_path(checkpoint_params)) + 1 if resume_from is not None else 0
+    last_checkpoint = time.time()
+
+    def write_checkpoint():
+        # Only called when the collector is idle: every finished task is applied, the rest is unfinished
+        return Checkpoint(
+            checkpoint_params,
+            roots,
+            list(assembler.records),
+            dict(node2cids),
+            [
+                (g if isinstance(g, IntangibleSubgraph) else g.to_intangible(global_graph), record)
+                for g, record in unfinished.values()
+            ],
+        ).save(checkpoint_seq)
+
+    def merge_result(result):
+        nonlocal checkpoint_seq, last_checkpoint
+        task_id, sent, spilled = result
+        follow_ups = [task_of(g, record) for g, record in spilled]
+        del unfinished[task_id]
+        collector.task_done(task_id, sent)
+        if not quiet and spilled:
+            log.debug("spilled clusters to the shared queue", summary=summarize_graphs([g for g, _ in spilled]))
+        if checkpoint_interval > 0 and time.time() - last_checkpoint >= checkpoint_interval:
+            path = collector.when_idle(write_checkpoint)
+            checkpoint_seq += 1
+            last_checkpoint = time.time()
+            if not quiet:
+                log.info("wrote checkpoint", path=path, unfinished=len(unfinished))
+        return follow_ups
+
+    if pre_prune and not no_prune_g and resume_from is None:
+        # The pruning of par_task, done here for every input cluster at once: the pruned nodes keep the
+        # label of their cluster and the rest carries on as its δ child, or the cluster is done if none is left
+        source = attach(shared_graph.handle) if shared_graph is not None else CSRGraph.from_graph(global_graph)
+        try:
+            pruned = prune_clusters([g for g, _ in pending], source, requirement, clusterer)
+        except ValueError as e:
+            pruned = None
+            if not quiet:
+                log.warning("not pruning the input clusters up front", reason=str(e))
+        if pruned is not None:
+            survivors = []
+            num_shrunk = num_vanished = 0
+            for (g, record), result in zip(pending, pruned):
+                if result is None:
+                    survivors.append((g, record))
+                    continue
+                original_mcd, left = result
+                record.extant = False
+                record.cm_valid = False
+                if len(left) == 0:
+                    record.cut_size = 0
+                    apply_batch(([record], [(record.label, g.nodes())]))
+                    num_vanished += 1
+                    continue
+                record.cut_size = original_mcd
+                members = g._node_array()
+                apply_batch(([record], [(record.label, members[~np.isin(members, left)].tolist())]))
+                index = f"{g.index}δ"
+                survivors.append((IntangibleSubgraph(left, index), ClusterRecord(index, record.label, 0, len(left))))
+                num_shrunk += 1
+            pending = survivors
+            if not quiet:
+                log.info("pruned the input clusters", shrunk=num_shrunk, vanished=num_vanished, left=len(pending))
+        del source
+
+    if bulk_realize and resume_from is None:
+        source = attach(shared_graph.handle) if shared_graph is not None else CSRGraph.from_graph(global_graph)
+        try:
+            realized = realize_clusters([g for g, _ in pending], source, subgraph_repr_g)
+        except ValueError as e:
+            realized = None
+            if not quiet:
+                log.warning("not realizing the input clusters up front", reason=str(e))
+        if realized is not None:
+            for sg in realized:
+                if isinstance(sg, RealizedSubgraph):
+                    sg._graph = None                    # the workers have their own view of the graph
+            pending = [(sg, record) for sg, (_, record) in zip(realized, pending)]
+            if not quiet:
+                log.info("realized the input clusters", count=len(realized))
+        del source
+
+    if cost_order:
+        pending_records = {g.index: record for g, record in pending}
+        pending = [(g, pending_records[g.index]) for g in order_by_cost([g for g, _ in pending], global_graph)]
+    tasks = [task_of(g, record) for g, record in pending]
+
+    if listen:
+        # Remote workers pull the tasks over TCP; each task only carries the subgraphs of its clusters
+        record_queue = queue.Queue()
+        collector = RecordCollector(record_queue, apply_batch, quiet)
+        collector.start()
+        with Coordinator(listen, authkey, global_graph, worker_config, record_queue, quiet) as coordinator:
+            run_dynamic(coordinator, par_task, tasks, merge_result)
+            collector.when_idle()
+    else:
+        # Export the global graph once; every worker attaches to the same shared CSR arrays
+        ctx = mp.get_context(start_method)
+        record_queue = ctx.Queue()
+        collector = RecordCollector(record_queue, apply_batch, quiet)
+        with nullcontext(shared_graph) if shared_graph else SharedGraph(CSRGraph.from_graph(global_graph)) as shared:
+            with ctx.Pool(
+                cores,
+                initializer=init_worker,
+                initargs=(shared.handle, worker_config, record_queue),
+            ) as p:
+                collector.start()                       # only after the workers are forked
+                run_dynamic(p, par_task, tasks, merge_result)
+                collector.when_idle()
+                p.close()
+                p.join()
+    collector.stop()
 
     # (VR) Add each initial clustering node as children of the tree root
-    for g in graphs:
-        n = node_mapping[g.index]
+    for n in assembler.finish(roots):
         tree.root.add_child(n)
 
     return node2cids, tree
@@ -345,7 +572,7 @@ def main(
         ...,
         "--input",
         "-i",
-        help="The input network.",
+        help="The input network: a tab-separated edge list, or a graph compiled with hm01.graph_store.",
     ),
     existing_clustering: Optional[str] = typer.Option(
         "",
@@ -420,6 +647,97 @@ def main(
         "-m",
         help="Mincut type",
     ),
+    certify: bool = typer.Option(
+        False,
+        "--certify",
+        help="Certify that a cluster is well-connected before computing its exact mincut, which is then only computed if it is not.",
+    ),
+    split_components: bool = typer.Option(
+        False,
+        "--split-components",
+        help="Split a disconnected cluster into all of its connected components at once, instead of two sides per mincut.",
+    ),
+    mincut_cache: str = typer.Option(
+        "",
+        "--mincut-cache",
+        help="Directory of a mincut cache shared across runs; mincuts found there are not computed again.",
+    ),
+    mincut_cache_size: int = typer.Option(
+        1024,
+        "--mincut-cache-size",
+        help="Size limit of the mincut cache in MB; the least recently used entries are removed beyond it.",
+    ),
+    subgraph_repr: SubgraphRepresentation = typer.Option(
+        SubgraphRepresentation.dict,
+        "--subgraph-repr",
+        help="In-memory representation of the clusters: adjacency sets (dict) or NumPy CSR arrays (csr).",
+    ),
+    graph_backend: GraphBackendSpec = typer.Option(
+        GraphBackendSpec.networkit,
+        "--graph-backend",
+        help="Storage of the input network: networkit, NumPy CSR arrays (csr) or igraph.",
+    ),
+    bulk_realize: bool = typer.Option(
+        False,
+        "--bulk-realize",
+        help="Realize all input clusters in one pass over the network before scheduling them.",
+    ),
+    pre_prune: bool = typer.Option(
+        False,
+        "--pre-prune",
+        help="Prune all input clusters in one pass over the network before scheduling them.",
+    ),
+    cost_order: bool = typer.Option(
+        False,
+        "--cost-order",
+        help="Schedule input clusters largest estimated cost first (longest-processing-time).",
+    ),
+    split_size: int = typer.Option(
+        1000,
+        "--split-size",
+        help="Reclustered children with at least this many nodes are handed to any free worker (0 disables).",
+    ),
+    start_method: StartMethod = typer.Option(
+        StartMethod.fork,
+        "--start-method",
+        help="Multiprocessing start method of the worker pool.",
+    ),
+    checkpoint_interval: float = typer.Option(
+        0,
+        "--checkpoint-interval",
+        help="Write a checkpoint to the working directory every this many seconds (0 disables).",
+    ),
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        help="Resume from the latest checkpoint in the working directory, if there is one.",
+    ),
+    previous: str = typer.Option(
+        "",
+        "--previous",
+        help="Output filename of a previous run; only input clusters that changed since then are recomputed.",
+    ),
+    edge_delta: str = typer.Option(
+        "",
+        "--edge-delta",
+        help="(With --previous) Edges added to or removed from the network since the previous run.",
+    ),
+    listen: str = typer.Option(
+        "",
+        "--listen",
+        help="Serve the clusters to remote workers (python -m hm01.remote_worker) on HOST:PORT instead of running them locally.",
+    ),
+    authkey: str = typer.Option(
+        "",
+        "--authkey",
+        envvar="HM01_AUTHKEY",
+        help="(With --listen) Shared secret the remote workers must present.",
+    ),
+    sweep: str = typer.Option(
+        "",
+        "--sweep",
+        help="JSON list of parameter sets to run one after another on the same loaded graph.",
+    ),
     # first_tsv: bool = typer.Option(
     #     False,
     #     "--firsttsv",
@@ -431,39 +749,57 @@ def main(
     """ (VR) Connectivity-Modifier (CM). 
     Take a network and cluster it ensuring cut validity."""
 
-    # Edge case for empty output name
-    if len(output) == 0:
-        output = '.tsv'
-
-    # (VR) Initialize shared global variables (TODO: Windows does not share
-    # globalised variables between processes, adjust this to allow SM on Windows)
+    # (VR) Initialize global variables. The workers receive them through init_worker,
+    # so they do not depend on being inherited by fork
     global clusterer
+    global clusterer_source
     global requirement
     global global_graph
     global no_prune_g
     global mincut_type_g
+    global certify_g
+    global split_components_g
+    global mincut_cache_g
+    global subgraph_repr_g
     no_prune_g = no_prune
     mincut_type_g = mincut_type
+    certify_g = certify
+    split_components_g = split_components
+    mincut_cache_g = MincutCache(mincut_cache, mincut_cache_size * 2**20) if mincut_cache else None
+    mincut.use_cache(mincut_cache_g)
+    subgraph_repr_g = subgraph_repr.value
 
     # (VR) Setting a really high recursion limit to prevent stack overflow errors
     sys.setrecursionlimit(1231231234)
 
-    # (VR) Check -g and -k parameters for Leiden and IKC respectively
-    if clusterer_spec == ClustererSpec.leiden:
-        assert resolution != -1, "Leiden requires resolution"
-        clusterer = LeidenClusterer(resolution)
-    elif clusterer_spec == ClustererSpec.leiden_mod:
-        assert resolution == -1, "Leiden with modularity does not support resolution"
-        clusterer = LeidenClusterer(resolution, quality=Quality.modularity)
-    elif clusterer_spec == ClustererSpec.ikc:
-        assert k != -1, "IKC requires k"
-        clusterer = IkcClusterer(k)
-    elif clusterer_spec == ClustererSpec.nop:
-        clusterer = NopClusterer()
+    assert authkey or not listen, "--listen requires an --authkey"
+
+    # The parameter sets to run, all on the same loaded graph
+    defaults = {
+        "existing_clustering": existing_clustering,
+        "output": output,
+        "threshold": threshold,
+        "resolution": resolution,
+        "k": k,
+        "clusterer_args": clusterer_args,
+        "previous": previous,
+    }
+    if sweep:
+        assert not resume, "--resume is not supported with --sweep"
+        with open(sweep) as f:
+            entries = json.load(f)
+        for entry in entries:
+            unknown = set(entry) - set(defaults)
+            if unknown:
+                raise ValueError(f"Unknown keys in sweep entry {entry}: {sorted(unknown)}")
+        param_sets = [{**defaults, **entry} for entry in entries]
+        # Every parameter set writes its own .tsv and .json outputs, so no two may share an output
+        outputs = [params["output"] for params in param_sets]
+        repeated = sorted({o for o in outputs if outputs.count(o) > 1})
+        if repeated:
+            raise ValueError(f"Sweep entries share the output file(s) {repeated}; give every entry its own output")
     else:
-        assert clusterer_file != "", "File is required for external clusterers"
-        # It is an external clusterer, load it.
-        clusterer = load_clusterer(clusterer_file, clusterer_args)
+        param_sets = [defaults]
 
     # (VR) Change get working dir iff IKC
     context.with_working_dir(input_.split('/')[-1] + "_working_dir")
@@ -474,72 +810,172 @@ def main(
         log.info(
             "starting hm01",
             input=input_,
-            clusterer=clusterer,
+            clusterer=clusterer_spec.value,
+            parameter_sets=len(param_sets),
         )
 
-    # (VR) Parse mincut threshold specification
-    requirement = MincutRequirement.try_from_str(threshold)
-    if not quiet:
-        log.info("parsed connectivity requirement", requirement=requirement)
-
     # (VR) Get the initial time for reporting the time it took to load the graph
     time1 = time.time()
 
-    # (VR) Load full graph into Graph object
-    edgelist_reader = nk.graphio.EdgeListReader("\t", 0)
-    nk_graph = edgelist_reader.read(input_)
+    # (VR) Load full graph into Graph object. A compiled graph is memory-mapped instead of parsed,
+    # and its CSR arrays are shared with the workers as they are
+    csr_graph = None
+    if is_store(input_):
+        csr_graph = load_csr(input_)
+        global_graph = Graph.from_csr(csr_graph, graph_backend.value)
+    else:
+        global_graph = load_graph(input_, "", graph_backend.value)
     if not quiet:
         log.info(
             "loaded graph",
-            n=nk_graph.numberOfNodes(),
-            m=nk_graph.numberOfEdges(),
+            backend=global_graph.backend,
+            n=global_graph.n(),
+            m=global_graph.m(),
             elapsed=time.time() - time1,
         )
-    global_graph = Graph(nk_graph, "")
 
-    # (VR) Load clustering
-    if not existing_clustering:
-        if isinstance(clusterer, NopClusterer):
-            log.error("Existing clustering must be provided if using the none clusterer")
-            return
+    def run(existing_clustering, output, threshold, resolution, k, clusterer_args, previous):
+        """ Run CM with one parameter set on the loaded graph """
+        global clusterer
+        global clusterer_source
+        global requirement
+
+        # Edge case for empty output name
+        if len(output) == 0:
+            output = '.tsv'
+
+        # (VR) Check -g and -k parameters for Leiden and IKC respectively
+        if clusterer_spec == ClustererSpec.leiden:
+            assert resolution != -1, "Leiden requires resolution"
+            clusterer = LeidenClusterer(resolution)
+        elif clusterer_spec == ClustererSpec.leiden_mod:
+            assert resolution == -1, "Leiden with modularity does not support resolution"
+            clusterer = LeidenClusterer(resolution, quality=Quality.modularity)
+        elif clusterer_spec == ClustererSpec.ikc:
+            assert k != -1, "IKC requires k"
+            clusterer = IkcClusterer(k)
+        elif clusterer_spec == ClustererSpec.nop:
+            clusterer = NopClusterer()
+        else:
+            assert clusterer_file != "", "File is required for external clusterers"
+            # It is an external clusterer, load it.
+            clusterer = load_clusterer(clusterer_file, clusterer_args)
+        clusterer_source = (clusterer_file, clusterer_args) if clusterer_spec == ClustererSpec.external else None
+
         if not quiet:
-            log.info(f"running clusterer before algorithm-g", clusterer=clusterer)
-        clusters = list(clusterer.cluster_without_singletons(global_graph))
-    else:
+            log.info("starting parameter set", clusterer=clusterer, output=output)
+
+        # (VR) Parse mincut threshold specification
+        requirement = MincutRequirement.try_from_str(threshold)
         if not quiet:
-            log.info(f"loading existing clustering before algorithm-g", clusterer=clusterer)
-        clusters = clusterer.from_existing_clustering(existing_clustering)
+            log.info("parsed connectivity requirement", requirement=requirement)
+
+        # Parameters that decide what CM does to a cluster, which a previous run must share to be reused
+        run_params = {
+            "clusterer": clusterer_spec.value,
+            "clusterer_file": clusterer_file,
+            "clusterer_args": clusterer_args,
+            "k": k,
+            "resolution": resolution,
+            "threshold": threshold,
+            "no_prune": no_prune,
+            "mincut_type": mincut_type,
+            "certify": certify,
+            "split_components": split_components,
+        }
+        # Parameters that have to match for a checkpoint to be resumed
+        checkpoint_params = {
+            "input": input_,
+            "existing_clustering": existing_clustering,
+            **run_params,
+            "previous": previous,
+            "edge_delta": edge_delta,
+        }
+        checkpoint = Checkpoint.load_latest(checkpoint_params) if resume else None
+        if not quiet and resume:
+            log.info("resuming from checkpoint" if checkpoint else "no checkpoint found, starting over")
+
+        # (VR) Load clustering
+        if previous and not existing_clustering:
+            get_logger().error("Existing clustering must be provided if using --previous")
+            return
+        if checkpoint is not None and not previous:
+            clusters = []                                   # The input clusters are part of the checkpoint
+        elif not existing_clustering:
+            if isinstance(clusterer, NopClusterer):
+                log.error("Existing clustering must be provided if using the none clusterer")
+                return
+            if not quiet:
+                log.info(f"running clusterer before algorithm-g", clusterer=clusterer)
+            clusters = list(clusterer.cluster_without_singletons(global_graph))
+        else:
+            if not quiet:
+                log.info(f"loading existing clustering before algorithm-g", clusterer=clusterer)
+            clusters = clusterer.from_existing_clustering(existing_clustering)
+
+        if not quiet and checkpoint is None:
+            log.info(
+                f"first round of clustering obtained",
+                num_clusters=len(clusters),
+                summary=summarize_graphs(clusters),
+            )
 
-    if not quiet:
-        log.info(
-            f"first round of clustering obtained",
-            num_clusters=len(clusters),
-            summary=summarize_graphs(clusters),
-        )
+        # Incremental mode: only run algorithm-g on the clusters that changed since the previous run
+        plan = None
+        if previous:
+            prev_run = PreviousRun.load(previous)
+            plan = IncrementalPlan.make(
+                clusters, prev_run, read_edge_delta(edge_delta) if edge_delta else None, run_params
+            )
+            clusters = plan.touched
+            if not quiet and prev_run.params != run_params:
+                log.warning(
+                    "the previous run used other parameters, so none of its results are reused",
+                    previous_params=prev_run.params,
+                )
+            if not quiet:
+                log.info(
+                    "planned incremental run",
+                    touched=len(plan.touched),
+                    reused=len(plan.reused),
+                )
 
-    # (VR) Call the main CM algorithm
+        # (VR) Call the main CM algorithm
 
-    # (VR) Start the timer for the algorithmic stage of CM
-    if not quiet:
-        time1 = time.perf_counter()
+        # (VR) Start the timer for the algorithmic stage of CM
+        if not quiet:
+            time1 = time.perf_counter()
 
-    labels, tree = algorithm_g(
-        clusters, quiet, cores
-    )
+        labels, tree = algorithm_g(
+            clusters, quiet, cores, cost_order, split_size, start_method.value,
+            checkpoint_interval, checkpoint_params, checkpoint, shared,
+            listen, authkey.encode(), bulk_realize, pre_prune,
+        )
+        if plan is not None:
+            labels, tree = plan.merge(prev_run, labels, tree)
+        if checkpoint_interval > 0 or resume:
+            Checkpoint.clear(checkpoint_params)             # The run is complete, its checkpoints are stale now
 
-    # (VR) Log the output time for the algorithmic stage of CM
-    if not quiet:
-        log.info(
-            "CM algorithm completed", 
-            time_elapsed=time.perf_counter() - time1)
-    
-    # (VR) Output the json data
-    with open(output + ".tree.json", "w+") as f:
-        f.write(cast(str, jsonpickle.encode(tree)))
-    cm2universal(quiet, tree, labels, output)
+        # (VR) Log the output time for the algorithmic stage of CM
+        if not quiet:
+            log.info(
+                "CM algorithm completed", 
+                time_elapsed=time.perf_counter() - time1)
+        
+        # (VR) Output the json data
+        with open(output + ".tree.json", "w+") as f:
+            f.write(cast(str, jsonpickle.encode(tree)))
+        with open(output + ".params.json", "w") as f:
+            json.dump(run_params, f)                        # Checked when the output is used with --previous
+        cm2universal(quiet, tree, labels, output)
+
+        # (VR) Convert the 'after' json into a tsv file with columns (node_id, cluster_id)
+        json2membership(output + ".after.json", output)
 
-    # (VR) Convert the 'after' json into a tsv file with columns (node_id, cluster_id)
-    json2membership(output + ".after.json", output)
+    # Export the graph to shared memory once for all parameter sets (remote workers do not need it)
+    with nullcontext() if listen else SharedGraph(csr_graph if csr_graph is not None else CSRGraph.from_graph(global_graph)) as shared:
+        for params in param_sets:
+            run(**params)
 
 
 def entry_point():
@@ -547,5 +983,4 @@ def entry_point():
 
 
 if __name__ == "__main__":
-    mp.set_start_method('fork')
     entry_point()
@@ -43,9 +43,9 @@ class Context:
         # (VR) (For Checkpointing) Get file in working directory
         return os.path.join(self.working_dir, suffix)
 
-    def find_latest_checkpoint(self) -> Optional[str]:
+    def find_latest_checkpoint(self, prefix: str = "") -> Optional[str]:
         # (VR) (For Checkpointing) Get last checkpoint from CM run
-        checkpoints = glob.glob(os.path.join(self.working_dir, "*.pkl"))
+        checkpoints = glob.glob(os.path.join(self.working_dir, glob.escape(prefix) + "*.pkl"))
         if not checkpoints:
             return None
         return max(checkpoints, key=os.path.getctime)
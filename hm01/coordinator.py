@@ -0,0 +1,146 @@
+"""Run algorithm-g tasks on remote workers (see hm01.remote_worker) over TCP"""
+from __future__ import annotations
+
+import queue
+import threading
+from multiprocessing.connection import Connection, Listener
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+from structlog import get_logger
+
+from hm01.graph import AbstractGraph, CSRSubgraph, IntangibleSubgraph, RealizedSubgraph
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """ Parse HOST:PORT """
+    host, _, port = address.rpartition(":")
+    return host or "localhost", int(port)
+
+
+def induced_subgraph(g, graph: AbstractGraph, representation: str = "dict") -> Union[RealizedSubgraph, CSRSubgraph]:
+    """ The subgraph induced by a cluster, detached from `graph` so only the cluster is pickled """
+    if isinstance(g, IntangibleSubgraph):
+        g = g.realize(graph, representation)
+    if isinstance(g, CSRSubgraph):
+        return g                # only holds its own arrays
+    sub = RealizedSubgraph.from_adjlist(g.nodeset, g.adj, g.index)
+    sub._graph = sub            # cut_by_mincut realizes the partitions against it; they induce the same subgraphs here
+    return sub
+
+
+def remote_config(config: Dict) -> Dict:
+    """ The worker configuration without the paths that only exist on the coordinator's machine
+
+    Remote workers use a working directory and a mincut cache of their own (see hm01.remote_worker).
+    """
+    return {**config, "working_dir": None, "mincut_cache": None}
+
+
+class Coordinator:
+    """ Stands in for the worker pool of algorithm-g, handing tasks to workers that connect over TCP
+
+    Every connected worker is served by a thread that sends it one task at a time. Only the subgraph
+    induced by each cluster of the task is sent, never the whole graph. The records and labels a worker
+    streams back are held until its task result arrives and are then put on `record_queue`, so the task
+    of a worker that disconnects midway is simply handed to the next worker. The configuration is sent
+    without the working directory and mincut cache of this machine (see `remote_config`).
+
+    Parameters:
+        address (str)           : HOST:PORT to listen on
+        authkey (bytes)         : shared secret the workers must present
+        graph (AbstractGraph)   : global graph the tasks are cut out of
+        config (dict)           : worker configuration, as given to init_worker
+        record_queue            : queue the record batches are forwarded to
+    """
+
+    def __init__(self, address: str, authkey: bytes, graph: AbstractGraph, config: Dict, record_queue, quiet: bool = True):
+        self.graph = graph
+        self.config = config
+        self.record_queue = record_queue
+        self.quiet = quiet
+        self._tasks: queue.Queue = queue.Queue()
+        self._workers: List[threading.Thread] = []
+        self._closed = False
+        self._lock = threading.Lock()
+        self._listener = Listener(parse_address(address), authkey=authkey)
+        threading.Thread(target=self._accept, daemon=True).start()
+        if not quiet:
+            get_logger().info("waiting for remote workers", address=address)
+
+    def apply_async(self, func: Callable, args: Tuple, callback: Callable[[Any], None], error_callback: Callable[[BaseException], None]):
+        """ Same contract as multiprocessing.Pool.apply_async; `func` runs on the workers and must be par_task """
+        self._tasks.put((args, callback, error_callback))
+
+    def _accept(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except OSError:             # listener closed, or a client failed authentication
+                if self._closed:
+                    return
+                continue
+            with self._lock:
+                if self._closed:        # the run is over: no config, the worker goes back to waiting
+                    conn.send(None)
+                    conn.close()
+                    return
+                conn.send(remote_config(self.config))
+                worker = threading.Thread(target=self._serve, args=(conn,), daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            if not self.quiet:
+                get_logger().info("remote worker connected", address=self._listener.last_accepted)
+
+    def _serve(self, conn: Connection):
+        while True:
+            item = self._tasks.get()
+            if item is None:
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+                conn.close()
+                return
+            (task_id, stack, records), callback, error_callback = item
+            batches = []
+            try:
+                conn.send((task_id, [induced_subgraph(g, self.graph, self.config["subgraph_representation"]) for g in stack], records))
+                while True:
+                    kind, payload = conn.recv()
+                    if kind == "batch":
+                        batches.append(payload)
+                        continue
+                    break
+            except (EOFError, OSError):
+                if not self.quiet:
+                    get_logger().warning("remote worker lost, requeueing its task", task_id=task_id)
+                self._tasks.put(item)
+                return
+            if kind == "error":
+                error_callback(payload)
+                continue
+            for batch in batches:
+                self.record_queue.put(batch)
+            callback(payload)
+
+    def close(self):
+        """ Tell the connected workers that the run is over and stop listening """
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+        while True:                     # drop the tasks nobody picked up, when the run was aborted
+            try:
+                self._tasks.get_nowait()
+            except queue.Empty:
+                break
+        for _ in workers:
+            self._tasks.put(None)
+        for worker in workers:
+            worker.join()
+        self._listener.close()
+
+    def __enter__(self) -> Coordinator:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
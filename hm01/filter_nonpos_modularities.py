@@ -1,9 +1,9 @@
 import typer
 
-import networkit as nk
 import pandas as pd
 
 from hm01.graph import Graph, IntangibleSubgraph
+from hm01.graph_store import load_graph
 from typing import Dict, List
 from os import path
 
@@ -27,9 +27,7 @@ def main(
     base, _ = path.splitext(existing_clustering)
 
     # Load full graph into Graph object
-    edgelist_reader = nk.graphio.EdgeListReader("\t", 0)
-    nk_graph = edgelist_reader.read(input)
-    global_graph = Graph(nk_graph, "")
+    global_graph = load_graph(input)
 
     # Load clusters
     clusters = from_existing_clustering(existing_clustering)
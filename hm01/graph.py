@@ -4,17 +4,21 @@ from __future__ import annotations
 
 from abc import abstractmethod
 from dataclasses import dataclass
+import gc
+import itertools
 from functools import cache, cached_property
-from typing import Dict, Iterator, List, Tuple, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 import networkit as nk
+import numpy as np
+import pandas as pd
 
 import hm01.mincut as mincut
 from hm01.context import context
+from hm01.graph_backend import BACKENDS, GraphBackend, NetworkitBackend, csr_from_edges, gather_rows
 
 # (VR) Importing the C++/Python wrapped modules requires appending paths via sys
 from mincut_wrapper import MincutResult
-from pymincut.pygraph import PyGraph
 
 def encode_to_26_ary(n):
     alphabet = 'abcdefghijklmnopqrstuvwxyz'
@@ -79,18 +83,17 @@ class AbstractGraph:
 
 
 class Graph(AbstractGraph):
-    """ Wrapped graph over a networkit graph with an ID label """
+    """ Wrapped graph with an ID label, stored by one of the backends of hm01.graph_backend """
 
     def __init__(self, data, index):
-        # (VR) Create nk graph and remove self loops
-        self._data = data  # nk graph
-        self._data.removeSelfLoops()
+        # (VR) Wrap the graph (a networkit graph unless a backend is given) and remove self loops
+        self._backend = data if isinstance(data, GraphBackend) else NetworkitBackend(data)
+        self._backend.remove_self_loops()
         self.index = index
 
         # Identify and remove floater nodes
-        floater_nodes = [node for node in self._data.iterNodes() if self._data.degree(node) == 0]
-        for node in floater_nodes:
-            self._data.removeNode(node)
+        nodes = self._backend.node_array()
+        self._backend.remove_nodes(nodes[self._backend.degrees(nodes) == 0])
 
         self.construct_hydrator()
 
@@ -103,6 +106,11 @@ class Graph(AbstractGraph):
         """ (VR) Create a wrapped graph from a networkit graph """
         return Graph(graph, index)
 
+    @staticmethod
+    def from_csr(graph: CSRGraph, backend: str = "networkit"):
+        """ Build a graph with the given backend from a CSRGraph, e.g. one memory-mapped by hm01.graph_store """
+        return Graph(BACKENDS[backend].from_csr(graph.offsets, graph.neighbors_arr), graph.index)
+
     @staticmethod
     def from_edgelist(path):
         """ (VR) Read a graph from an edgelist file """
@@ -116,20 +124,25 @@ class Graph(AbstractGraph):
         metis_reader = nk.graphio.METISGraphReader()
         return Graph.from_nk(metis_reader.read(path))
 
+    @property
+    def backend(self) -> str:
+        """ Name of the backend the graph is stored with """
+        return self._backend.name
+
     def n(self) -> int:
         """ Number of nodes """
-        return self._data.numberOfNodes()
+        return self._backend.n()
 
     def m(self) -> int:
         """ Number of edges """
-        return self._data.numberOfEdges()
+        return self._backend.m()
 
     @cache
     def mcd(self) -> int:
         """ Get the minimum degree value """
         if self.n() == 0:
             return 0
-        return min(self._data.degree(n) for n in self._data.iterNodes())
+        return int(self._backend.degrees(self._backend.node_array()).min())
     
     def cpm(self, g: IntangibleSubgraph, resolution: int) -> float:
         e_c = g.count_edges(self)
@@ -142,10 +155,20 @@ class Graph(AbstractGraph):
         return mincut.viecut(self, mincut_type)
 
     def neighbors(self, u):
-        yield from self._data.iterNeighbors(u)
+        yield from self._backend.neighbors(u)
+
+    def mincut_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ The node ids and both directions of every edge, as arrays (see hm01.mincut.to_pygraph) """
+        src, dst = self._backend.edge_arrays()
+        return self._backend.node_array(), np.concatenate([src, dst]), np.concatenate([dst, src])
+
+    def as_pygraph(self):
+        return mincut.to_pygraph(*self.mincut_arrays())
 
     def remove_node(self, u):
-        self._data.removeNode(u)
+        self._backend.remove_nodes(np.array([u], dtype=np.int64))
+        self.__dict__.pop("continuous_ids", None)
+        self.construct_hydrator()
 
     def cut_by_mincut(self, mincut_res):
         """ (VR) Cut the graph by the mincut result """
@@ -158,63 +181,76 @@ class Graph(AbstractGraph):
         return partitions
 
     @cached_property
-    def continuous_ids(self):
-        return nk.graphtools.getContinuousNodeIds(self._data)
+    def continuous_ids(self) -> Dict[int, int]:
+        return dict(zip(self.hydrator.tolist(), range(len(self.hydrator))))
 
     def construct_hydrator(self):
         """ Hydrator: a mapping from the compacted id to the original id """
-        n = self.n()
-        hydrator = [0] * n
-        continuous_ids = self.continuous_ids  # .items()
-        assert len(continuous_ids
-                   ) == n, f"Expected {n} ids, got {len(continuous_ids)}"
-        for old_id, new_id in continuous_ids.items():
-            hydrator[new_id] = old_id
-        self.hydrator = hydrator
+        self.hydrator = self._backend.node_array()
+
+    def _compact_adjacency(self) -> Tuple[np.ndarray, np.ndarray]:
+        """ Every edge in both directions as (u, v) with compact ids, grouped by u in increasing order
+
+        The pairs come from the CSR export of the backend, whose order within each u is the adjacency
+        of networkit's compacted graph, so the compact files and graphs below match for every backend.
+        """
+        offsets, neighbors = self._backend.csr()
+        relabel = np.full(len(offsets) - 1, -1, dtype=np.int64)
+        relabel[self.hydrator] = np.arange(len(self.hydrator))
+        return relabel[np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))], relabel[neighbors]
+
+    def intangible_subgraph_from_compact(self, ids: List[int], suffix: str):
+        return self.intangible_subgraph(self.hydrator[np.asarray(ids, dtype=np.int64)].tolist(), suffix)
 
     def induced_subgraph(self, ids: List[int], suffix: str):
         """ (VR) Construct subgraph from a list of nodes """
         assert suffix != "", "Suffix cannot be empty"
-        data = nk.graphtools.subgraphFromNodes(self._data, ids)
+        data = self._backend.induced_subgraph(np.asarray(ids, dtype=np.int64))
         index = self.index + suffix
         return Graph(data, index)
 
     def induced_subgraph_from_compact(self, ids: List[int], suffix: str):
         """ (VR) Same as above but with 'hydrated' nodes """
-        return self.induced_subgraph([self.hydrator[i] for i in ids], suffix)
+        return self.induced_subgraph(self.hydrator[np.asarray(ids, dtype=np.int64)], suffix)
 
     def as_compact_edgelist_filepath(self):
         """ Get a filepath to the graph as a compact/continuous edgelist file """
         p = context.request_graph_related_path(self, "edgelist")
-        towrite = nk.graphtools.getCompactedGraph(self._data,
-                                                  self.continuous_ids)
-        nk.graphio.writeGraph(towrite, p, nk.Format.EdgeListTabZero)
+        with open(p, "w") as f:
+            f.writelines(f"{u}\t{v}\n" for u, v in self.compact_edges())
         return p
 
+    def compact_edges(self) -> List[Tuple[int, int]]:
+        """ The edges with compact/continuous ids, in the order of the compact edgelist file """
+        rows, nbrs = self._compact_adjacency()
+        once = nbrs <= rows
+        return list(zip(rows[once].tolist(), nbrs[once].tolist()))
+
     def as_compact_abc_edgelist_filepath(self):
         """ Get a filepath to the graph as a compacted abc edgelist file """
-        p = context.request_graph_related_path(self, "edgelist")
         p_abc = context.request_graph_related_path(self, "abc_edgelist")
-        towrite = nk.graphtools.getCompactedGraph(self._data, self.continuous_ids)
-        nk.graphio.writeGraph(towrite, p, nk.Format.EdgeListTabZero)
         with open(p_abc, "w") as f:
-            with open(p, "r") as f_r:
-                for line in f_r:
-                    f.write(f"{line.strip()}\t1\n")
+            f.writelines(f"{u}\t{v}\t1\n" for u, v in self.compact_edges())
         return p_abc
 
     def degree(self, u):
-        return self._data.degree(u)
+        return self._backend.degree(u)
 
     def as_metis_filepath(self):
         """ Get a filepath to the graph to a (continuous) METIS file """
+        rows, nbrs = self._compact_adjacency()
+        bounds = np.searchsorted(rows, np.arange(self.n() + 1)).tolist()
+        adj = (nbrs + 1).tolist()
         p = context.request_graph_related_path(self, "metis")
-        nk.graphio.writeGraph(self._data, p, nk.Format.METIS)
+        with open(p, "w+") as f:
+            f.write(f"{self.n()} {self.m()}\n")
+            for u in range(self.n()):
+                f.write(" ".join(map(str, adj[bounds[u]:bounds[u + 1]])) + "\n")
         return p
 
     def nodes(self):
         """ Iterate over the nodes """
-        return self._data.iterNodes()
+        return iter(self._backend.node_array().tolist())
 
     def modularity_of(self, g: IntangibleSubgraph) -> float:
         """ (VR) Calculate the modularity of the subset `g` with respect to `self`
@@ -224,7 +260,7 @@ class Graph(AbstractGraph):
         """
         ls = g.count_edges(self)
         big_l = self.m()
-        ds = sum(self._data.degree(n) for n in g.subset)
+        ds = sum(self._backend.degree(n) for n in g.nodes())
         return (ls / big_l) - (ds / (2 * big_l))**2
 
     @staticmethod
@@ -263,10 +299,62 @@ class Graph(AbstractGraph):
     def to_igraph(self):
         import igraph as ig
 
-        cont_ids = nk.graphtools.getContinuousNodeIds(self._data)
-        compact_graph = nk.graphtools.getCompactedGraph(self._data, cont_ids)
-        edges = [(u, v) for u, v in compact_graph.iterEdges()]
-        return ig.Graph(self.n(), edges)
+        rows, nbrs = self._compact_adjacency()
+        once = rows <= nbrs                     # the edge order of networkit's compacted graph
+        return ig.Graph(self.n(), list(zip(rows[once].tolist(), nbrs[once].tolist())))
+
+
+class CSRGraph(AbstractGraph):
+    """ Read-only graph stored as compressed sparse rows, indexed by the original node ids
+
+    The neighbors of node u are `neighbors[offsets[u]:offsets[u + 1]]`. Both arrays are plain NumPy
+    buffers, so they can live in shared memory (see hm01.shared_graph) and be read by many processes
+    without copying.
+    """
+
+    def __init__(self, offsets: np.ndarray, neighbors: np.ndarray, index: str = "", n: Optional[int] = None):
+        self.offsets = offsets
+        self.neighbors_arr = neighbors
+        self.index = index
+        self._n = int(np.count_nonzero(np.diff(offsets))) if n is None else n
+        self._m = len(neighbors) // 2
+
+    @staticmethod
+    def from_edge_arrays(src: np.ndarray, dst: np.ndarray, bound: int, index: str = ""):
+        """ Build from the endpoints of the undirected edges, every edge given once """
+        return CSRGraph(*csr_from_edges(src, dst, bound), index)
+
+    @staticmethod
+    def from_graph(graph: Graph):
+        """ Export a wrapped graph through its backend """
+        return CSRGraph(*graph._backend.csr(), graph.index)
+
+    def n(self) -> int:
+        return self._n
+
+    def m(self) -> int:
+        return self._m
+
+    @cached_property
+    def hydrator(self) -> np.ndarray:
+        """ The ids of the non-isolated nodes in increasing order, i.e. compact id -> id """
+        return np.flatnonzero(np.diff(self.offsets))
+
+    def nodes(self) -> Iterator[int]:
+        yield from np.asarray(self.hydrator).tolist()
+
+    def degree(self, u) -> int:
+        return int(self.offsets[u + 1] - self.offsets[u])
+
+    def neighbors(self, u) -> Iterator[int]:
+        yield from self.neighbors_arr[self.offsets[u]:self.offsets[u + 1]].tolist()
+
+    @cache
+    def mcd(self) -> int:
+        """ Get the minimum degree value """
+        degrees = np.diff(self.offsets)
+        degrees = degrees[degrees > 0]
+        return int(degrees.min()) if len(degrees) else 0
 
 
 class RealizedSubgraph(AbstractGraph):
@@ -275,7 +363,10 @@ class RealizedSubgraph(AbstractGraph):
     compacted: List[List[
         int]]  # (VR) compacted adjacency list that maps from index to nodes adjacent to index
     _dirty: bool  # (VR) has the graph been compacted ?
+    _slots: Optional[List[Dict[int, int]]] = None   # position of each compact id in the compacted rows, see _uncompact
     _graph: Graph
+    _labels: Optional[ClusterLabels] = None     # shared node labels of the clustering, see ClusterLabels
+    _label: int = -1
 
     def __init__(self,
                  intangible: IntangibleSubgraph = None,
@@ -286,10 +377,16 @@ class RealizedSubgraph(AbstractGraph):
         """ (VR) Convert nodelist into adjacency list """
         self.index = intangible.index
         self.nodeset = intangible.nodeset
+        _carry_label(intangible, self)
 
         # (VR) Construct adjacency list from the graph
         self.adj: Dict[int, set[int]] = {}
         self._graph = graph
+        if isinstance(graph, (Graph, CSRGraph, CSRSubgraph)):
+            # These graphs hand over all member rows at once, so no Python work per edge
+            ids = _sorted_ids(self.nodeset)
+            self._fill_from_csr(ids, *_induced_csr(ids, graph))
+            return
         for n in self.nodeset:
             if n not in self.adj:
                 self.adj[n] = set()
@@ -306,6 +403,22 @@ class RealizedSubgraph(AbstractGraph):
         self._dirty = True
         # self.recompact()
 
+    def _fill_from_csr(self, ids: np.ndarray, offsets: np.ndarray, local: np.ndarray):
+        """ Set the adjacency from a CSR over local ids, where local id i is node ids[i] """
+        members = ids.tolist()
+        flat = ids[local].tolist()
+        bounds = offsets.tolist()
+        gc_was_enabled = gc.isenabled()
+        gc.disable()                                    # a million fresh sets would otherwise trigger full collections
+        try:
+            self.adj = {u: set(flat[bounds[i]:bounds[i + 1]]) for i, u in enumerate(members)}
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        self._n = len(self.nodeset)
+        self._m = len(flat) // 2
+        self._dirty = True
+
     @staticmethod
     def from_adjlist(nodes, edges, cluster_id):
         subgraph = RealizedSubgraph()
@@ -345,6 +458,7 @@ class RealizedSubgraph(AbstractGraph):
         self.hydrator = hydrator
         self.inv = inv
         self.compacted = compacted
+        self._slots = None
         self._dirty = False  # (VR) Set dirty to be false since the graph was compacted
 
     def degree(self, u) -> int:
@@ -356,14 +470,61 @@ class RealizedSubgraph(AbstractGraph):
     def to_intangible(self, graph):
         return IntangibleSubgraph(list(self.nodeset), self.index)
 
+    def _uncompact(self, u: int):
+        """ Drop `u` from the compacted adjacency list, moving the node with the last compact id into its slot
+
+        Rows are updated by swap-remove through `_slots`, the position of every compact id in the rows
+        it appears in, so a deletion costs the degree of `u` and of the moved node, not a scan of any row.
+        The positions are indexed on the first deletion after a recompaction, which keeps recompact as cheap as before.
+        """
+        compacted = self.compacted
+        slots = self._slots
+        if slots is None:
+            slots = self._slots = [{v: k for k, v in enumerate(row)} for row in compacted]
+        i = self.inv.pop(u)
+        for v in self.adj[u]:
+            j = self.inv[v]
+            row, where = compacted[j], slots[j]
+            k = where.pop(i)
+            tail = row.pop()
+            if tail != i:
+                row[k] = tail
+                where[tail] = k
+        last = len(self.hydrator) - 1
+        moved = self.hydrator.pop()
+        moved_row = compacted.pop()
+        moved_slots = slots.pop()
+        if i != last:
+            for j in moved_row:
+                where = slots[j]
+                k = where.pop(last)
+                compacted[j][k] = i
+                where[i] = k
+            compacted[i] = moved_row
+            slots[i] = moved_slots
+            self.hydrator[i] = moved
+            self.inv[moved] = i
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_labels", None)          # the labels stay with the process that owns them
+        return state
+
     def remove_node(self, u: int):
+        if not self._dirty:  # Keep an existing compaction up to date instead of rebuilding it later
+            self._uncompact(u)
         self._n -= 1  # (VR) Adjust node count and adj list
         self._m -= len(self.adj[u])
         for v in self.adj[u]:
             self.adj[v].remove(u)
         del self.adj[u]
         self.nodeset.remove(u)
-        self._dirty = True  # (VR) The graph needs to be recompacted so set dirty to true
+        _discard_label(self, np.array([u]))
+
+    def remove_nodes(self, nodes: Iterable[int]):
+        """ Remove `nodes` in order """
+        for u in nodes:
+            self.remove_node(u)
 
     def n(self):
         return self._n
@@ -404,15 +565,17 @@ class RealizedSubgraph(AbstractGraph):
                 f.write(" ".join([str(v + 1) for v in u]) + "\n")
         return p
 
-    def as_compact_edgelist_filepath(self):
+    def compact_edges(self) -> List[Tuple[int, int]]:
+        """ The edges with compact ids, each once, in the order of the compact edgelist file """
         if self._dirty:
             self.recompact()
+        return [(u, v) for u, adj in enumerate(self.compacted) for v in adj if u < v]
+
+    def as_compact_edgelist_filepath(self):
         p = context.request_graph_related_path(self, "edgelist")
         with open(p, "w+") as f:
-            for u, adj in enumerate(self.compacted):
-                for v in adj:
-                    if u < v:
-                        f.write(f"{u}\t{v}\n")
+            for u, v in self.compact_edges():
+                f.write(f"{u}\t{v}\n")
         return p
 
     def as_compact_abc_edgelist_filepath(self):
@@ -446,18 +609,27 @@ class RealizedSubgraph(AbstractGraph):
                     ),
                     self._graph
                 ))
+        _split_label(self, partitions)
 
         return partitions
-    
+
+    def member_ids(self) -> np.ndarray:
+        """ The node ids of the subgraph in increasing order """
+        return _sorted_ids(self.nodeset)
+
+    def contains(self, nodes: np.ndarray) -> np.ndarray:
+        """ Which of `nodes` are in the subgraph, through the cluster labels when the subgraph has a live one """
+        if self._labels is not None and self._labels.owns(self._label):
+            return self._labels.contains(self._label, nodes)
+        return np.isin(nodes, self.member_ids())
+
     def internal_degree(self, u, graph: Graph) -> int:
-        return sum(1 for v in graph._data.iterNeighbors(u) if v in self.nodeset)
+        nbrs, _ = _neighbor_slices(np.array([u], dtype=np.int64), graph)
+        return int(self.contains(nbrs).sum())
 
     def get_border_edges(self, graph: Graph):
-        ret = 0
-        for v in self.nodeset:
-            neighbors = sum(1 for u in graph.neighbors(v) if u not in self.nodeset)
-            ret += neighbors
-        return ret
+        nbrs, _ = _neighbor_slices(self.member_ids(), graph)
+        return len(nbrs) - int(self.contains(nbrs).sum())
 
     def conductance(self, graph):
         num = self.get_border_edges(graph)
@@ -476,13 +648,18 @@ class RealizedSubgraph(AbstractGraph):
             self.recompact()
         return self.inv
 
+    def mincut_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ The node ids and both directions of every edge, as arrays (see hm01.mincut.to_pygraph) """
+        members = list(self.nodeset)
+        nodes = np.fromiter(members, dtype=np.int64, count=len(members))
+        degrees = np.fromiter((len(self.adj[u]) for u in members), dtype=np.int64, count=len(members))
+        dst = np.fromiter(
+            itertools.chain.from_iterable(self.adj[u] for u in members), dtype=np.int64, count=int(degrees.sum())
+        )
+        return nodes, np.repeat(nodes, degrees), dst
+
     def as_pygraph(self):
-        edges = []
-        nodes = list(self.nodeset)
-        for u in nodes:
-            for v in self.adj[u]:
-                edges.append((u, v))
-        return PyGraph(nodes, edges)
+        return mincut.to_pygraph(*self.mincut_arrays())
     
     def as_compact_networkit(self):
         # Recompact nodes if they are not currently
@@ -504,19 +681,517 @@ class RealizedSubgraph(AbstractGraph):
         return graph
 
 
+_DENSE_RELABEL_RATIO = 64      # relabel through an array over all ids once a subgraph has 1/64th of them
+
+
+def _sorted_ids(nodes) -> np.ndarray:
+    """ The distinct node ids of a list, set or array, in increasing order """
+    if isinstance(nodes, np.ndarray):
+        ids = np.sort(nodes.astype(np.int64))
+    else:
+        ids = np.sort(np.fromiter(nodes, dtype=np.int64, count=len(nodes)))
+    if len(ids) > 1:
+        ids = ids[np.concatenate(([True], ids[1:] != ids[:-1]))]
+    return ids
+
+
+def _neighbor_slices(ids: np.ndarray, graph: AbstractGraph) -> Tuple[np.ndarray, np.ndarray]:
+    """ The neighbors in `graph` of all `ids` concatenated, and how many each of them has
+
+    CSRGraph and the backend of a Graph hand over all rows at once; any other graph is walked node by node.
+    """
+    if isinstance(graph, Graph):
+        return graph._backend.neighbor_slices(ids)
+    if isinstance(graph, CSRGraph):
+        return gather_rows(graph.offsets, graph.neighbors_arr, ids)
+    adj = [list(graph.neighbors(u)) for u in ids.tolist()]
+    lengths = np.fromiter((len(a) for a in adj), dtype=np.int64, count=len(adj))
+    nbrs = np.fromiter(itertools.chain.from_iterable(adj), dtype=np.int64, count=int(lengths.sum()))
+    return nbrs, lengths
+
+
+def _induced_csr(ids: np.ndarray, graph: AbstractGraph) -> Tuple[np.ndarray, np.ndarray]:
+    """ CSR of the subgraph that the sorted node ids `ids` induce in `graph`, over local ids 0..len(ids)-1
+
+    The member rows are gathered in one go from CSRGraph and CSRSubgraph, and from the backend of a
+    Graph; any other graph is walked node by node. Neighbors outside of `ids` are dropped, the rest
+    keep the order of `graph`.
+    """
+    if isinstance(graph, CSRSubgraph):
+        rows = graph._local(ids)                            # work in the local ids of `graph`
+        nbrs, lengths = gather_rows(graph.offsets, graph.neighbors_arr, rows)
+        space = len(graph._ids)
+    else:
+        rows = ids
+        nbrs, lengths = _neighbor_slices(ids, graph)
+        if isinstance(graph, Graph):
+            space = graph._backend.bound()
+        elif isinstance(graph, CSRGraph):
+            space = len(graph.offsets) - 1
+        else:
+            space = None
+    src = np.repeat(np.arange(len(ids)), lengths)
+
+    # Keep the edges whose other end is in the subgraph too, renumbered to local ids. Large subgraphs
+    # use a relabeling array over the whole id space, small ones a binary search in their own ids.
+    if space is not None and len(ids) * _DENSE_RELABEL_RATIO >= space:
+        relabel = np.full(space, -1, dtype=np.int64)
+        relabel[rows] = np.arange(len(ids))
+        pos = relabel[nbrs]
+        keep = pos >= 0
+    else:
+        nbrs = nbrs.astype(rows.dtype, copy=False)
+        pos = np.searchsorted(rows, nbrs)
+        keep = pos < len(ids)
+        keep[keep] = rows[pos[keep]] == nbrs[keep]
+    if isinstance(graph, CSRSubgraph):
+        keep &= graph._alive[nbrs]
+    offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src[keep], minlength=len(ids)), out=offsets[1:])
+    return offsets, pos[keep]
+
+
+class CSRSubgraph(AbstractGraph):
+    """ Array-backed alternative to RealizedSubgraph, with the same interface
+
+    The nodes get local ids 0..N-1 in increasing order of their original ids (`_ids` maps back), and
+    the adjacency is a CSR over local ids. Removing a node only clears its `_alive` flag and updates
+    the degrees of its neighbors, so the arrays are never rebuilt. This takes a small fraction of the
+    memory of the dict-of-sets adjacency, and realizing from the global CSRGraph or from another
+    CSRSubgraph runs in NumPy.
+    """
+
+    def __init__(self, ids: np.ndarray, offsets: np.ndarray, neighbors: np.ndarray, index: str):
+        self.index = index
+        self._ids = ids
+        self.offsets = offsets
+        self.neighbors_arr = neighbors
+        self._alive = np.ones(len(ids), dtype=bool)
+        self._degrees = np.diff(offsets)
+        self._n = len(ids)
+        self._m = len(neighbors) // 2
+        self._nodeset = None
+        self._compact = None            # (alive local ids, compact id of every local id), while unchanged
+        self._labels: Optional[ClusterLabels] = None
+        self._label = -1
+
+    @staticmethod
+    def from_intangible(intangible: IntangibleSubgraph, graph: AbstractGraph) -> CSRSubgraph:
+        """ Realize `intangible` as the subgraph it induces in `graph` """
+        ids = _sorted_ids(intangible.subset)
+        offsets, local = _induced_csr(ids, graph)
+        sub = CSRSubgraph(ids, offsets, local, intangible.index)
+        _carry_label(intangible, sub)
+        return sub
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_labels"] = None             # the labels stay with the process that owns them
+        return state
+
+    def _local(self, u):
+        return np.searchsorted(self._ids, u)
+
+    def _local_neighbors(self, l: int) -> np.ndarray:
+        nbrs = self.neighbors_arr[self.offsets[l]:self.offsets[l + 1]]
+        return nbrs[self._alive[nbrs]]
+
+    def n(self) -> int:
+        return self._n
+
+    def m(self) -> int:
+        return self._m
+
+    def nodes(self) -> Iterator[int]:
+        yield from self._ids[self._alive].tolist()
+
+    @property
+    def nodeset(self):
+        if self._nodeset is None:
+            self._nodeset = set(self.nodes())
+        return self._nodeset
+
+    def degree(self, u) -> int:
+        return int(self._degrees[self._local(u)])
+
+    def neighbors(self, u) -> Iterator[int]:
+        yield from self._ids[self._local_neighbors(self._local(u))].tolist()
+
+    def remove_node(self, u: int):
+        l = self._local(u)
+        self._degrees[self._local_neighbors(l)] -= 1
+        self._m -= int(self._degrees[l])
+        self._degrees[l] = 0
+        self._alive[l] = False
+        self._n -= 1
+        if self._nodeset is not None:
+            self._nodeset.discard(u)
+        _discard_label(self, np.array([u]))
+        self._compact = None
+
+    def remove_nodes(self, nodes: Iterable[int]):
+        """ Remove `nodes` all at once, with the same result as removing them one by one """
+        ids = np.fromiter(nodes, dtype=np.int64)
+        l = self._local(ids)
+        self._alive[l] = False
+        nbrs, _ = gather_rows(self.offsets, self.neighbors_arr, l)
+        self._degrees -= np.bincount(nbrs[self._alive[nbrs]], minlength=len(self._ids))
+        self._degrees[l] = 0
+        self._m = int(self._degrees.sum()) // 2
+        self._n -= len(l)
+        if self._nodeset is not None:
+            self._nodeset.difference_update(ids.tolist())
+        _discard_label(self, ids)
+        self._compact = None
+
+    @cache
+    def mcd(self) -> int:
+        """ Get the minimum degree in the graph """
+        if self.n() == 0:
+            return 0
+        return int(self._degrees[self._alive].min())
+
+    def to_intangible(self, graph):
+        return IntangibleSubgraph(list(self.nodes()), self.index)
+
+    def _compacted(self) -> Tuple[np.ndarray, np.ndarray]:
+        """ Compact ids: the remaining nodes numbered 0..n-1, in increasing order of their original ids """
+        if self._compact is None:
+            alive = np.flatnonzero(self._alive)
+            compact = np.full(len(self._ids), -1, dtype=np.int64)
+            compact[alive] = np.arange(len(alive))
+            self._compact = (alive, compact)
+        return self._compact
+
+    @property
+    def hydrator(self) -> List[int]:
+        alive, _ = self._compacted()
+        return self._ids[alive].tolist()
+
+    @property
+    def continuous_ids(self) -> Dict[int, int]:
+        return {u: i for i, u in enumerate(self.hydrator)}
+
+    def _local_edges(self) -> Tuple[np.ndarray, np.ndarray]:
+        """ Both directions of every remaining edge, as local ids """
+        src = np.repeat(np.arange(len(self._ids)), np.diff(self.offsets))
+        keep = self._alive[src] & self._alive[self.neighbors_arr]
+        return src[keep], self.neighbors_arr[keep]
+
+    def compact_edges(self) -> List[Tuple[int, int]]:
+        """ The edges with compact ids, each once, in the order of the compact edgelist file """
+        _, compact = self._compacted()
+        src, dst = self._local_edges()
+        once = src < dst
+        return list(zip(compact[src[once]].tolist(), compact[dst[once]].tolist()))
+
+    def to_igraph(self):
+        import igraph as ig
+        return ig.Graph(self.n(), self.compact_edges())
+
+    def as_metis_filepath(self):
+        alive, compact = self._compacted()
+        p = context.request_graph_related_path(self, "metis")
+        with open(p, "w+") as f:
+            f.write(f"{self.n()} {self.m()}\n")
+            for l in alive.tolist():
+                f.write(" ".join(str(v + 1) for v in compact[self._local_neighbors(l)].tolist()) + "\n")
+        return p
+
+    def as_compact_edgelist_filepath(self):
+        p = context.request_graph_related_path(self, "edgelist")
+        with open(p, "w+") as f:
+            for u, v in self.compact_edges():
+                f.write(f"{u}\t{v}\n")
+        return p
+
+    def as_compact_abc_edgelist_filepath(self):
+        p = context.request_graph_related_path(self, "abc_edgelist")
+        with open(p, "w+") as f:
+            for u, v in self.compact_edges():
+                f.write(f"{u}\t{v}\t1\n")
+        return p
+
+    def find_mincut(self, mincut_type: str) -> MincutResult:
+        """ Compute mincut via the wrapped VieCut """
+        return mincut.viecut(self, mincut_type)
+
+    def cut_by_mincut(self, mincut_res: MincutResult) -> List[CSRSubgraph]:
+        """ Cut the graph by the mincut result """
+        partitions = [
+            CSRSubgraph.from_intangible(
+                IntangibleSubgraph(partition, self.index + encode_to_26_ary(i + 1)), self
+            )
+            for i, partition in enumerate(mincut_res)
+            if i < len(mincut_res) - 1
+        ]
+        _split_label(self, partitions)
+        return partitions
+
+    def member_ids(self) -> np.ndarray:
+        """ The node ids of the subgraph in increasing order """
+        return self._ids[self._alive]
+
+    # These only look at the node set, so they work the same on both representations
+    contains = RealizedSubgraph.contains
+    internal_degree = RealizedSubgraph.internal_degree
+    get_border_edges = RealizedSubgraph.get_border_edges
+    conductance = RealizedSubgraph.conductance
+
+    def mincut_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ The node ids and both directions of every edge, as arrays (see hm01.mincut.to_pygraph) """
+        src, dst = self._local_edges()
+        return self._ids[self._alive], self._ids[src], self._ids[dst]
+
+    def as_pygraph(self):
+        return mincut.to_pygraph(*self.mincut_arrays())
+
+    def as_compact_networkit(self):
+        graph = nk.Graph(n=self.n())
+        for u, v in self.compact_edges():
+            graph.addEdge(u, v)
+        graph.indexEdges()
+        return graph
+
+
+class ClusterLabels:
+    """ The cluster of every node, shared by the subgraphs of one clustering
+
+    `label[u]` is the label of the cluster that holds node `u`, or -1. A subgraph that carries a label
+    tests membership for any number of nodes with one lookup in this array. The labels follow the
+    clusters as CM works on them: removed nodes lose their label, and the parts of a split cluster get
+    fresh labels, which retires the label of the cluster itself. Holders of a retired label test
+    membership with their own node ids again.
+
+    A realization shares the label of the subgraph it realizes until it loses a node. It then moves to a
+    fresh label of its own, so removing nodes from a realization never changes what the subgraph it
+    came from contains.
+
+    The labels belong to one process; subgraphs pickled for another process leave them behind.
+    """
+
+    def __init__(self, label: np.ndarray, count: int):
+        self.label = label
+        self._next = count                  # the next fresh label
+        self._retired: Set[int] = set()
+        self._shared: Set[int] = set()      # labels held by a subgraph and a realization of it
+
+    @staticmethod
+    def attach(clusters: List[IntangibleSubgraph], bound: int = 0) -> Optional[ClusterLabels]:
+        """ Label disjoint `clusters` by their position and attach the labels to them
+
+        `bound` is the number of node ids to cover at least. Overlapping clusters cannot share one label
+        per node, and the array would not fit for node ids beyond int32, so then the clusters are left as
+        they are and None is returned.
+        """
+        sizes, nodes = member_arrays(clusters)
+        if len(nodes) and (nodes.min() < 0 or nodes.max() >= 2**31):
+            return None
+        owner = np.repeat(np.arange(len(clusters), dtype=np.int32), sizes)
+        label = np.full(max(bound, int(nodes.max()) + 1 if len(nodes) else 0), -1, dtype=np.int32)
+        label[nodes] = owner
+        if not np.array_equal(label[nodes], owner):
+            return None
+        labels = ClusterLabels(label, len(clusters))
+        for i, c in enumerate(clusters):
+            c._labels, c._label = labels, i
+        return labels
+
+    def owns(self, label: int) -> bool:
+        """ Whether `label` still stands for the nodes that carry it """
+        return label >= 0 and label not in self._retired
+
+    def contains(self, label: int, nodes: np.ndarray) -> np.ndarray:
+        """ Which of `nodes` carry `label` """
+        inside = (nodes >= 0) & (nodes < len(self.label))
+        inside[inside] = self.label[nodes[inside]] == label
+        return inside
+
+    def share(self, label: int):
+        """ Mark `label` as held by more than one subgraph """
+        self._shared.add(label)
+
+    def shared(self, label: int) -> bool:
+        return label in self._shared
+
+    def discard(self, label: int, nodes: np.ndarray):
+        """ Take `nodes` out of the cluster `label` """
+        if self.owns(label):
+            self.label[nodes] = -1
+
+    def split(self, label: int, parts: List[np.ndarray]) -> List[int]:
+        """ Give each of `parts` of the cluster `label` a fresh label, and retire `label` """
+        self._retired.add(label)
+        fresh = list(range(self._next, self._next + len(parts)))
+        self._next += len(parts)
+        for l, nodes in zip(fresh, parts):
+            self.label[nodes] = l
+        return fresh
+
+
+def _carry_label(source, target):
+    """ Let `target`, a realization of `source`, use the label of `source` while it is live """
+    labels = source._labels
+    if labels is not None and labels.owns(source._label):
+        labels.share(source._label)
+        target._labels, target._label = labels, source._label
+
+
+def _discard_label(graph, nodes: np.ndarray):
+    """ Take `nodes`, just removed from `graph`, out of its label
+
+    A shared label still answers for the subgraph `graph` was realized from, so instead `graph` moves
+    its remaining members to a fresh label, which retires the shared one.
+    """
+    labels = graph._labels
+    if labels is None or not labels.owns(graph._label):
+        return
+    if labels.shared(graph._label):
+        graph._label, = labels.split(graph._label, [graph.member_ids()])
+    else:
+        labels.discard(graph._label, nodes)
+
+
+def _split_label(graph, partitions):
+    """ Move the label of `graph` over to the `partitions` it was cut into """
+    labels = graph._labels
+    if labels is not None and labels.owns(graph._label):
+        fresh = labels.split(graph._label, [p.member_ids() for p in partitions])
+        for p, l in zip(partitions, fresh):
+            p._labels, p._label = labels, l
+
+
+def member_arrays(clusters: List[IntangibleSubgraph]) -> Tuple[np.ndarray, np.ndarray]:
+    """ The size of every cluster, and the members of all clusters back to back in the same order """
+    sizes = np.fromiter((len(c.subset) for c in clusters), dtype=np.int64, count=len(clusters))
+    if not clusters:
+        return sizes, np.zeros(0, dtype=np.int64)
+    return sizes, np.concatenate([c._node_array() for c in clusters])
+
+
+def membership_csr(
+    clusters: List[IntangibleSubgraph], graph: CSRGraph
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """ The subgraphs of many disjoint clusters as one CSR, with a single sweep over the edges of `graph`
+
+    Every node gets the position of its cluster in a label array, and the edges whose two ends share a
+    label are kept and grouped by label. Returns `(nodes, starts, offsets, neighbors)`: the members of
+    cluster `i` are `nodes[starts[i]:starts[i + 1]]` in increasing order, and the rows of `offsets` and
+    `neighbors` follow `nodes`, with the neighbors given as positions in `nodes`. This is O(n + m) in
+    total, however many clusters there are.
+    """
+    sizes, nodes = member_arrays(clusters)
+    owner = np.repeat(np.arange(len(clusters)), sizes)
+
+    # Sort the memberships by cluster, then node id, and drop repeated nodes within a cluster
+    order = np.lexsort((nodes, owner))
+    nodes, owner = nodes[order], owner[order]
+    if len(nodes) > 1:
+        first = np.concatenate(([True], (nodes[1:] != nodes[:-1]) | (owner[1:] != owner[:-1])))
+        nodes, owner = nodes[first], owner[first]
+    starts = np.zeros(len(clusters) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owner, minlength=len(clusters)), out=starts[1:])
+
+    bound = len(graph.offsets) - 1
+    label = np.full(max(bound, int(nodes.max()) + 1 if len(nodes) else 0), -1, dtype=np.int64)
+    label[nodes] = owner
+    if not np.array_equal(label[nodes], owner):
+        raise ValueError("Clusters overlap; they can only be realized one by one")
+
+    # Keep the edges inside a cluster and group them by cluster; sources stay in increasing order
+    src = np.repeat(np.arange(bound), np.diff(graph.offsets))
+    dst = graph.neighbors_arr
+    keep = label[src] >= 0
+    keep[keep] = label[src[keep]] == label[dst[keep]]
+    src, dst = src[keep], dst[keep]
+    by_cluster = np.argsort(label[src], kind="stable")
+    src, dst = src[by_cluster], dst[by_cluster]
+
+    # One CSR over all memberships at once; the rows of a cluster are a contiguous slice of it
+    position = np.zeros(len(label), dtype=np.int64)
+    position[nodes] = np.arange(len(nodes))
+    offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(position[src], minlength=len(nodes)), out=offsets[1:])
+    return nodes, starts, offsets, position[dst]
+
+
+def realize_clusters(
+    clusters: List[IntangibleSubgraph], graph: CSRGraph, representation: str = "dict"
+) -> List[Union[RealizedSubgraph, CSRSubgraph]]:
+    """ Realize many disjoint clusters at once, with a single sweep over the edges of `graph`
+
+    The clusters are cut out of the CSR of `membership_csr`, so this is O(n + m) in total. The result
+    is the same as `c.realize(graph, representation)` for every cluster `c`, in the same order.
+    """
+    nodes, starts, all_offsets, positions = membership_csr(clusters, graph)
+    # local ids, within the cluster of each edge
+    all_neighbors = positions - np.repeat(starts[:-1], np.diff(all_offsets[starts]))
+
+    realized: List[Union[RealizedSubgraph, CSRSubgraph]] = []
+    for i, c in enumerate(clusters):
+        begin, end = starts[i], starts[i + 1]
+        ids = nodes[begin:end]
+        offsets = all_offsets[begin:end + 1] - all_offsets[begin]
+        neighbors = all_neighbors[all_offsets[begin]:all_offsets[end]]
+        if representation == "csr":
+            sub = CSRSubgraph(ids, offsets, neighbors, c.index)
+        else:
+            sub = RealizedSubgraph()
+            sub.index = c.index
+            sub.nodeset = c.nodeset
+            sub._graph = graph
+            sub._fill_from_csr(ids, offsets, neighbors)
+        _carry_label(c, sub)
+        realized.append(sub)
+    return realized
+
+
 @dataclass
 class IntangibleSubgraph:
-    """ A yet to be realized subgraph, containing only the node ids """
-    subset: List[int]
+    """ A yet to be realized subgraph, containing only the node ids
+
+    `subset` is a list, or a view into the shared member array of a whole clustering (see
+    `from_assignment_arrays`). Clusters of a disjoint clustering also share ClusterLabels, which
+    answer membership without a set of their own.
+    """
+    __slots__ = ("subset", "index", "_labels", "_label", "_nodeset")     # millions of these can be loaded at once
+    subset: Union[List[int], np.ndarray]
     index: str
 
-    def realize(self, graph: Graph) -> RealizedSubgraph:
-        """ Realize the subgraph """
+    def __post_init__(self):
+        self._labels: Optional[ClusterLabels] = None
+        self._label = -1
+        self._nodeset = None
+
+    def realize(self, graph: Graph, representation: Optional[str] = None) -> Union[RealizedSubgraph, CSRSubgraph]:
+        """ Realize the subgraph
+
+        `representation` is "dict" for a RealizedSubgraph or "csr" for a CSRSubgraph. By default, subgraphs
+        of a CSRSubgraph are CSRSubgraphs too and anything else is realized as a RealizedSubgraph.
+        """
+        if representation is None:
+            representation = "csr" if isinstance(graph, CSRSubgraph) else "dict"
+        if representation == "csr":
+            return CSRSubgraph.from_intangible(self, graph)
         return RealizedSubgraph(self, graph)
 
     def __len__(self):
         return len(self.subset)
 
+    def __eq__(self, other):
+        if not isinstance(other, IntangibleSubgraph):
+            return NotImplemented
+        return self.index == other.index and list(self.nodes()) == list(other.nodes())
+
+    def __getstate__(self):
+        # The labels cover the whole clustering; a copy sent elsewhere tests membership by itself
+        return {"subset": self.subset, "index": self.index, "_nodeset": self._nodeset}
+
+    def __setstate__(self, state):
+        self.__post_init__()
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def n(self):
         return len(self)
 
@@ -533,30 +1208,91 @@ class IntangibleSubgraph:
             raise ValueError("No non-singleton clusters found. Aborting.")
         return res
 
-    @cached_property
+    @staticmethod
+    def from_assignment_arrays(nodes: np.ndarray, codes: np.ndarray, names: List[str]) -> List[IntangibleSubgraph]:
+        """ The clusters of the assignments `nodes[i]` -> `names[codes[i]]`, in the order of `names`
+
+        The members of all clusters are stored back to back in one int array and every cluster is a
+        view of its part, in the order of the assignments. When no node is assigned to two clusters,
+        the clusters also share ClusterLabels for their membership tests.
+        """
+        k = len(names)
+        order = np.argsort(codes, kind="stable")
+        dtype = np.int32 if len(nodes) == 0 or nodes.max() < 2**31 else np.int64
+        members = nodes[order].astype(dtype)
+        owner = codes[order]
+        starts = np.zeros(k + 1, dtype=np.int64)
+        np.cumsum(np.bincount(owner, minlength=k), out=starts[1:])
+        clusters = [IntangibleSubgraph(members[starts[i]:starts[i + 1]], str(name)) for i, name in enumerate(names)]
+        ClusterLabels.attach(clusters)
+        return clusters
+
+    @staticmethod
+    def from_assignment_file(filepath: str) -> List[IntangibleSubgraph]:
+        """ The clusters of a "node_id cluster_id" file, in the order their ids first appear """
+        try:
+            df = pd.read_csv(filepath, sep=r"\s+", header=None, names=["node", "cluster"],
+                             dtype={"node": np.int64, "cluster": "category"})
+        except pd.errors.EmptyDataError:
+            return []
+        nodes = df["node"].to_numpy()
+        codes = df["cluster"].cat.codes.to_numpy()
+        names = df["cluster"].cat.categories
+        del df
+        if (codes < 0).any():
+            raise ValueError(f"{filepath}: every line needs a node id and a cluster id")
+
+        # Renumber the clusters in the order their ids first appear
+        _, first = np.unique(codes, return_index=True)
+        order = np.argsort(first)
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        return IntangibleSubgraph.from_assignment_arrays(nodes, rank[codes], list(names[order]))
+
+    @property
     def nodeset(self):
-        return set(self.subset)
+        if self._nodeset is None:
+            self._nodeset = set(self.nodes())
+        return self._nodeset
+
+    def _node_array(self) -> np.ndarray:
+        return np.asarray(self.subset, dtype=np.int64)
+
+    def contains(self, nodes: np.ndarray) -> np.ndarray:
+        """ Which of `nodes` are in the subgraph, through the cluster labels when the subgraph has a live one """
+        if self._labels is not None and self._labels.owns(self._label):
+            return self._labels.contains(self._label, nodes)
+        return np.isin(nodes, self._node_array())
+
+    def _internal(self, graph: Graph) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ The neighbors in `graph` of every member concatenated, how many each member has, and which are members """
+        nbrs, lengths = _neighbor_slices(self._node_array(), graph)
+        return nbrs, lengths, self.contains(nbrs)
 
     def edges(self, graph: Graph) -> Iterator[Tuple[int, int]]:
-        for n in self.subset:
-            for e in graph._data.iterNeighbors(n):
-                if e in self.nodeset:
-                    yield n, e
+        nbrs, lengths, inside = self._internal(graph)
+        src = np.repeat(self._node_array(), lengths)
+        return zip(src[inside].tolist(), nbrs[inside].tolist())
 
     def nodes(self) -> Iterator[int]:
+        if isinstance(self.subset, np.ndarray):
+            return iter(self.subset.tolist())
         return iter(self.subset)
 
     def count_edges(self, global_graph: Graph):
-        return sum(1 for _ in self.edges(global_graph)) // 2
+        _, _, inside = self._internal(global_graph)
+        return int(inside.sum()) // 2
 
     def internal_degree(self, u, graph: Graph) -> int:
-        return sum(1 for v in graph._data.iterNeighbors(u)
-                   if v in self.nodeset)
+        nbrs, _ = _neighbor_slices(np.array([u], dtype=np.int64), graph)
+        return int(self.contains(nbrs).sum())
 
     def count_mcd(self, graph: Graph) -> int:
         if self.n() == 0:
             return 0
-        return min(self.internal_degree(u, graph) for u in self.subset)
+        _, lengths, inside = self._internal(graph)
+        src = np.repeat(np.arange(self.n()), lengths)
+        return int(np.bincount(src[inside], minlength=self.n()).min())
 
     def is_tree_like(self, global_graph: Graph) -> bool:
         m = self.count_edges(global_graph)
@@ -0,0 +1,361 @@
+"""Storage backends beneath hm01.graph.Graph
+
+A backend holds the adjacency of a graph whose node ids are the original ids of the network, and
+offers it through bulk primitives over NumPy arrays: the degrees and the neighbor slices of
+many nodes at once, the subgraph induced by a set of ids and the export to CSR that the workers and
+the compaction of Graph are built from. Three backends are available:
+
+    networkit   : a networkit graph, as hm01 has always used
+    csr         : offset and neighbor arrays (see hm01.graph.CSRGraph), never expanded into objects
+    igraph      : an igraph graph with one vertex per id below the id bound
+
+Every backend exports the same CSR for the same network, so the choice of backend does not change
+the output of CM.
+"""
+from __future__ import annotations
+
+import itertools
+from abc import abstractmethod
+from typing import Dict, Iterator, Tuple, Type
+
+import networkit as nk
+import numpy as np
+
+
+def csr_from_edges(src: np.ndarray, dst: np.ndarray, bound: int) -> Tuple[np.ndarray, np.ndarray]:
+    """ Offsets and neighbors of the undirected edges `src[i]`-`dst[i]`, every edge given once """
+    both_src = np.concatenate([src, dst])
+    both_dst = np.concatenate([dst, src])
+    order = np.argsort(both_src, kind="stable")
+    dtype = np.int32 if bound < np.iinfo(np.int32).max else np.int64
+    neighbors = both_dst[order].astype(dtype)
+    offsets = np.zeros(bound + 1, dtype=np.int64)
+    np.cumsum(np.bincount(both_src, minlength=bound), out=offsets[1:])
+    return offsets, neighbors
+
+
+def gather_rows(offsets: np.ndarray, neighbors: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ Concatenate the neighbor slices of `rows` of a CSR graph; also returns the slice lengths """
+    starts = offsets[rows]
+    lengths = offsets[rows + 1] - starts
+    row_begin = np.cumsum(lengths) - lengths                 # where each row begins in the output
+    idx = np.repeat(starts - row_begin, lengths) + np.arange(int(lengths.sum()))
+    return neighbors[idx], lengths
+
+
+def _flatten(adj) -> Tuple[np.ndarray, np.ndarray]:
+    """ Neighbor slices of lists of neighbors """
+    lengths = np.fromiter((len(a) for a in adj), dtype=np.int64, count=len(adj))
+    nbrs = np.fromiter(itertools.chain.from_iterable(adj), dtype=np.int64, count=int(lengths.sum()))
+    return nbrs, lengths
+
+
+def _edges_of_csr(offsets: np.ndarray, neighbors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ Every edge of a CSR once, as (u, v) with u <= v in the order of the rows """
+    rows = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    once = rows <= neighbors
+    return rows[once], np.asarray(neighbors[once], dtype=np.int64)
+
+
+class GraphBackend:
+    """ Adjacency of a graph over the original node ids, with bulk primitives """
+    name: str
+
+    @staticmethod
+    @abstractmethod
+    def from_csr(offsets: np.ndarray, neighbors: np.ndarray) -> GraphBackend:
+        """ Build from a CSR whose non-isolated ids are the nodes """
+        pass
+
+    @abstractmethod
+    def n(self) -> int:
+        pass
+
+    @abstractmethod
+    def m(self) -> int:
+        pass
+
+    @abstractmethod
+    def bound(self) -> int:
+        """ Upper bound of the node ids """
+        pass
+
+    @abstractmethod
+    def node_array(self) -> np.ndarray:
+        """ The node ids in increasing order """
+        pass
+
+    @abstractmethod
+    def degrees(self, nodes: np.ndarray) -> np.ndarray:
+        """ The degrees of `nodes` """
+        pass
+
+    @abstractmethod
+    def degree(self, u) -> int:
+        pass
+
+    @abstractmethod
+    def neighbors(self, u) -> Iterator[int]:
+        pass
+
+    @abstractmethod
+    def neighbor_slices(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """ The neighbors of all `rows` concatenated, and the number of neighbors of each row """
+        pass
+
+    @abstractmethod
+    def edge_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """ Every edge once, as (u, v) with u <= v, grouped by u """
+        pass
+
+    def csr(self) -> Tuple[np.ndarray, np.ndarray]:
+        """ Offsets and neighbors of the graph over the original ids """
+        return csr_from_edges(*self.edge_arrays(), self.bound())
+
+    @abstractmethod
+    def remove_self_loops(self):
+        pass
+
+    @abstractmethod
+    def remove_nodes(self, nodes: np.ndarray):
+        """ Remove the `nodes` and their edges; the other nodes stay even if they become isolated """
+        pass
+
+    @abstractmethod
+    def induced_subgraph(self, ids: np.ndarray) -> GraphBackend:
+        """ The subgraph induced by the node ids `ids`, a new backend of the same kind """
+        pass
+
+
+class NetworkitBackend(GraphBackend):
+    """ A networkit graph """
+    name = "networkit"
+
+    def __init__(self, graph):
+        self._graph = graph
+
+    @staticmethod
+    def from_csr(offsets: np.ndarray, neighbors: np.ndarray) -> NetworkitBackend:
+        bound = len(offsets) - 1
+        src, dst = _edges_of_csr(offsets, neighbors)
+        if hasattr(nk, "GraphFromCoo"):
+            graph = nk.GraphFromCoo((src, dst), n=bound)
+        else:
+            graph = nk.graph.Graph(bound)
+            for u, v in zip(src.tolist(), dst.tolist()):
+                graph.addEdge(u, v)
+        return NetworkitBackend(graph)
+
+    def n(self) -> int:
+        return self._graph.numberOfNodes()
+
+    def m(self) -> int:
+        return self._graph.numberOfEdges()
+
+    def bound(self) -> int:
+        return self._graph.upperNodeIdBound()
+
+    def node_array(self) -> np.ndarray:
+        return np.fromiter(self._graph.iterNodes(), dtype=np.int64, count=self.n())
+
+    def degrees(self, nodes: np.ndarray) -> np.ndarray:
+        return np.fromiter((self._graph.degree(u) for u in nodes.tolist()), dtype=np.int64, count=len(nodes))
+
+    def degree(self, u) -> int:
+        return self._graph.degree(u)
+
+    def neighbors(self, u) -> Iterator[int]:
+        return self._graph.iterNeighbors(u)
+
+    def neighbor_slices(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return _flatten([list(self._graph.iterNeighbors(u)) for u in rows.tolist()])
+
+    def edge_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        flat = np.fromiter(
+            (x for e in self._graph.iterEdges() for x in e), dtype=np.int64, count=2 * self.m()
+        )
+        return flat[0::2], flat[1::2]
+
+    def remove_self_loops(self):
+        self._graph.removeSelfLoops()
+
+    def remove_nodes(self, nodes: np.ndarray):
+        for u in nodes.tolist():
+            self._graph.removeNode(u)
+
+    def induced_subgraph(self, ids: np.ndarray) -> NetworkitBackend:
+        return NetworkitBackend(nk.graphtools.subgraphFromNodes(self._graph, ids.tolist()))
+
+
+class CSRBackend(GraphBackend):
+    """ Offset and neighbor arrays over the original ids, plus a mask of the ids that are nodes
+
+    The arrays are used as they are, so a graph memory-mapped by hm01.graph_store stays mapped.
+    Removing nodes writes new arrays instead.
+    """
+    name = "csr"
+
+    def __init__(self, offsets: np.ndarray, neighbors: np.ndarray, present: np.ndarray = None):
+        self.offsets = offsets
+        self.neighbors_arr = neighbors
+        self._present = np.diff(offsets) > 0 if present is None else present
+        self._n = int(np.count_nonzero(self._present))
+
+    @staticmethod
+    def from_csr(offsets: np.ndarray, neighbors: np.ndarray) -> CSRBackend:
+        return CSRBackend(offsets, neighbors)
+
+    def n(self) -> int:
+        return self._n
+
+    def m(self) -> int:
+        return len(self.neighbors_arr) // 2
+
+    def bound(self) -> int:
+        return len(self.offsets) - 1
+
+    def node_array(self) -> np.ndarray:
+        return np.flatnonzero(self._present)
+
+    def degrees(self, nodes: np.ndarray) -> np.ndarray:
+        return self.offsets[nodes + 1] - self.offsets[nodes]
+
+    def degree(self, u) -> int:
+        return int(self.offsets[u + 1] - self.offsets[u])
+
+    def neighbors(self, u) -> Iterator[int]:
+        return iter(self.neighbors_arr[self.offsets[u]:self.offsets[u + 1]].tolist())
+
+    def neighbor_slices(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return gather_rows(self.offsets, self.neighbors_arr, rows)
+
+    def edge_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        return _edges_of_csr(self.offsets, self.neighbors_arr)
+
+    def csr(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self.offsets, self.neighbors_arr
+
+    def _rows(self) -> np.ndarray:
+        """ The row of every neighbor entry """
+        degrees = np.diff(self.offsets)
+        nonempty = np.flatnonzero(degrees)
+        return np.repeat(nonempty, degrees[nonempty])
+
+    def _keep_entries(self, keep: np.ndarray):
+        """ Drop the neighbor entries that are not in `keep` """
+        rows = self._rows()
+        offsets = np.zeros(len(self.offsets), dtype=np.int64)
+        np.cumsum(np.bincount(rows[keep], minlength=self.bound()), out=offsets[1:])
+        self.offsets = offsets
+        self.neighbors_arr = self.neighbors_arr[keep]
+
+    def remove_self_loops(self):
+        loops = self._rows() == self.neighbors_arr
+        if loops.any():
+            self._keep_entries(~loops)
+
+    def remove_nodes(self, nodes: np.ndarray):
+        if len(nodes) == 0:
+            return
+        present = self._present.copy()
+        present[nodes] = False
+        if self.degrees(nodes).any():
+            self._keep_entries(present[self._rows()] & present[self.neighbors_arr])
+        self._present = present
+        self._n = int(np.count_nonzero(present))
+
+    def induced_subgraph(self, ids: np.ndarray) -> CSRBackend:
+        member = np.zeros(self.bound(), dtype=bool)
+        member[ids] = True
+        member &= self._present
+        rows = np.flatnonzero(member)
+        nbrs, lengths = gather_rows(self.offsets, self.neighbors_arr, rows)
+        keep = member[nbrs]
+        degrees = np.zeros(self.bound(), dtype=np.int64)
+        degrees[rows] = np.bincount(np.repeat(np.arange(len(rows)), lengths)[keep], minlength=len(rows))
+        offsets = np.zeros(len(self.offsets), dtype=np.int64)
+        np.cumsum(degrees, out=offsets[1:])
+        return CSRBackend(offsets, nbrs[keep], member)
+
+
+class IGraphBackend(GraphBackend):
+    """ An igraph graph with vertices 0..bound-1, plus a mask of the vertices that are nodes
+
+    igraph numbers its vertices consecutively, so ids that are not nodes are kept as isolated vertices.
+    """
+    name = "igraph"
+
+    def __init__(self, graph, present: np.ndarray = None):
+        self._graph = graph
+        self._present = np.asarray(graph.degree(), dtype=np.int64) > 0 if present is None else present
+        self._n = int(np.count_nonzero(self._present))
+
+    @staticmethod
+    def _from_edges(src: np.ndarray, dst: np.ndarray, bound: int):
+        import igraph as ig
+
+        return ig.Graph(n=bound, edges=list(zip(src.tolist(), dst.tolist())))
+
+    @staticmethod
+    def from_csr(offsets: np.ndarray, neighbors: np.ndarray) -> IGraphBackend:
+        return IGraphBackend(IGraphBackend._from_edges(*_edges_of_csr(offsets, neighbors), len(offsets) - 1))
+
+    def n(self) -> int:
+        return self._n
+
+    def m(self) -> int:
+        return self._graph.ecount()
+
+    def bound(self) -> int:
+        return self._graph.vcount()
+
+    def node_array(self) -> np.ndarray:
+        return np.flatnonzero(self._present)
+
+    def degrees(self, nodes: np.ndarray) -> np.ndarray:
+        return np.asarray(self._graph.degree(nodes.tolist()), dtype=np.int64)
+
+    def degree(self, u) -> int:
+        return self._graph.degree(u)
+
+    def neighbors(self, u) -> Iterator[int]:
+        return iter(self._graph.neighbors(u))
+
+    def neighbor_slices(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return _flatten(self._graph.neighborhood(rows.tolist(), mindist=1))
+
+    def edge_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        # igraph keeps the edges in insertion order, each as (smaller, larger) end
+        edges = np.array(self._graph.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+        return edges[:, 0], edges[:, 1]
+
+    def remove_self_loops(self):
+        src, dst = self.edge_arrays()
+        loops = np.flatnonzero(src == dst)
+        if len(loops):
+            self._graph.delete_edges(loops.tolist())
+
+    def remove_nodes(self, nodes: np.ndarray):
+        if len(nodes) == 0:
+            return
+        self._present = self._present.copy()
+        self._present[nodes] = False
+        if self.degrees(nodes).any():
+            src, dst = self.edge_arrays()
+            self._graph.delete_edges(np.flatnonzero(~(self._present[src] & self._present[dst])).tolist())
+        self._n = int(np.count_nonzero(self._present))
+
+    def induced_subgraph(self, ids: np.ndarray) -> IGraphBackend:
+        member = np.zeros(self.bound(), dtype=bool)
+        member[ids] = True
+        member &= self._present
+        rows = np.flatnonzero(member)
+        nbrs, lengths = self.neighbor_slices(rows)
+        src = np.repeat(rows, lengths)
+        keep = member[nbrs] & (src <= nbrs)
+        return IGraphBackend(self._from_edges(src[keep], nbrs[keep], self.bound()), member)
+
+
+BACKENDS: Dict[str, Type[GraphBackend]] = {
+    backend.name: backend for backend in (NetworkitBackend, CSRBackend, IGraphBackend)
+}
@@ -0,0 +1,193 @@
+"""Compile an edge list once into a binary CSR file that every pipeline stage can memory-map
+
+The file holds the CSRGraph of the network exactly as `hm01.cm` would build it from the edge list,
+so loading it skips parsing entirely. The arrays are mapped read-only, which means concurrent
+processes share the page cache instead of each keeping a private copy of the network.
+
+Layout (little-endian, every section 8-byte aligned):
+    header      : magic, format version, neighbor item size, id bound, neighbor entries, node count
+    offsets     : int64[bound + 1]
+    neighbors   : int32 or int64[entries]
+    ids         : int64[nodes], the ids of the non-isolated nodes in increasing order (compact id -> id)
+"""
+from __future__ import annotations
+
+import os
+import struct
+
+import networkit as nk
+import numpy as np
+import pandas as pd
+import typer
+
+from hm01.graph import CSRGraph, Graph
+
+MAGIC = b"HM01CSR\0"
+VERSION = 1
+_HEADER = struct.Struct("<8sIIQQQ")
+_HEADER_SIZE = 64
+_KEY_LIMIT = np.iinfo(np.int64).max     # read_edgelist sorts composite keys only while they fit in an int64
+
+
+def _aligned(pos: int) -> int:
+    return (pos + 7) // 8 * 8
+
+
+def is_store(path: str) -> bool:
+    """ Whether `path` is a compiled graph rather than an edge list """
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_store(graph: CSRGraph, path: str):
+    """ Write `graph` to `path` in the compiled format """
+    bound = len(graph.offsets) - 1
+    ids = np.asarray(graph.hydrator, dtype=np.int64)
+    neighbors = np.ascontiguousarray(graph.neighbors_arr)
+    header = _HEADER.pack(MAGIC, VERSION, neighbors.dtype.itemsize, bound, len(neighbors), len(ids))
+    with open(path + ".tmp", "wb") as f:
+        f.write(header.ljust(_HEADER_SIZE, b"\0"))
+        for arr in (np.ascontiguousarray(graph.offsets, dtype=np.int64), neighbors, ids):
+            f.write(b"\0" * (_aligned(f.tell()) - f.tell()))
+            f.write(arr.tobytes())
+    os.replace(path + ".tmp", path)         # never leave a half-written graph behind
+
+
+def _map(path: str, dtype, pos: int, count: int) -> np.ndarray:
+    if count == 0:
+        return np.zeros(0, dtype=dtype)     # empty sections cannot be mapped
+    return np.memmap(path, dtype=dtype, mode="r", offset=pos, shape=(count,))
+
+
+def load_csr(path: str, index: str = "") -> CSRGraph:
+    """ Memory-map a compiled graph; nothing is read until it is used """
+    with open(path, "rb") as f:
+        magic, version, itemsize, bound, entries, n = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a compiled graph")
+    if version != VERSION:
+        raise ValueError(f"{path} has format version {version}, expected {VERSION}; compile the network again")
+
+    pos = _HEADER_SIZE
+    offsets = _map(path, np.int64, pos, bound + 1)
+    pos = _aligned(pos + offsets.nbytes)
+    neighbors = _map(path, np.int32 if itemsize == 4 else np.int64, pos, entries)
+    pos = _aligned(pos + neighbors.nbytes)
+    ids = _map(path, np.int64, pos, n)
+
+    graph = CSRGraph(offsets, neighbors, index, n=n)
+    graph.hydrator = ids
+    graph.store_path = path
+    return graph
+
+
+def read_edgelist(path: str, index: str = "") -> CSRGraph:
+    """ Parse a tab-separated edge list into the CSRGraph that hm01.cm gets from networkit's reader
+
+    networkit drops repeated edges and self loops, and CSRGraph.from_graph then lists the neighbors
+    of u as those above u in the order networkit added them, followed by those below u in increasing
+    order. Both are reproduced here with one sort of composite keys instead of building the graph.
+    Ids too large for the keys to fit in an int64 are sorted with a lexsort on the key parts instead.
+
+    This order is networkit's internal one, so networkit is pinned in environment.yml and
+    requirements.txt, and tests/graph_store_test.py compares it with the graph networkit reads.
+    """
+    try:
+        edges = pd.read_csv(
+            path, sep="\t", header=None, comment="#", usecols=[0, 1], dtype=np.int64
+        ).to_numpy()
+    except pd.errors.EmptyDataError:
+        edges = np.zeros((0, 2), dtype=np.int64)
+    lo, hi = edges.min(axis=1), edges.max(axis=1)
+    bound = int(hi.max()) + 1 if len(hi) else 0
+    space = max(len(lo), bound, 1)
+    composite = bound * (2 * space) <= _KEY_LIMIT     # also bounds lo * bound + hi, as space >= bound
+
+    # Keep the first occurrence of every edge
+    if composite:
+        pair = lo * bound + hi
+        if len(pair) > 1 and (np.diff(np.sort(pair)) == 0).any():
+            order = np.argsort(pair, kind="stable")
+            first = np.concatenate(([True], pair[order][1:] != pair[order][:-1]))
+            keep = np.sort(order[first])
+            lo, hi = lo[keep], hi[keep]
+    elif len(lo) > 1:
+        order = np.lexsort((hi, lo))        # stable, like the argsort above
+        first = np.concatenate(([True], (lo[order][1:] != lo[order][:-1]) | (hi[order][1:] != hi[order][:-1])))
+        if not first.all():
+            keep = np.sort(order[first])
+            lo, hi = lo[keep], hi[keep]
+
+    # networkit removes a self loop by moving the last neighbor of the node into its place
+    pos = np.arange(len(lo))
+    loop = lo == hi
+    if loop.any():
+        last = np.full(bound, -1, dtype=np.int64)
+        np.maximum.at(last, lo, pos)
+        np.maximum.at(last, hi, pos)
+        nodes, at = lo[loop], pos[loop]
+        moved = last[nodes]
+        upper = (moved > at) & (lo[moved] == nodes)
+        pos[moved[upper]] = at[upper]
+        lo, hi, pos = lo[~loop], hi[~loop], pos[~loop]
+
+    # Key (u, 0, position) for the upper neighbors of u and (u, 1, v) for the lower ones
+    if composite:
+        keys = np.concatenate([lo * (2 * space) + pos, hi * (2 * space) + space + lo])
+        keys.sort()
+        rows, rest = np.divmod(keys, 2 * space)
+        lower = rest >= space
+        neighbors = rest - lower * space
+    else:
+        rows, rest = np.concatenate([lo, hi]), np.concatenate([pos, lo])
+        lower = np.repeat([False, True], len(lo))
+        order = np.lexsort((rest, lower, rows))
+        rows, lower, neighbors = rows[order], lower[order], rest[order]
+    edge_at = np.zeros(space, dtype=np.int64)
+    edge_at[pos] = np.arange(len(pos))
+    neighbors[~lower] = hi[edge_at[neighbors[~lower]]]
+
+    dtype = np.int32 if bound < np.iinfo(np.int32).max else np.int64
+    offsets = np.zeros(bound + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=bound), out=offsets[1:])
+    return CSRGraph(offsets, neighbors.astype(dtype), index)
+
+
+def compile_graph(edgelist: str, path: str) -> CSRGraph:
+    """ Parse a tab-separated edge list the same way hm01.cm does and write it to `path` """
+    graph = read_edgelist(edgelist)
+    write_store(graph, path)
+    return graph
+
+
+def load_graph(path: str, index: str = "", backend: str = "networkit") -> Graph:
+    """ Load the network of a pipeline stage, from a compiled graph or else from a tab-separated edge list
+
+    `backend` names the storage of the graph (see hm01.graph_backend). Only the networkit backend
+    reads an edge list with networkit; the others are built from `read_edgelist`.
+    """
+    if is_store(path):
+        return Graph.from_csr(load_csr(path, index), backend)
+    if backend == "networkit":
+        return Graph(nk.graphio.EdgeListReader("\t", 0).read(path), index)
+    return Graph.from_csr(read_edgelist(path, index), backend)
+
+
+def main(
+    input_: str = typer.Option(..., "--input", "-i", help="The input network, a tab-separated edge list."),
+    output: str = typer.Option(..., "--output", "-o", help="Where to write the compiled graph."),
+):
+    """ Compile a network once so that every later CM, stats and filtering run can memory-map it """
+    graph = compile_graph(input_, output)
+    print(f"Compiled {graph.n()} nodes and {graph.m()} edges into {output}")
+
+
+def entry_point():
+    typer.run(main)
+
+
+if __name__ == "__main__":
+    entry_point()
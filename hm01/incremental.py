@@ -0,0 +1,126 @@
+"""Incremental CM: reuse the results of a previous run for the input clusters that did not change"""
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import jsonpickle
+import treeswift as ts
+
+from hm01.cluster_tree import ClusterTreeNode
+from hm01.graph import IntangibleSubgraph
+
+
+@dataclass
+class PreviousRun:
+    """ The outputs of an earlier CM run, as written with `--output prefix`
+
+    tree (ts.Tree)              : cluster tree of the run (prefix.tree.json)
+    clusters (dict[str, set])   : node sets of its input clusters (prefix.before.json)
+    labels (dict[int, str])     : final cluster of every node in a valid cluster (prefix.after.json)
+    params (dict)               : CM parameters of the run (prefix.params.json), None if it did not record them
+    """
+    tree: ts.Tree
+    clusters: Dict[str, Set[int]]
+    labels: Dict[int, str]
+    params: Optional[Dict] = None
+
+    @staticmethod
+    def load(prefix: str) -> PreviousRun:
+        with open(prefix + ".tree.json") as f:
+            tree = jsonpickle.decode(f.read())
+        with open(prefix + ".before.json") as f:
+            clusters = {c["label"]: set(c["nodes"]) for c in json.load(f)}
+        labels = {}
+        with open(prefix + ".after.json") as f:
+            for c in json.load(f):
+                for node in c["nodes"]:
+                    labels[node] = c["label"]
+        params = None
+        if os.path.exists(prefix + ".params.json"):
+            with open(prefix + ".params.json") as f:
+                params = json.load(f)
+        return PreviousRun(tree, clusters, labels, params)
+
+
+def read_edge_delta(filepath: str) -> List[Tuple[int, int]]:
+    """ Read the edges added to or removed from the network since the previous run (one edge per line) """
+    edges = []
+    with open(filepath) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            u, v = line.split()[:2]
+            edges.append((int(u), int(v)))
+    return edges
+
+
+@dataclass
+class IncrementalPlan:
+    """ Which input clusters have to be recomputed and which subtrees of the previous run can be kept
+
+    order (list[str])                   : labels of all input clusters, in input order
+    touched (list[IntangibleSubgraph])  : clusters to run algorithm-g on
+    reused (dict[str, ClusterTreeNode]) : previous subtrees of the untouched clusters, by label
+    """
+    order: List[str]
+    touched: List[IntangibleSubgraph]
+    reused: Dict[str, ClusterTreeNode]
+
+    @staticmethod
+    def make(
+        clusters: List[IntangibleSubgraph],
+        previous: PreviousRun,
+        delta: Optional[List[Tuple[int, int]]] = None,
+        params: Optional[Dict] = None,
+    ) -> IncrementalPlan:
+        """ Plan an incremental run
+
+        A cluster is touched when it is new, its node set changed, or an edge of the delta has both
+        endpoints in it. Everything CM does to a cluster only depends on the subgraph it induces, so the
+        previous subtree of any other cluster is exactly what a full run would compute again.
+
+        That only holds if the previous run used the same parameters. When `params` are given and the
+        previous run did not record the same ones, every cluster is touched and nothing is reused.
+        """
+        if params is not None and previous.params != params:
+            return IncrementalPlan([g.index for g in clusters], list(clusters), {})
+
+        changed: Set[str] = set()
+        if delta:
+            cluster_of = {}
+            for g in clusters:
+                for u in g.nodes():
+                    cluster_of[u] = g.index
+            for u, v in delta:
+                c = cluster_of.get(u)
+                if c is not None and c == cluster_of.get(v):
+                    changed.add(c)
+
+        subtrees = {node.label: node for node in previous.tree.root.children}
+        touched = []
+        reused = {}
+        for g in clusters:
+            if g.index in changed or previous.clusters.get(g.index) != set(g.nodes()):
+                touched.append(g)
+            else:
+                reused[g.index] = subtrees[g.index]
+        return IncrementalPlan([g.index for g in clusters], touched, reused)
+
+    def merge(
+        self, previous: PreviousRun, labels: Dict[int, str], tree: ts.Tree
+    ) -> Tuple[Dict[int, str], ts.Tree]:
+        """ Combine the result of algorithm-g on the touched clusters with the reused subtrees """
+        computed = {node.label: node for node in tree.root.children}
+        tree.root.children = []
+        for label in self.order:
+            tree.root.add_child(computed[label] if label in computed else self.reused[label])
+
+        # Nodes outside every valid cluster keep the label of their input cluster, which is all the
+        # outputs need of them
+        for label in self.reused:
+            for u in previous.clusters[label]:
+                labels[u] = previous.labels.get(u, label)
+        return labels, tree
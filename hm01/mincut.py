@@ -1,4 +1,54 @@
+# pyright: reportMissingImports=false
 # from mincut_wrapper import MincutResult
+import gc
+import math
+from functools import cache
+from typing import Optional, Tuple
+
+import numpy as np
+from pymincut.pygraph import PyGraph
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components, minimum_spanning_tree
+
+from hm01.mincut_cache import MincutCache
+
+_mincut_cache: Optional[MincutCache] = None
+
+
+def to_pygraph(nodes: np.ndarray, src: np.ndarray, dst: np.ndarray) -> PyGraph:
+    """ Build the PyGraph of a graph given as its node ids and both directions of every edge
+
+    If the mincut binding reads NumPy arrays through the buffer protocol, the node array and an (m, 2)
+    edge array are handed over as they are, without creating a Python object per edge. Older bindings
+    only take lists, so they get lists converted in one go.
+    """
+    if _accepts_arrays():
+        edges = np.empty((len(src), 2), dtype=np.int64)
+        edges[:, 0] = src
+        edges[:, 1] = dst
+        return PyGraph(np.ascontiguousarray(nodes, dtype=np.int64), edges)
+    gc_was_enabled = gc.isenabled()
+    gc.disable()                            # millions of fresh tuples would otherwise trigger full collections
+    try:
+        return PyGraph(nodes.tolist(), list(zip(src.tolist(), dst.tolist())))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+@cache
+def _accepts_arrays() -> bool:
+    """ Whether the installed binding takes arrays; checked once per process on a small graph
+
+    The graph is two triangles joined by a single edge, so the mincut has to come back as 1.
+    """
+    nodes = np.arange(6, dtype=np.int64)
+    once = np.array([(0, 1), (1, 2), (0, 2), (3, 4), (4, 5), (3, 5), (2, 3)], dtype=np.int64)
+    edges = np.concatenate([once, once[:, ::-1]])
+    try:
+        return run_viecut_command(PyGraph(nodes, np.ascontiguousarray(edges)))[-1] == 1
+    except Exception:
+        return False
 
 
 def viecut(graph, mincut_type="cactus"):
@@ -7,11 +57,112 @@ def viecut(graph, mincut_type="cactus"):
         # (VR) If we have a single edge, save the effort by splitting it
         nodes = list(graph.nodes())
         return [nodes[0]], [nodes[1]], 1
-    pygraph = graph.as_pygraph()
-    cut_result = run_viecut_command(pygraph, mincut_type)
+    return mincut_of_arrays(*graph.mincut_arrays(), mincut_type)
+
+
+def use_cache(mincut_cache: Optional[MincutCache]):
+    """ Look up and store the mincuts computed in this process in `mincut_cache` (None turns the cache off) """
+    global _mincut_cache
+    _mincut_cache = mincut_cache
+
+
+def mincut_of_arrays(nodes: np.ndarray, src: np.ndarray, dst: np.ndarray, mincut_type="cactus"):
+    """ The VieCut result of a graph given as in `to_pygraph`, taken from the mincut cache if it is there """
+    if _mincut_cache is None:
+        return run_viecut_command(to_pygraph(nodes, src, dst), mincut_type)
+    key = MincutCache.key(nodes, src, dst, mincut_type)
+    cut_result = _mincut_cache.get(key)
+    if cut_result is None:
+        cut_result = run_viecut_command(to_pygraph(nodes, src, dst), mincut_type)
+        _mincut_cache.put(key, cut_result)
     return cut_result
 
 
+def certify(graph, threshold: float, mincut_type="cactus") -> Optional[Tuple[int, bool]]:
+    """ Decide that the edge connectivity of `graph` is above `threshold` without its exact mincut
+
+    Returns a lower bound on the edge connectivity that is above `threshold` and whether it is the exact
+    connectivity, or None if the connectivity could not be certified that way; the caller then runs
+    `viecut` on the whole graph. In order:
+
+    - If the minimum degree is at most `threshold`, so is the connectivity: None.
+    - If the minimum degree is at least n/2, it is the connectivity (Chartrand), returned as is.
+    - Otherwise, with k = floor(threshold) + 1, the union of k edge-disjoint maximal spanning forests
+      keeps every cut of the graph with fewer than k edges, and every other cut has at least k edges in it
+      (Nagamochi and Ibaraki). Its mincut, computed by VieCut on at most k(n - 1) edges, is returned if
+      it is above `threshold`. A disconnected graph or one with no more than k(n - 1) edges gives None.
+
+    Only the minimum degree bound is exact; the mincut of the certificate is about k, whatever the
+    connectivity of the graph.
+    """
+    n = graph.n()
+    if n < 2:
+        return None
+    mcd = graph.mcd()
+    if mcd <= threshold:
+        return None
+    if mcd >= n // 2:
+        return mcd, True
+
+    k = max(math.floor(threshold) + 1, 1)
+    nodes, src, dst = graph.mincut_arrays()
+    if len(src) // 2 <= k * (n - 1):
+        return None
+    upper = src < dst
+    u, v = _positions(nodes, src[upper]), _positions(nodes, dst[upper])
+
+    left = np.ones(len(u), dtype=bool)                  # edges not in a forest yet
+    for i in range(k):
+        forest = spanning_forest(n, u, v, left)
+        if i == 0 and len(forest) < n - 1:
+            return None                                 # disconnected
+        left[forest] = False
+    kept = ~left
+    cert_src = nodes[np.concatenate([u[kept], v[kept]])]
+    cert_dst = nodes[np.concatenate([v[kept], u[kept]])]
+    cut_size = mincut_of_arrays(nodes, cert_src, cert_dst, mincut_type)[-1]
+    return (cut_size, False) if cut_size > threshold else None
+
+
+def spanning_forest(n: int, u: np.ndarray, v: np.ndarray, among: np.ndarray) -> np.ndarray:
+    """ The positions of the edges (u[i], v[i]), i in `among`, of a maximal spanning forest of the graph they form """
+    candidates = np.flatnonzero(among)
+    # weights are the positions + 1, so no edge has weight 0 (no edge) and ties cannot merge two edges
+    weights = np.arange(1, len(candidates) + 1, dtype=np.float64)
+    forest = minimum_spanning_tree(coo_matrix((weights, (u[candidates], v[candidates])), shape=(n, n)).tocsr())
+    return candidates[forest.tocoo().data.astype(np.int64) - 1]
+
+
+def split_components(graph) -> Optional[list]:
+    """ A mincut result with every connected component of a disconnected graph as a side of its own
+
+    Returns [component 1, ..., component k, 0], the components (lists of node ids) from the smallest to the
+    largest, or None if the graph is connected. `cut_by_mincut` turns it into all k partitions at once.
+    """
+    nodes, src, dst = graph.mincut_arrays()
+    n = len(nodes)
+    if n < 2:
+        return None
+    u, v = _positions(nodes, src), _positions(nodes, dst)
+    adjacency = coo_matrix((np.ones(len(u), dtype=np.int8), (u, v)), shape=(n, n))
+    count, labels = connected_components(adjacency.tocsr(), directed=False)
+    if count == 1:
+        return None
+
+    order = np.argsort(nodes)
+    nodes, labels = nodes[order], labels[order]
+    sizes = np.bincount(labels, minlength=count)
+    _, first = np.unique(labels, return_index=True)                  # the smallest node of every component
+    grouped = np.split(nodes[np.lexsort((nodes, labels))], np.cumsum(sizes)[:-1])
+    return [grouped[c].tolist() for c in np.lexsort((nodes[first], sizes))] + [0]
+
+
+def _positions(nodes: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """ The positions of `ids` in `nodes` """
+    order = np.argsort(nodes)
+    return order[np.searchsorted(nodes, ids, sorter=order)]
+
+
 def run_viecut_command(pygraph, mincut_type="cactus"):
     """ (VR) Run the viecut command and return the mincut result object """
     # algorithm = 'cactus'  # (VR) Mincut algorithm from Nagamochi et. al.
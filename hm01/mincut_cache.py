@@ -0,0 +1,117 @@
+"""A persistent cache of mincut results, shared by CM runs, their workers and scripts/stats.py"""
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import os
+import time
+from typing import List, Optional
+
+import numpy as np
+
+FORMAT_VERSION = b"hm01-mincut-1"
+STALE_TMP_SECONDS = 3600                # a temporary file this old was left behind by a writer that died
+
+
+class MincutCache:
+    """ Mincut results on disk, keyed by a hash of the mincut algorithm and the edge set of the graph
+
+    The key is the SHA-256 of the algorithm, the sorted node ids and the edges (u < v) sorted, so the same
+    cluster maps to the same entry whatever order its nodes and edges come in and whichever run or
+    script asks. Each entry is a file of its own holding the cut size and both sides of the cut.
+
+    Any number of processes can use the same directory. Entries are written to a temporary file and
+    renamed into place, so a reader sees a whole entry or none, and an entry that cannot be read is a miss.
+    Reading an entry touches it. Once the entries written since the last check add up to an eighth of
+    `max_bytes`, the least recently used entries are removed until the cache is back under `max_bytes`;
+    one process evicts at a time, the others skip it. Temporary files count towards the size, and
+    eviction deletes the ones a crashed writer left behind.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._written = 0                   # bytes this process wrote since it last checked the size
+
+    @staticmethod
+    def key(nodes: np.ndarray, src: np.ndarray, dst: np.ndarray, algorithm: str) -> str:
+        """ The key of the graph given as its node ids and both directions of every edge """
+        upper = src < dst
+        u, v = src[upper], dst[upper]
+        order = np.lexsort((v, u))
+        digest = hashlib.sha256(FORMAT_VERSION)
+        digest.update(algorithm.encode("utf-8"))
+        digest.update(np.int64(len(nodes)).tobytes())
+        digest.update(np.sort(nodes).astype(np.int64).tobytes())
+        digest.update(u[order].astype(np.int64).tobytes())
+        digest.update(v[order].astype(np.int64).tobytes())
+        return digest.hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key + ".npz")
+
+    def get(self, key: str) -> Optional[List]:
+        """ The mincut result stored under `key`, as [light partition, heavy partition, cut size], if any """
+        path = self.entry_path(key)
+        try:
+            with np.load(path) as entry:
+                result = [entry["light"].tolist(), entry["heavy"].tolist(), int(entry["cut"])]
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            return None                     # missing, evicted meanwhile or unreadable
+        return result
+
+    def put(self, key: str, result) -> None:
+        """ Store the mincut result `result` under `key` """
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                light=np.asarray(result[0], dtype=np.int64),
+                heavy=np.asarray(result[1], dtype=np.int64),
+                cut=np.int64(result[-1]),
+            )
+        self._written += os.path.getsize(tmp)
+        os.replace(tmp, path)
+        if self._written >= self.max_bytes // 8:
+            self.evict()
+
+    def evict(self) -> None:
+        """ Remove stale temporary files, then the least recently used entries until the cache takes at most `max_bytes` """
+        self._written = 0
+        with open(os.path.join(self.path, ".lock"), "wb") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return                      # another process is evicting
+            entries = []
+            total = 0
+            stale = time.time() - STALE_TMP_SECONDS
+            for shard in os.scandir(self.path):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    is_tmp = entry.name.endswith(".tmp")
+                    if not is_tmp and not entry.name.endswith(".npz"):
+                        continue
+                    try:
+                        stat = entry.stat()
+                        if is_tmp and stat.st_mtime < stale:
+                            os.remove(entry.path)
+                            continue
+                    except FileNotFoundError:
+                        continue
+                    total += stat.st_size
+                    if not is_tmp:          # a live writer renames its temporary file soon
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
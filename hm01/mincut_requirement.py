@@ -40,10 +40,24 @@ class MincutRequirement:
         self, clusterer: AbstractClusterer, cluster, mcd_override: Optional[int] = None
     ) -> float:
         """ (VR) Compute the threshold of a given clusterer """
-        log10 = math.log10(cluster.n()) if cluster.n() > 0 else 0
         mcd = cluster.mcd() if mcd_override is None else mcd_override
+        return self.threshold_of(clusterer, cluster.n(), mcd)
+
+    def threshold_of(self, clusterer: AbstractClusterer, n: int, mcd: int) -> float:
+        """ The threshold of a cluster with `n` nodes and minimum degree `mcd` """
+        log10 = math.log10(n) if n > 0 else 0
         k = clusterer.k if isinstance(clusterer, IkcClusterer) else 0           # (VR) k is dependent on the clusterer being IKC
-        return self.log10 * log10 + self.mcd * mcd + self.k * k + self.constant 
+        return self.log10 * log10 + self.mcd * mcd + self.k * k + self.constant
+
+    def degree_bound(self, clusterer: AbstractClusterer, n: int) -> float:
+        """ A bound on the degrees d with d <= threshold_of(clusterer, n, d)
+
+        Smaller clusters have lower thresholds, so no cluster of at most `n` nodes can have such a degree
+        above the bound either. Without a bound (an mcd coefficient of 1 or more), this is infinite.
+        """
+        if self.mcd >= 1:
+            return math.inf
+        return self.threshold_of(clusterer, n, 0) / (1 - self.mcd)
 
     @staticmethod
     def most_stringent() -> MincutRequirement:
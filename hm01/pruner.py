@@ -1,18 +1,87 @@
 from __future__ import annotations
-from hm01.graph import RealizedSubgraph
+import math
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from hm01.graph import CSRGraph, CSRSubgraph, IntangibleSubgraph, RealizedSubgraph, membership_csr
 from hm01.mincut_requirement import MincutRequirement
 from hm01.clusterers.abstract_clusterer import AbstractClusterer
-from heapdict import heapdict
+
+
+def peel(
+    candidates: Iterable,
+    degree: Union[list, dict],
+    neighbors: Callable[[object], Iterable],
+    n: int,
+    limit: int,
+    removable: Callable[[int, int], bool],
+) -> List:
+    """ Remove minimum degree nodes while `removable(nodes left, degree)` holds, like a k-core peeling
+
+    The nodes are kept in buckets by degree. Only `candidates`, the nodes of degree at most `limit`,
+    start in a bucket, and other nodes join once their degree drops to `limit`; no node above `limit`
+    may be removable. `degree` is updated in place. Each bucket is a FIFO queue, and a node whose degree
+    drops is appended to its new bucket and skipped when its old entry comes up. A node enters a bucket
+    at most once per degree it takes on, so there are at most n + m entries, and this runs in
+    O(n + m + limit) besides the calls to `neighbors`.
+
+    `candidates` and every `neighbors(u)` have to be in increasing order. Among nodes of the same degree,
+    those that had it from the start go first, smallest first, then the others in the order they dropped
+    to it, smallest first among those that dropped together. The threshold depends on the number of nodes
+    left, so the order decides which nodes are removed when the peeling stops within a degree; with this
+    order, the result does not depend on how the nodes of the graph are stored.
+
+    Returns the removed nodes in the order they were removed.
+    """
+    buckets: List[list] = [[] for _ in range(limit + 1)]
+    for u in candidates:
+        buckets[degree[u]].append(u)
+    heads = [0] * (limit + 1)
+
+    removed = set()
+    order = []
+    d = 0
+    while True:
+        while d <= limit and heads[d] == len(buckets[d]):
+            d += 1
+        if d > limit:
+            break
+        u = buckets[d][heads[d]]
+        heads[d] += 1
+        if u in removed or degree[u] != d:                  # an entry from before the degree of u dropped
+            continue
+        if not removable(n, d):
+            break
+        removed.add(u)
+        order.append(u)
+        n -= 1
+        for v in neighbors(u):
+            if v in removed:
+                continue
+            dv = degree[v] - 1
+            degree[v] = dv
+            if dv <= limit:
+                buckets[dv].append(v)
+                d = min(d, dv)
+    return order
 
 
 def prune_graph(
-    graph: RealizedSubgraph,
+    graph: Union[RealizedSubgraph, CSRSubgraph],
     connectivity_requirement: MincutRequirement,
     clusterer: AbstractClusterer,
 ) -> int:
-    """ (VR) This stage comes before the mincut stage for each cluster. 
+    """ (VR) This stage comes before the mincut stage for each cluster.
     Remove the single vertices that have degrees lower than the mincut requirement until there exists no such vertices.
 
+    The nodes are peeled by degree buckets (see `peel`) on the arrays of a CSRSubgraph or the adjacency
+    sets of a RealizedSubgraph, and then removed from the graph together. As before, the threshold is
+    evaluated again for every node, with the number of nodes left and the degree of that node as mcd.
+    Ties between nodes of the same degree are broken by node id, in the same way on both representations
+    (the local ids of a CSRSubgraph are in the order of the node ids), so the neighbors of a removed node
+    are sorted before they are visited.
+
     Params:
         graph (RealizedSubgraph)                        : Graph to prune
         connectivity_requirement (MincutRequirement)    : the mincut requirement
@@ -21,28 +90,78 @@ def prune_graph(
     mcd = graph.mcd()
     if mcd > connectivity_requirement.validity_threshold(clusterer, graph): # (VR) If the mcd fits the threshold, no need to prune
         return 0
-    
-    deleted_nodes = 0                                                       # (VR) Keep count of the number of pruned nodes
-
-    degrees = heapdict()                                                    # (VR) Heapdict automatically goes smallest to largest
-    for node in graph.nodes():
-        degrees[node] = graph.degree(node)
-
-    while degrees:
-        node, degree = degrees.popitem()
-        if degree > connectivity_requirement.validity_threshold(            # (VR) If we hit a degree that fits the threshold, no need to prune
-            clusterer, graph, mcd_override=degree
-        ):
-            break
 
-        for neighbor in graph.neighbors(node):                              # (VR) Otherwise, adjust degrees and pop the node from the graph
-            if neighbor in degrees:
-                degrees[neighbor] -= 1
-            else:
-                # This else case should be not needed, but still kept here for defensive programming
-                degrees[neighbor] = graph.degree(neighbor) - 1
-        graph.remove_node(node)
-        deleted_nodes += 1                                                  # (VR) Increment the number of pruned nodes
+    def removable(n: int, degree: int) -> bool:
+        return degree <= connectivity_requirement.threshold_of(clusterer, n, degree)
+
+    bound = connectivity_requirement.degree_bound(clusterer, graph.n())
+    if isinstance(graph, CSRSubgraph):
+        degrees = graph._degrees
+        max_degree = int(degrees.max(initial=0))
+        limit = max_degree if math.isinf(bound) else min(max_degree, math.floor(bound) + 1)
+        candidates = np.flatnonzero(graph._alive & (degrees <= limit)).tolist()
+        local = peel(
+            candidates, degrees.tolist(), lambda l: np.sort(graph._local_neighbors(l)).tolist(), graph.n(), limit,
+            removable,
+        )
+        deleted: Sequence[int] = graph._ids[local].tolist()
+    else:
+        degrees = {u: len(nbrs) for u, nbrs in graph.adj.items()}
+        max_degree = max(degrees.values(), default=0)
+        limit = max_degree if math.isinf(bound) else min(max_degree, math.floor(bound) + 1)
+        candidates = sorted(u for u, d in degrees.items() if d <= limit)
+        deleted = peel(candidates, degrees, lambda u: sorted(graph.adj[u]), graph.n(), limit, removable)
 
+    graph.remove_nodes(deleted)
     graph.mcd.cache_clear()
-    return deleted_nodes
+    return len(deleted)
+
+
+def prune_clusters(
+    clusters: List[IntangibleSubgraph],
+    graph: CSRGraph,
+    connectivity_requirement: MincutRequirement,
+    clusterer: AbstractClusterer,
+) -> List[Optional[Tuple[int, np.ndarray]]]:
+    """ Prune many disjoint clusters at once, as `prune_graph` would prune each of them after realizing it
+
+    The clusters are laid out as one CSR over the label array of the whole clustering (see `membership_csr`),
+    and their minimum degrees are found in a single vectorized pass. Only the clusters whose mcd is under
+    the threshold are peeled, each by `peel` on slices of the shared arrays, so no subgraph is built.
+    Singletons are left alone, as in the main loop.
+
+    Returns, for every cluster, None if pruning leaves it unchanged, or else its mcd before pruning and the
+    ids of the nodes left (possibly none). Raises ValueError if the clusters overlap.
+    """
+    nodes, starts, offsets, neighbors = membership_csr(clusters, graph)
+    degrees = np.diff(offsets)
+    sizes = np.diff(starts)
+    mcds = np.zeros(len(clusters), dtype=np.int64)
+    nonempty = sizes > 0
+    if nonempty.any():
+        mcds[nonempty] = np.minimum.reduceat(degrees, starts[:-1][nonempty])
+
+    def removable(n: int, degree: int) -> bool:
+        return degree <= connectivity_requirement.threshold_of(clusterer, n, degree)
+
+    degree = degrees.tolist()
+    offset = offsets.tolist()
+    neighbor = neighbors.tolist()
+    results: List[Optional[Tuple[int, np.ndarray]]] = []
+    for i, (c, n, mcd) in enumerate(zip(clusters, sizes.tolist(), mcds.tolist())):
+        if c.n() <= 1 or mcd > connectivity_requirement.threshold_of(clusterer, n, mcd):
+            results.append(None)
+            continue
+        begin, end = int(starts[i]), int(starts[i + 1])
+        bound = connectivity_requirement.degree_bound(clusterer, n)
+        max_degree = max(degree[begin:end])
+        limit = max_degree if math.isinf(bound) else min(max_degree, math.floor(bound) + 1)
+        candidates = [u for u in range(begin, end) if degree[u] <= limit]
+        removed = peel(candidates, degree, lambda u: sorted(neighbor[offset[u]:offset[u + 1]]), n, limit, removable)
+        if not removed:
+            results.append(None)
+            continue
+        keep = np.ones(end - begin, dtype=bool)
+        keep[np.array(removed, dtype=np.int64) - begin] = False
+        results.append((mcd, nodes[begin:end][keep]))
+    return results
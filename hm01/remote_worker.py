@@ -0,0 +1,140 @@
+"""Worker side of distributed CM: pull algorithm-g tasks from a coordinator (hm01.cm --listen) over TCP"""
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+import time
+from multiprocessing.connection import Client, Connection
+from typing import Dict, List, Optional
+
+import typer
+from structlog import get_logger
+
+from hm01.cm import init_worker, par_task
+from hm01.coordinator import parse_address
+from hm01.mincut_cache import MincutCache
+
+
+class ConnectionQueue:
+    """ Lets a RecordStream send its batches over the connection to the coordinator """
+
+    def __init__(self, conn: Connection):
+        self.conn = conn
+
+    def put(self, batch):
+        self.conn.send(("batch", batch))
+
+
+def missing_files(config: Dict) -> List[str]:
+    """ The files of an external clusterer that are not at the same paths on this machine """
+    if config["clusterer_source"] is None:
+        return []
+    return [path for path in config["clusterer_source"] if path and not os.path.exists(path)]
+
+
+def run_session(conn: Connection, working_dir: str = "hm01_working_dir", mincut_cache: Optional[MincutCache] = None):
+    """ Run the tasks of one coordinator run until it tells us it is done
+
+    The coordinator keeps its working directory and mincut cache to itself, so this worker uses its own.
+    An external clusterer has to be at the same paths as on the coordinator's machine; if it is not,
+    every task is answered with the error, which aborts the run.
+    """
+    config = conn.recv()
+    if config is None:                  # connected just as the run ended
+        return
+    missing = missing_files(config)
+    error = FileNotFoundError(f"missing on the remote worker: {', '.join(missing)}") if missing else None
+    if error is None:
+        init_worker(None, {**config, "working_dir": working_dir, "mincut_cache": mincut_cache}, ConnectionQueue(conn))
+    else:
+        get_logger().error("cannot run the external clusterer", missing=missing)
+    while True:
+        task = conn.recv()
+        if task is None:
+            return
+        if error is not None:
+            conn.send(("error", error))
+            continue
+        try:
+            result = par_task(*task)
+        except Exception as e:          # reported to the coordinator, which aborts the run
+            conn.send(("error", e))
+            continue
+        conn.send(("result", result))
+
+
+def serve(address: str, authkey: bytes, wait: float, working_dir: str, mincut_cache: str, mincut_cache_size: int):
+    """ Connect to the coordinator and serve its runs, until there is none for `wait` seconds """
+    cache = MincutCache(mincut_cache, mincut_cache_size * 2**20) if mincut_cache else None
+    last_seen = time.time()
+    while time.time() - last_seen < wait:
+        try:
+            conn = Client(parse_address(address), authkey=authkey)
+        except (OSError, EOFError):     # no coordinator yet, or it is shutting down its previous run
+            time.sleep(0.5)
+            continue
+        try:
+            run_session(conn, working_dir, cache)
+        except (EOFError, OSError):
+            get_logger().warning("lost connection to the coordinator")
+        finally:
+            conn.close()
+        last_seen = time.time()
+
+
+def main(
+    connect: str = typer.Option(
+        ...,
+        "--connect",
+        help="HOST:PORT the coordinator (hm01.cm --listen) is listening on.",
+    ),
+    authkey: str = typer.Option(
+        ...,
+        "--authkey",
+        envvar="HM01_AUTHKEY",
+        help="Shared secret, the same as given to the coordinator.",
+    ),
+    cores: int = typer.Option(
+        4,
+        "--nprocs",
+        "-n",
+        help="Number of tasks to run in parallel.",
+    ),
+    wait: float = typer.Option(
+        60,
+        "--wait",
+        help="Exit once no coordinator has been reachable for this many seconds.",
+    ),
+    working_dir: str = typer.Option(
+        "hm01_working_dir",
+        "--working-dir",
+        help="Directory for the intermediate files of the clusterers on this machine.",
+    ),
+    mincut_cache: str = typer.Option(
+        "",
+        "--mincut-cache",
+        help="Directory of a mincut cache on this machine; the coordinator's cache is not used here.",
+    ),
+    mincut_cache_size: int = typer.Option(
+        1024,
+        "--mincut-cache-size",
+        help="Size limit of the mincut cache in MB; the least recently used entries are removed beyond it.",
+    ),
+):
+    """ Remote worker for distributed CM. Every process is a separate connection to the coordinator. """
+    procs = [
+        mp.Process(target=serve, args=(connect, authkey.encode(), wait, working_dir, mincut_cache, mincut_cache_size))
+        for _ in range(cores)
+    ]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+
+def entry_point():
+    typer.run(main)
+
+
+if __name__ == "__main__":
+    entry_point()
@@ -0,0 +1,123 @@
+"""Stream cluster records and final node labels from the CM workers to the parent process"""
+from __future__ import annotations
+
+import queue as queue_module
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from structlog import get_logger
+
+from hm01.cluster_tree import ClusterRecord
+
+# A batch holds finished cluster records and (cluster label, nodes) pairs of final node labels
+Batch = Tuple[List[ClusterRecord], List[Tuple[str, List[int]]]]
+
+
+class RecordStream:
+    """ Worker side: buffers the records and labels of one task and sends them to the parent in batches """
+
+    def __init__(self, queue, task_id: int, batch_size: int = 1000):
+        self.queue = queue
+        self.task_id = task_id
+        self.batch_size = batch_size
+        self.sent = 0                       # number of batches put on the queue
+        self._records: List[ClusterRecord] = []
+        self._labels: List[Tuple[str, List[int]]] = []
+        self._pending = 0
+
+    def record(self, record: ClusterRecord):
+        """ Send the final state of a cluster """
+        self._records.append(record)
+        self._pending += 1
+        self._maybe_flush()
+
+    def label(self, cluster: str, nodes: List[int]):
+        """ Send the final cluster label of `nodes` """
+        if not nodes:
+            return
+        self._labels.append((cluster, nodes))
+        self._pending += len(nodes)
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._records and not self._labels:
+            return
+        self.queue.put((self.task_id, self._records, self._labels))
+        self.sent += 1
+        self._records, self._labels, self._pending = [], [], 0
+
+
+class RecordCollector(threading.Thread):
+    """ Parent side: drains the record queue in the background while the pool is running
+
+    Batches are held per task and applied with `on_batch` only once the task has finished and all of
+    its batches have arrived (see `task_done`). The applied state therefore always consists of whole
+    tasks, which is what makes checkpoints consistent, and nothing is lost if a task result overtakes
+    its batches.
+    """
+
+    def __init__(self, queue, on_batch: Callable[[Batch], None], quiet: bool, log_every: float = 10.0):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.on_batch = on_batch
+        self.quiet = quiet
+        self.log_every = log_every
+        self.clusters = 0                   # number of finished clusters applied so far
+        self.error = None
+        self._buffers: Dict[int, List[Batch]] = {}
+        self._received: Dict[int, int] = {}
+        self._expected: Dict[int, int] = {}
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+
+    def run(self):
+        last_log = time.time()
+        while not self._stopped.is_set():
+            try:
+                task_id, records, labels = self.queue.get(timeout=0.1)
+            except queue_module.Empty:
+                continue
+            with self._cond:
+                self._buffers.setdefault(task_id, []).append((records, labels))
+                self._received[task_id] = self._received.get(task_id, 0) + 1
+                self._try_commit(task_id)
+            if not self.quiet and time.time() - last_log >= self.log_every:
+                get_logger().info("algorithm-g progress", clusters_finished=self.clusters)
+                last_log = time.time()
+
+    def task_done(self, task_id: int, sent: int):
+        """ Called by the parent when a task has returned, with the number of batches it sent """
+        with self._cond:
+            self._expected[task_id] = sent
+            self._try_commit(task_id)
+
+    def _try_commit(self, task_id: int):
+        expected = self._expected.get(task_id)
+        if expected is None or self._received.get(task_id, 0) < expected:
+            return
+        try:
+            for batch in self._buffers.pop(task_id, []):
+                self.on_batch(batch)
+                self.clusters += len(batch[0])
+        except Exception as e:              # surface the error in the main thread instead of hanging it
+            self.error = e
+        self._received.pop(task_id, None)
+        del self._expected[task_id]
+        self._cond.notify_all()
+
+    def when_idle(self, fn: Callable = lambda: None):
+        """ Wait until every finished task has been applied, then run `fn` while no batch is applied """
+        with self._cond:
+            self._cond.wait_for(lambda: not self._expected or self.error is not None)
+            if self.error is not None:
+                raise self.error
+            return fn()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
@@ -0,0 +1,73 @@
+"""Dynamic task scheduling for the worker pool used by algorithm-g"""
+from __future__ import annotations
+
+import math
+import queue
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+from hm01.graph import Graph, IntangibleSubgraph
+
+
+def run_dynamic(
+    pool,
+    func: Callable,
+    tasks: Iterable[Sequence[Any]],
+    on_result: Callable[[Any], Optional[Iterable[Sequence[Any]]]],
+) -> None:
+    """ Run `func` over `tasks` on `pool` through a single shared task queue
+
+    Every task is submitted individually, so whichever worker becomes free first picks up the next
+    pending task. There is no up-front assignment of tasks to workers, so one expensive task only
+    occupies one worker while the rest of the pool drains the remaining tasks.
+
+    Parameters:
+        pool (multiprocessing.Pool)     : pool to run the tasks on
+        func (Callable)                 : function run by the workers, called as func(*task)
+        tasks (Iterable[Sequence])      : argument tuples of the initial tasks
+        on_result (Callable)            : called in the parent with each result as soon as it arrives;
+                                          may return follow-up tasks, which are put on the same queue
+    """
+    results: queue.SimpleQueue = queue.SimpleQueue()
+    outstanding = 0
+
+    def submit(task):
+        nonlocal outstanding
+        pool.apply_async(func, tuple(task), callback=results.put, error_callback=results.put)
+        outstanding += 1
+
+    for task in tasks:
+        submit(task)
+
+    while outstanding:
+        res = results.get()
+        outstanding -= 1
+        if isinstance(res, BaseException):
+            raise res
+        for task in on_result(res) or ():
+            submit(task)
+
+
+def estimate_cost(n: int, m: int) -> float:
+    """ Estimate the work needed to run a cluster through algorithm-g
+
+    Each level of the mincut/recluster recursion touches every edge of the cluster at most a constant
+    number of times, and a cluster of n nodes is expected to recurse about log2(n) levels deep.
+    """
+    depth = math.log2(n) if n > 1 else 1
+    return (n + m) * max(depth, 1)
+
+
+def order_by_cost(graphs: List[IntangibleSubgraph], global_graph: Graph) -> List[IntangibleSubgraph]:
+    """ Order clusters by decreasing estimated cost (longest-processing-time-first)
+
+    Clusters that are already realized use their own edge count instead of scanning `global_graph`.
+
+    Fed to the shared task queue, this gives the LPT placement: the most expensive clusters start
+    first and the cheap ones fill in the gaps at the end, instead of big clusters that happen to be
+    adjacent in the input all starting late.
+    """
+    costs = {
+        g.index: estimate_cost(g.n(), g.count_edges(global_graph) if isinstance(g, IntangibleSubgraph) else g.m())
+        for g in graphs
+    }
+    return sorted(graphs, key=lambda g: costs[g.index], reverse=True)
@@ -0,0 +1,95 @@
+"""Share the global graph between CM worker processes through multiprocessing.shared_memory"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import List, Tuple
+
+import numpy as np
+
+from hm01.graph import CSRGraph
+from hm01.graph_store import load_csr
+
+
+@dataclass(frozen=True)
+class SharedGraphHandle:
+    """ Picklable description of a CSRGraph exported to shared memory
+
+    This is all a worker needs to attach to the graph, regardless of the start method (fork, spawn or
+    forkserver), since the arrays themselves never go through pickling. A graph compiled with
+    hm01.graph_store is not copied at all: `store_path` is set and the workers map the file instead.
+    """
+    index: str
+    offsets_name: str
+    offsets_len: int
+    neighbors_name: str
+    neighbors_len: int
+    neighbors_dtype: str
+    store_path: str = ""
+
+
+def _to_shared(arr: np.ndarray) -> shared_memory.SharedMemory:
+    """ Copy an array into a fresh shared memory block """
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+    return shm
+
+
+class SharedGraph:
+    """ Owner of the shared memory blocks holding a CSRGraph
+
+    Created once by the parent process. Use as a context manager so the blocks are unlinked when the
+    workers are done with them.
+    """
+
+    def __init__(self, graph: CSRGraph):
+        self._blocks: List[shared_memory.SharedMemory] = []
+        store_path = getattr(graph, "store_path", "")
+        if store_path:
+            # Already a file the workers can map; they share its pages through the page cache
+            self.handle = SharedGraphHandle(graph.index, "", 0, "", 0, "", store_path)
+            return
+        offsets = _to_shared(graph.offsets)
+        self._blocks.append(offsets)
+        neighbors = _to_shared(graph.neighbors_arr)
+        self._blocks.append(neighbors)
+        self.handle = SharedGraphHandle(
+            graph.index,
+            offsets.name,
+            len(graph.offsets),
+            neighbors.name,
+            len(graph.neighbors_arr),
+            graph.neighbors_arr.dtype.str,
+        )
+
+    def close(self):
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+
+    def __enter__(self) -> SharedGraph:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach(handle: SharedGraphHandle) -> CSRGraph:
+    """ Attach to an exported graph without copying it
+
+    The returned graph keeps the shared memory blocks open for as long as it is alive.
+    """
+    if handle.store_path:
+        return load_csr(handle.store_path, handle.index)
+    blocks: Tuple[shared_memory.SharedMemory, ...] = (
+        shared_memory.SharedMemory(name=handle.offsets_name),
+        shared_memory.SharedMemory(name=handle.neighbors_name),
+    )
+    offsets = np.ndarray((handle.offsets_len,), dtype=np.int64, buffer=blocks[0].buf)
+    neighbors = np.ndarray(
+        (handle.neighbors_len,), dtype=np.dtype(handle.neighbors_dtype), buffer=blocks[1].buf
+    )
+    graph = CSRGraph(offsets, neighbors, handle.index)
+    graph._shm = blocks
+    return graph
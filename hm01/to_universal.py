@@ -47,10 +47,12 @@ class ClusteringSkeleton:
     ----------------------------
     label (str):                index of the cluster
     nodes (list[int]):          list of node Ids in the cluster
-    connectivity (int):         mincut value
+    connectivity (int):         mincut value (-1 if it was not computed)
     descendants (list[str]):    (only for non-cm_valid clusters) a list of clusters resulting from cm operations (pruning, cutting) on the current cluster
     cm_valid (bool):            this value is true iff the cluster doesn't need to be operated on by cm anymore
     extant (bool):              this value is true iff it is both cm_valid and hasn't been operated on by cm
+    connectivity_lower_bound (int): (only for clusters certified valid with --certify) a lower bound on the
+                                connectivity, which is above the threshold; connectivity is -1 for them
     """
     label: str
     nodes: List[int]
@@ -58,6 +60,7 @@ class ClusteringSkeleton:
     descendants: List[str]
     cm_valid: bool              # (VR) Change: Add cm validity as a parameter in the json
     extant : bool
+    connectivity_lower_bound: Optional[int] = None
 
     @staticmethod
     def from_graphs(
@@ -92,7 +95,8 @@ class ClusteringSkeleton:
                     # (VR) Change: (info.cut_size or 1) if info else 1,
                     descendants,
                     info.cm_valid,
-                    info.extant
+                    info.extant,
+                    getattr(info, "connectivity_lower_bound", None),
                 )
             )
         ans.sort(key=lambda x: (len(x.descendants), len(x.nodes)), reverse=True)
@@ -124,6 +128,8 @@ class ClusteringSkeleton:
                 d = asdict(g)
                 if not use_descendants:
                     del d["descendants"]
+                if d["connectivity_lower_bound"] is None:
+                    del d["connectivity_lower_bound"]
                 if i < len(graphs) - 1:
                     json_str += json.dumps(d) + ","
                 else:
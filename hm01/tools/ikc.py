@@ -22,6 +22,40 @@ def main(args):
     print_clusters(clusters, out_dir, inverted_node_id_map)
 
 
+def ikc(edges, k, quiet_output=True):
+    '''
+    Run IKC on an edge list held in memory, without going through files
+    INPUT
+    -----
+    edges        : the (directed) edges of the graph as pairs of node ids
+    k            : the minimum allowed value for k for valid clusters
+    quiet_output : silence ikc outputs
+    OUTPUT
+    ------
+    clusters : a list of (nodes, k, modularity) in the order main writes them, with the node ids of `edges`
+    '''
+    global quiet
+    quiet = quiet_output
+
+    # number the nodes in order of first appearance, as the edge list reader in main does
+    graph1 = nk.Graph(0, directed=True)
+    node_id_map = {}
+    for u, v in edges:
+        for node in (u, v):
+            if node not in node_id_map:
+                node_id_map[node] = graph1.addNode()
+        graph1.addEdge(node_id_map[u], node_id_map[v])
+    inverted_node_id_map = dict(map(reversed, node_id_map.items()))
+
+    graph, node_id_dict = format_graph(graph1)
+
+    clusters = iterative_k_core_decomposition_MCS_ES(graph, k, node_id_dict)
+    return [
+        ([inverted_node_id_map[node] for node in cluster], cluster_k, modularity_score)
+        for cluster, cluster_k, modularity_score in clusters
+    ]
+
+
 def print_clusters(clusters, out_dir, inverted_node_id_map):
     '''
     This writes a csv containing lines with the:
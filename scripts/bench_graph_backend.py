@@ -0,0 +1,57 @@
+import time
+
+import typer
+
+from hm01.clusterers.nop_clusterer import NopClusterer
+from hm01.graph import CSRGraph, RealizedSubgraph
+from hm01.graph_backend import BACKENDS
+from hm01.graph_store import load_graph
+
+
+def bench(input, clusters, backend):
+    """ Time the work of CM that depends on how the global graph is stored """
+    t = time.perf_counter()
+    global_graph = load_graph(input, "", backend)
+    load_time = time.perf_counter() - t
+
+    t = time.perf_counter()
+    CSRGraph.from_graph(global_graph)
+    export_time = time.perf_counter() - t
+
+    t = time.perf_counter()
+    for c in clusters:
+        RealizedSubgraph(c, global_graph)
+    realize_time = time.perf_counter() - t
+
+    t = time.perf_counter()
+    for c in clusters:
+        global_graph.induced_subgraph(c.subset, c.index).mincut_arrays()
+    mincut_prep_time = time.perf_counter() - t
+
+    return {
+        "backend": backend,
+        "load_s": round(load_time, 3),
+        "export_s": round(export_time, 3),
+        "realize_s": round(realize_time, 3),
+        "mincut_prep_s": round(mincut_prep_time, 3),
+    }
+
+
+def main(
+    input: str = typer.Option(..., "--input", "-i"),
+    existing_clustering: str = typer.Option(..., "--existing-clustering", "-e"),
+):
+    """ Benchmark the backends of the global graph (hm01.graph_backend)
+
+    load: reading the network, export: the CSR handed to the workers, realize: the adjacency sets of
+    every cluster, mincut_prep: the induced subgraph of every cluster as mincut input arrays.
+    """
+    clusters = NopClusterer().from_existing_clustering(existing_clustering)
+    print(f"{len(clusters)} clusters, {sum(c.n() for c in clusters)} nodes")
+
+    for backend in BACKENDS:
+        print(bench(input, clusters, backend))
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,70 @@
+import time
+import tracemalloc
+
+import typer
+import networkit as nk
+
+from hm01.clusterers.nop_clusterer import NopClusterer
+from hm01.graph import CSRGraph, Graph
+from hm01.mincut_requirement import MincutRequirement
+from hm01.pruner import prune_graph
+
+
+REPRESENTATIONS = ["dict", "csr"]
+
+
+def bench(clusters, global_graph, representation, requirement):
+    """ Time and measure the per-cluster work of CM that depends on the subgraph representation """
+    tracemalloc.start()
+    t = time.perf_counter()
+    realized = [c.realize(global_graph, representation) for c in clusters]
+    realize_time = time.perf_counter() - t
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    t = time.perf_counter()
+    for g in realized:
+        for u in g.nodes():
+            for _ in g.neighbors(u):
+                pass
+    traverse_time = time.perf_counter() - t
+
+    t = time.perf_counter()
+    pruned = sum(prune_graph(g, requirement, NopClusterer()) for g in realized)
+    prune_time = time.perf_counter() - t
+
+    t = time.perf_counter()
+    for g in realized:
+        g.as_pygraph()
+    pygraph_time = time.perf_counter() - t
+
+    return {
+        "representation": representation,
+        "realize_s": round(realize_time, 3),
+        "memory_mb": round(peak / 2**20, 1),
+        "traverse_s": round(traverse_time, 3),
+        "prune_s": round(prune_time, 3),
+        "pruned": pruned,
+        "as_pygraph_s": round(pygraph_time, 3),
+    }
+
+
+def main(
+    input: str = typer.Option(..., "--input", "-i"),
+    existing_clustering: str = typer.Option(..., "--existing-clustering", "-e"),
+    threshold: str = typer.Option("1log10", "--threshold", "-t"),
+):
+    """ Benchmark the dict (RealizedSubgraph) and csr (CSRSubgraph) cluster representations of CM """
+    print("Loading graph...")
+    edgelist_reader = nk.graphio.EdgeListReader("\t", 0)
+    global_graph = CSRGraph.from_graph(Graph(edgelist_reader.read(input), ""))
+    clusters = NopClusterer().from_existing_clustering(existing_clustering)
+    requirement = MincutRequirement.try_from_str(threshold)
+    print(f"{len(clusters)} clusters, {sum(c.n() for c in clusters)} nodes")
+
+    for representation in REPRESENTATIONS:
+        print(bench(clusters, global_graph, representation, requirement))
+
+
+if __name__ == "__main__":
+    typer.run(main)
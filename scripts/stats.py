@@ -1,5 +1,4 @@
 import typer
-import networkit as nk
 import pandas as pd
 import os
 import json
@@ -8,8 +7,11 @@ from enum import Enum
 from numpy import log10, log2
 from typing import Dict, List
 
-from hm01.graph import Graph, IntangibleSubgraph
-from hm01.mincut import viecut
+from hm01.cluster_metrics import cluster_metrics
+from hm01.graph import CSRGraph, Graph, IntangibleSubgraph, realize_clusters
+from hm01.graph_store import is_store, load_csr, load_graph
+from hm01.mincut import use_cache, viecut
+from hm01.mincut_cache import MincutCache
 
 
 class ClustererSpec(str, Enum):
@@ -35,7 +37,9 @@ def main(
     existing_clustering: str = typer.Option(..., "--existing-clustering", "-e"),
     resolution: float = typer.Option(-1, "--resolution", "-g"),
     universal_before: str = typer.Option("", "--universal-before", "-ub"),
-    output: str = typer.Option("", "--output", "-o")
+    output: str = typer.Option("", "--output", "-o"),
+    mincut_cache: str = typer.Option("", "--mincut-cache"),
+    mincut_cache_size: int = typer.Option(1024, "--mincut-cache-size"),
 ): 
     if output == "":
         base, ext = os.path.splitext(existing_clustering)
@@ -51,26 +55,26 @@ def main(
 
     print("Loading graph...")
     # (VR) Load full graph into Graph object
-    edgelist_reader = nk.graphio.EdgeListReader("\t", 0)
-    nk_graph = edgelist_reader.read(input)
-
-    global_graph = Graph(nk_graph, "")
-    ms = [cluster.count_edges(global_graph) for cluster in clusters]
-    print("Done")
-
-    # clusters = [cluster.realize(global_graph) for cluster in clusters]
-
-    print("Computing modularity...")
-    modularities = [global_graph.modularity_of(cluster) for cluster in clusters]
+    global_graph = load_graph(input)
+    csr_graph = load_csr(input) if is_store(input) else CSRGraph.from_graph(global_graph)
     print("Done")
 
+    # Edge counts, modularity, CPM and conductance of every cluster in one pass over the edges
+    print("Computing edge counts, modularity, CPM score and conductance...")
+    clusters = list(clusters)
+    metrics = cluster_metrics(csr_graph, clusters, resolution if resolution != -1 else None)
+    ms = metrics.m.tolist()
+    modularities = metrics.modularity.tolist()
     if resolution != -1:
-        print("Computing CPM score...")
-        cpms = [global_graph.cpm(cluster, resolution) for cluster in clusters]
-        print("Done")
+        cpms = metrics.cpm.tolist()
+    conductances = metrics.conductance.tolist()
+    print("Done")
 
     print("Realizing clusters...")
-    clusters = [cluster.realize(global_graph) for cluster in clusters]
+    try:
+        clusters = realize_clusters(clusters, csr_graph)
+    except ValueError:
+        clusters = [cluster.realize(csr_graph) for cluster in clusters]
     print("Done")
 
     '''
@@ -84,6 +88,8 @@ def main(
     '''
 
     print("Computing mincut...")
+    if mincut_cache:
+        use_cache(MincutCache(mincut_cache, mincut_cache_size * 2**20))
     mincut_results = [viecut(cluster) for cluster in clusters]
     mincuts = [result[-1] for result in mincut_results]
     mincuts_normalized = [mincut/log10(ns[i]) for i, mincut in enumerate(mincuts)]
@@ -92,12 +98,6 @@ def main(
 
     print("Done")
 
-    print("Computing conductance...")
-    conductances = []
-    for i, cluster in enumerate(clusters):
-        conductances.append(cluster.conductance(global_graph))
-    print("Done")
-
     print("Computing overall stats...")
     m = global_graph.m()
     ids.append("Overall")
@@ -59,18 +59,46 @@ class CM(Stage):
             
             self.output_file.append(f'{self.working_dir}/{self.algorithm}{param_string}/S{self.index}_{self.network_name}_{self.algorithm}.{self.name}{param_string}.tsv')
 
+    def stage_commands_sweep(self, entries, clusterer_options, setup=()):
+        ''' Run all parameter sets in a single hm01.cm invocation that loads the network once '''
+        sweep_file = f'S{self.index}_{self.name}_sweep.json'
+        cmd = list(setup) + [f"echo '{dumps(entries)}' > {sweep_file}"]
+
+        cmd.append(f'python3 -m hm01.cm \
+            -i {self.get_graph_file()} \
+                --sweep {sweep_file} \
+                    -c {clusterer_options} {self.args}')
+
+        cmd = cmd + [
+            'exit_status=$?',
+            'if [ $exit_status -ne 0 ]; then',
+            f'\techo "{sweep_file} failed to run"',
+            f'\texit',
+            'fi'
+        ]
+
+        return cmd
+
     def stage_commands_leiden(self, project_root):
         cmd = []
         resolutions = [param['res'] for param in self.params]
         iterations = [param['i'] for param in self.params]
 
+        # Without memory profiling, every resolution runs on the same loaded network
+        if not self.memprof:
+            entries = [
+                {'existing_clustering': prev, 'output': output_file, 'resolution': float(res)}
+                for prev, res, output_file in zip(self.get_previous_file(), resolutions, self.output_file)
+            ]
+            return self.stage_commands_sweep(entries, self.algorithm)
+
         for i, (res, niter, output_file) in enumerate(zip(resolutions, iterations, self.output_file)):
             cmd.append(f'echo "Currently on resolution {res}, running {niter} iterations"')
 
             c = f'{project_root}/hm01/tests/mp-memprofile/profiler.sh ' if self.memprof else ''
 
             c = c + f'python3 -m hm01.cm \
-                -i {self.network} \
+                -i {self.get_graph_file()} \
                     -e {self.get_previous_file()[i]} \
                         -o {output_file} \
                             -c {self.algorithm} {self.args}'
@@ -98,13 +126,20 @@ class CM(Stage):
         cmd = []
         iterations = [param['i'] for param in self.params]
 
+        if not self.memprof:
+            entries = [
+                {'existing_clustering': prev, 'output': output_file}
+                for prev, output_file in zip(self.get_previous_file(), self.output_file)
+            ]
+            return self.stage_commands_sweep(entries, self.algorithm)
+
         for i, (niter, output_file) in enumerate(zip(iterations, self.output_file)):
             cmd.append(f'echo "Currently running {niter} iterations"')
 
             c = f'{project_root}/hm01/tests/mp-memprofile/profiler.sh ' if self.memprof else ''
 
             c = c + f'python3 -m hm01.cm \
-                -i {self.network} \
+                -i {self.get_graph_file()} \
                     -e {self.get_previous_file()[i]} \
                         -o {output_file} \
                             -c {self.algorithm} {self.args}'
@@ -129,12 +164,19 @@ class CM(Stage):
         cmd = []
         ks = [param['k'] for param in self.params]
 
+        if not self.memprof:
+            entries = [
+                {'existing_clustering': prev, 'output': output_file, 'k': int(k)}
+                for prev, k, output_file in zip(self.get_previous_file(), ks, self.output_file)
+            ]
+            return self.stage_commands_sweep(entries, self.algorithm)
+
         for i, (k, output_file) in enumerate(zip(ks, self.output_file)):
             cmd.append(f'echo "Currently on k={k}"')
 
             c = f'{project_root}/hm01/tests/mp-memprofile/profiler.sh ' if self.memprof else ''
             c = c + f'python3 -m hm01.cm \
-                -i {self.network} \
+                -i {self.get_graph_file()} \
                     -e {self.get_previous_file()[i]} \
                         -o {output_file} \
                             -c {self.algorithm} {self.args}'
@@ -159,6 +201,18 @@ class CM(Stage):
     def stage_commands_other(self, project_root, prev_file):
         cmd = []
 
+        if not self.memprof:
+            setup = [f"echo '{dumps(param)}' > cargs_{i}.json" for i, param in enumerate(self.params)]
+            entries = [
+                {
+                    'existing_clustering': prev_file[i] if type(prev_file) == list else prev_file,
+                    'output': output_file,
+                    'clusterer_args': f'cargs_{i}.json',
+                }
+                for i, output_file in enumerate(self.output_file)
+            ]
+            return self.stage_commands_sweep(entries, f'external -cfile {self.cfile}', setup)
+
         for i, (param, output_file) in enumerate(zip(self.params, self.output_file)):
             cmd.append(f'echo "Currently on param set {i}"')
 
@@ -166,7 +220,7 @@ class CM(Stage):
 
             c = f'{project_root}/hm01/tests/mp-memprofile/profiler.sh ' if self.memprof else ''
             c = c + f'python3 -m hm01.cm \
-                -i {self.network} \
+                -i {self.get_graph_file()} \
                     -e {prev_file[i] if type(prev_file) == list else prev_file} \
                         -o {output_file} \
                             -c external \
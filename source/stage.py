@@ -35,6 +35,9 @@ class Stage:
         # non-e.g. is stats
         self.chainable = True
             
+        # Compiled copy of the network (see hm01.graph_store), only read by the stages that run hm01
+        self.graph_file = None
+
         # Check if this is a memprof stage
         try:
             self.memprof = data['memprof']
@@ -56,6 +59,14 @@ class Stage:
         ''' Set the input network file in case theres a cleaning stage '''
         self.network = network_file
 
+    def set_graph_file(self, graph_file):
+        ''' Set the compiled network that hm01 should read instead of the edge list '''
+        self.graph_file = graph_file
+
+    def get_graph_file(self):
+        ''' The network to pass to hm01: the compiled one if there is one '''
+        return self.graph_file if self.graph_file else self.network
+
     def link_previous_stage(self, stage):
         ''' Build reverse linked list from stage array '''
         self.prev = stage
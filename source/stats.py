@@ -80,7 +80,7 @@ class Stats(Stage):
             input_file = prev_file if type(prev_file) != list else prev_file[i]
 
             c = f'python3 {project_root}/scripts/stats.py \
-                -i {self.network} \
+                -i {self.get_graph_file()} \
                     -e {input_file} \
                         -o {output_file} {self.args}'
             
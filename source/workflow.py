@@ -121,9 +121,35 @@ class Workflow:
             if stage.name == 'connectivity_modifier':
                 post_cm = True
 
+        # Optionally compile the (cleaned) network once, so every CM++ and stats run memory-maps it
+        # instead of parsing the edge list again
+        compile_commands = []
+        if data.get('compile_graph', False):
+            compiled_file = f'{project_root}/{self.output_dir}/{self.title}-{self.timestamp}/{self.network_name}.hm01csr'
+            compile_commands = [
+                'echo "*** COMPILING NETWORK ***"',
+                f'python3 -m hm01.graph_store -i {cleaned_file} -o {compiled_file}',
+                'exit_status=$?',
+                'if [ $exit_status -ne 0 ]; then',
+                f'\techo "{compiled_file} failed to generate"',
+                f'\texit',
+                'fi',
+            ]
+            has_cleanup = any(stage.name == 'cleanup' for stage in self.stages)
+            post_cleaned = not has_cleanup
+            for stage in self.stages:
+                if post_cleaned and stage.name in ('connectivity_modifier', 'stats'):
+                    stage.set_graph_file(compiled_file)
+                if stage.name == 'cleanup':
+                    post_cleaned = True
+            if not has_cleanup:
+                self.commands = self.commands + compile_commands
+
         # Get commands for each stage
         for stage in self.stages:
             self.commands = self.commands + stage.get_command()
+            if stage.name == 'cleanup':
+                self.commands = self.commands + compile_commands
 
         # Analysis stage
         self.commands.append('echo "*** ANALYSIS ***"')
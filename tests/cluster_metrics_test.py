@@ -0,0 +1,71 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from hm01.cluster_metrics import cluster_metrics
+from hm01.clusterers.nop_clusterer import NopClusterer
+from hm01.graph import CSRGraph, Graph, IntangibleSubgraph
+
+STATS = Path(__file__).parents[1] / "scripts" / "stats.py"
+
+
+@pytest.fixture
+def run_stats(environment):
+    ''' Run scripts/stats.py on the dataset in a directory and return its table '''
+    def run_stats(directory, output, *args):
+        subprocess.run(
+            [sys.executable, str(STATS), "-i", "network.tsv", "-e", "clustering.tsv", "-g", "0.1", "-o", output,
+             *args],
+            cwd=directory, env=environment, check=True, capture_output=True,
+        )
+        return pd.read_csv(directory / output)
+    return run_stats
+
+
+@pytest.mark.parametrize("overlapping", [False, True])
+def test_cluster_metrics_match_the_per_cluster_methods(dataset, overlapping):
+    graph = Graph.from_edgelist(str(dataset / "network.tsv"))
+    clusters = NopClusterer().from_existing_clustering(str(dataset / "clustering.tsv"))
+    if overlapping:
+        clusters.append(IntangibleSubgraph(list(range(30, 60)), "overlap"))
+    clusters.append(IntangibleSubgraph([0], "single"))
+    clusters.append(IntangibleSubgraph([1000, 1001], "unknown"))     # nodes the graph does not have
+
+    metrics = cluster_metrics(CSRGraph.from_graph(graph), clusters, 0.1)
+    known = clusters[:-1]
+    assert metrics.n.tolist() == [c.n() for c in clusters]
+    assert metrics.m[:-1].tolist() == [c.count_edges(graph) for c in known]
+    assert np.allclose(metrics.modularity[:-1], [graph.modularity_of(c) for c in known])
+    assert np.allclose(metrics.cpm[:-1], [graph.cpm(c, 0.1) for c in known])
+    assert np.allclose(metrics.conductance[:-1], [c.realize(graph).conductance(graph) for c in known])
+    assert metrics.m[-1] == metrics.degree_sum[-1] == metrics.boundary[-1] == 0
+    assert metrics.conductance[-1] == -42
+    assert cluster_metrics(CSRGraph.from_graph(graph), clusters).cpm is None
+
+
+def test_stats_script(dataset, run_stats):
+    graph = Graph.from_edgelist(str(dataset / "network.tsv"))
+    clusters = NopClusterer().from_existing_clustering(str(dataset / "clustering.tsv"))
+    stats = run_stats(dataset, "stats.csv")
+
+    per_cluster, overall = stats.iloc[:-1], stats.iloc[-1]
+    assert per_cluster["cluster"].astype(str).tolist() == [c.index for c in clusters]
+    assert per_cluster["n"].tolist() == [c.n() for c in clusters]
+    assert per_cluster["m"].tolist() == [c.count_edges(graph) for c in clusters]
+    assert np.allclose(per_cluster["modularity"], [graph.modularity_of(c) for c in clusters])
+    assert np.allclose(per_cluster["cpm_score"], [graph.cpm(c, 0.1) for c in clusters])
+    assert np.allclose(per_cluster["conductance"], [c.realize(graph).conductance(graph) for c in clusters])
+    assert per_cluster["connectivity"].tolist() == [c.realize(graph).find_mincut("cactus")[-1] for c in clusters]
+    assert (overall["cluster"], overall["n"], overall["m"]) == ("Overall", graph.n(), graph.m())
+
+
+
+def test_stats_script_with_a_mincut_cache(dataset, run_stats):
+    expected = run_stats(dataset, "stats.csv")
+    cache = str(dataset / "mincuts")
+    for output in ["cold.csv", "warm.csv"]:
+        pd.testing.assert_frame_equal(run_stats(dataset, output, "--mincut-cache", cache), expected)
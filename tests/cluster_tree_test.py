@@ -0,0 +1,59 @@
+import queue
+import random
+
+import pytest
+
+from hm01.cluster_tree import ClusterRecord, TreeAssembler
+from hm01.result_stream import RecordStream
+
+RECORDS = [
+    ClusterRecord("0", None, 0, 10, cut_size=1, cm_valid=False),
+    ClusterRecord("0a", "0", 0, 6, cut_size=3),
+    ClusterRecord("0b", "0", 1, 4, cut_size=0, cm_valid=False),
+    ClusterRecord("0ba", "0b", 0, 2, cut_size=1),
+    ClusterRecord("0bb", "0b", 1, 2, cut_size=1),
+    ClusterRecord("0bc", "0b", 2, 0),
+    ClusterRecord("1", None, 0, 5, extant=True, cut_size=2),
+]
+
+
+def shape(node):
+    return (node.label, node.num_nodes, getattr(node, "cut_size", None), node.cm_valid, [shape(c) for c in node.children])
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_tree_does_not_depend_on_the_order_of_the_records(seed):
+    in_order = TreeAssembler()
+    for record in RECORDS:
+        in_order.add(record)
+    shuffled = TreeAssembler()
+    records = list(RECORDS)
+    random.Random(seed).shuffle(records)
+    for record in records:
+        shuffled.add(record)
+    assert [shape(n) for n in shuffled.finish(["0", "1"])] == [shape(n) for n in in_order.finish(["0", "1"])]
+
+
+def test_missing_parent_records_are_reported():
+    assembler = TreeAssembler()
+    assembler.add(RECORDS[1])
+    with pytest.raises(AssertionError):
+        assembler.finish([])
+
+
+def test_record_stream_sends_everything_in_batches():
+    q = queue.Queue()
+    stream = RecordStream(q, 7, batch_size=3)
+    for record in RECORDS:
+        stream.record(record)
+    stream.label("0a", [1, 2, 3, 4])
+    stream.label("0b", [])
+    stream.flush()
+
+    batches = []
+    while not q.empty():
+        batches.append(q.get())
+    assert stream.sent == len(batches) == 3         # 3 records, 3 records, the last record and the labels
+    assert all(task_id == 7 for task_id, _, _ in batches)
+    assert [r for _, records, _ in batches for r in records] == RECORDS
+    assert [l for _, _, labels in batches for l in labels] == [("0a", [1, 2, 3, 4])]
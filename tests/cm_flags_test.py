@@ -0,0 +1,233 @@
+import json
+import os
+import pickle
+import signal
+import socket
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from hm01.checkpoint import Checkpoint
+from hm01.cluster_tree import ClusterRecord
+from hm01.clusterers.nop_clusterer import NopClusterer
+from hm01.graph import IntangibleSubgraph
+from hm01.incremental import IncrementalPlan, PreviousRun
+
+# Flags that change how CM runs but not what it finds: the outputs are those of the default run
+SAME_OUTPUTS = [
+    pytest.param(["-n", "1"], id="one-worker"),
+    pytest.param(["-n", "4"], id="four-workers"),        # whichever worker picks up a cluster, same outputs
+    pytest.param(["--cost-order"], id="cost-order"),
+    # The workers get the graph from shared memory and their settings from init_worker, not from fork
+    pytest.param(["--start-method", "spawn"], id="spawn"),
+    pytest.param(["--start-method", "forkserver"], id="forkserver"),
+    pytest.param(["--graph-backend", "csr"], id="csr-backend"),
+    pytest.param(["--graph-backend", "igraph"], id="igraph-backend"),
+    pytest.param(["--pre-prune"], id="pre-prune"),
+]
+
+
+@pytest.mark.parametrize("args", SAME_OUTPUTS)
+def test_same_outputs(default_run, run_cm, outputs, args):
+    directory, default = default_run
+    name = "_".join(a.strip("-") for a in args)
+    outputs.assert_same(run_cm(directory, name, *args), default)
+
+
+def test_split_size(default_run, run_cm, outputs):
+    # Reclustering the side of a cut that holds two of the three cliques gives two children. With a split
+    # size of 2 the second one goes back to the shared queue instead of staying with its parent's worker.
+    # Leiden is not seeded, so which of the two children is labelled first differs from run to run
+    directory, _ = default_run
+    unsplit = run_cm(directory, "unsplit", "--split-size", "0", clusterer="leiden_mod")
+    split = run_cm(directory, "split", "--split-size", "2", clusterer="leiden_mod")
+    outputs.assert_same_clusters(split, unsplit)
+
+
+def test_checkpoint_interval(default_run, run_cm, outputs):
+    # A checkpoint after every finished task, each written while no batch is half applied
+    directory, default = default_run
+    outputs.assert_same(run_cm(directory, "checkpointed", "--checkpoint-interval", "1e-9"), default)
+    assert not list((directory / "network.tsv_working_dir").glob("*.pkl"))      # cleared once the run is done
+
+
+def test_resume(default_run, dataset, run_cm, outputs):
+    # Resume from the checkpoint of a run that was stopped after it finished the valid input cluster "1"
+    _, default = default_run
+    clusters = NopClusterer().from_existing_clustering(str(dataset / "clustering.tsv"))
+    finished = next(c for c in clusters if c.index == "1")
+    node = next(c for c in json.loads(Path(default + ".tree.json").read_text())["root"]["children"] if c["label"] == "1")
+    record = ClusterRecord("1", None, 0, node["num_nodes"], node["extant"], node["cm_valid"], node["cut_size"],
+                           node["validity_threshold"])
+    params = {
+        "input": "network.tsv", "existing_clustering": "clustering.tsv", "clusterer": "nop",
+        "clusterer_file": "", "clusterer_args": "", "k": -1, "resolution": -1.0, "threshold": "1log10",
+        "no_prune": False, "mincut_type": "cactus", "certify": False,
+        "split_components": False, "previous": "", "edge_delta": "",
+    }
+    checkpoint = Checkpoint(
+        params, [c.index for c in clusters], [record], {u: "1" for u in finished.nodes()},
+        [(c, ClusterRecord(c.index, None, 0, c.n(), extant=True)) for c in clusters if c is not finished],
+    )
+    working_dir = dataset / "network.tsv_working_dir"
+    working_dir.mkdir()
+    with open(working_dir / (Checkpoint.namespace(params) + "0.pkl"), "wb") as f:
+        pickle.dump(checkpoint, f)
+    # A newer checkpoint of a run with another threshold, which is neither resumed nor removed
+    other = working_dir / (Checkpoint.namespace({**params, "threshold": "2"}) + "3.pkl")
+    with open(other, "wb") as f:
+        pickle.dump(Checkpoint({**params, "threshold": "2"}, [], [], {}, []), f)
+    (dataset / "clustering.tsv").write_text("")         # everything has to come from the checkpoint
+
+    outputs.assert_same(run_cm(dataset, "resumed", "--resume"), default)
+    assert list(working_dir.glob("*.pkl")) == [other]
+
+
+def test_incremental(default_run, run_cm, outputs):
+    # Change the edges of two input clusters, and add one between clusters, which touches neither
+    directory, default = default_run
+    edges = [tuple(map(int, line.split())) for line in (directory / "network.tsv").read_text().splitlines()]
+    removed = next(e for e in edges if e[1] < 40)
+    added = [(120, 130), (121, 131), (122, 132), (0, 45)]
+    changed = sorted(set(edges) - {removed} | set(added))
+    (directory / "changed.tsv").write_text("".join(f"{a}\t{b}\n" for a, b in changed))
+    (directory / "delta.tsv").write_text("".join(f"{a}\t{b}\n" for a, b in added + [removed]))
+
+    full = run_cm(directory, "full", network="changed.tsv")
+    incremental = run_cm(directory, "incremental", "--previous", default, "--edge-delta", "delta.tsv",
+                         network="changed.tsv")
+    outputs.assert_same(incremental, full)
+    assert outputs.partition(full) != outputs.partition(default)
+
+
+def test_incremental_without_changes(default_run, run_cm, outputs):
+    directory, default = default_run
+    outputs.assert_same(run_cm(directory, "unchanged", "--previous", default), default)
+
+
+def test_incremental_with_other_parameters(default_run, run_cm, outputs):
+    directory, default = default_run
+    full = run_cm(directory, "full_5", threshold="5")
+    outputs.assert_same(run_cm(directory, "previous_5", "--previous", default, threshold="5"), full)
+    assert outputs.after(full) != outputs.after(default)
+
+
+def test_incremental_plan(default_run):
+    directory, default = default_run
+    clusters = NopClusterer().from_existing_clustering(str(directory / "clustering.tsv"))
+    clusters[5] = IntangibleSubgraph(list(clusters[5].subset)[1:], "5")                  # one node less
+    previous = PreviousRun.load(default)
+    plan = IncrementalPlan.make(clusters, previous, [(1, 2), (121, 131), (0, 45)])
+    assert [c.index for c in plan.touched] == ["0", "3", "5"]
+    assert sorted(plan.reused) == ["1", "2", "4"]
+
+    # Nothing is reused from a run with other parameters
+    assert previous.params["threshold"] == "1log10"
+    plan = IncrementalPlan.make(clusters, previous, [], {**previous.params, "threshold": "2"})
+    assert plan.touched == clusters and not plan.reused
+
+
+def test_sweep(default_run, run_cm, outputs):
+    # Both parameter sets run on the graph loaded once, each as if it had been run on its own
+    directory, default = default_run
+    sweep = [{"output": "sweep_default"}, {"output": "sweep_6", "threshold": "6"}]
+    (directory / "sweep.json").write_text(json.dumps(sweep))
+    run_cm(directory, "sweep", "--sweep", "sweep.json")
+    outputs.assert_same(str(directory / "sweep_default"), default)
+    outputs.assert_same(str(directory / "sweep_6"), run_cm(directory, "threshold_6", threshold="6"))
+
+
+
+def test_sweep_outputs_must_differ(default_run, run_cm):
+    directory, _ = default_run
+    (directory / "clash.json").write_text(json.dumps([{"threshold": "2"}, {"threshold": "6"}]))
+    with pytest.raises(subprocess.CalledProcessError) as e:
+        run_cm(directory, "clash", "--sweep", "clash.json")
+    assert b"share the output" in e.value.stderr
+    assert not os.path.exists(directory / "clash")
+
+def test_remote_workers(default_run, run_cm, outputs, environment):
+    # A remote worker connects to the coordinator, which serves it the clusters instead of a local pool
+    directory, default = default_run
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        address = f"127.0.0.1:{s.getsockname()[1]}"
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "hm01.remote_worker", "--connect", address, "--authkey", "secret", "-n", "2",
+         "--mincut-cache", "worker_cache"],
+        cwd=directory, env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    try:
+        remote = run_cm(directory, "remote", "--listen", address, "--authkey", "secret",
+                        "--mincut-cache", "coordinator_cache")
+    finally:
+        os.killpg(worker.pid, signal.SIGTERM)          # the worker and its serving processes
+        worker.wait()
+    outputs.assert_same(remote, default)
+    # The worker keeps the mincuts in its own cache, not at the path of the coordinator's
+    assert list((directory / "worker_cache").rglob("*.npz"))
+    assert not list((directory / "coordinator_cache").rglob("*.npz"))
+
+
+def test_csr_subgraphs(default_run, run_cm, outputs):
+    # Cuts with ties can put the sides in the other order, so the labels may differ but nothing else
+    directory, default = default_run
+    outputs.assert_same_clusters(run_cm(directory, "csr", "--subgraph-repr", "csr"), default)
+
+
+@pytest.mark.parametrize("representation", ["dict", "csr"])
+def test_bulk_realize(default_run, run_cm, outputs, representation):
+    directory, _ = default_run
+    one_by_one = run_cm(directory, f"one_by_one_{representation}", "--subgraph-repr", representation)
+    bulk = run_cm(directory, f"bulk_{representation}", "--bulk-realize", "--subgraph-repr", representation)
+    outputs.assert_same(bulk, one_by_one)
+
+
+def test_compiled_graph(default_run, run_cm, outputs, environment):
+    directory, default = default_run
+    subprocess.run([sys.executable, "-m", "hm01.graph_store", "-i", "network.tsv", "-o", "network.csr"],
+                   cwd=directory, env=environment, check=True, capture_output=True)
+    outputs.assert_same(run_cm(directory, "compiled", network="network.csr"), default)
+
+
+def test_certify(dataset, run_cm, outputs):
+    # With a threshold of 6, some clusters are certified valid without an exact mincut
+    default = run_cm(dataset, "default", threshold="6")
+    certified = run_cm(dataset, "certify", "--certify", threshold="6")
+    assert outputs.partition(certified) == outputs.partition(default)
+    exact = {c["label"]: c["connectivity"] for c in outputs.after(default)}
+    bounded = 0
+    for c in outputs.after(certified):
+        if "connectivity_lower_bound" in c:
+            # Certified by its spanning forests: no exact value, and the bound is above the threshold
+            assert c["connectivity"] == -1
+            assert 6 < c["connectivity_lower_bound"] <= exact[c["label"]]
+            bounded += 1
+        else:
+            assert c["connectivity"] == exact[c["label"]]
+    assert bounded > 0
+
+
+def test_mincut_cache(default_run, run_cm, outputs, tmp_path):
+    # The first run fills the cache, the second finds every mincut in it
+    directory, default = default_run
+    cache = str(tmp_path / "mincuts")
+    cold = run_cm(directory, "cache_cold", "--mincut-cache", cache)
+    entries = sorted(p.name for p in Path(cache).glob("*/*.npz"))
+    assert entries
+    warm = run_cm(directory, "cache_warm", "--mincut-cache", cache)
+    assert sorted(p.name for p in Path(cache).glob("*/*.npz")) == entries
+    outputs.assert_same(cold, default)
+    outputs.assert_same(warm, default)
+
+
+def test_split_components(default_run, run_cm, outputs):
+    # A disconnected cluster is split into all of its components at once, so the tree has fewer levels
+    directory, default = default_run
+    split = run_cm(directory, "split_components", "--split-components")
+    assert outputs.partition(split) == outputs.partition(default)
+    assert outputs.connectivity(split) == outputs.connectivity(default)
+    assert len(outputs.tree_shape(split)) < len(outputs.tree_shape(default))
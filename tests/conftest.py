@@ -0,0 +1,156 @@
+import filecmp
+import json
+import os
+import random
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from hm01.graph import CSRGraph
+
+PROJECT_ROOT = Path(__file__).parents[1]
+
+
+def write_dataset(directory, seed=0):
+    ''' A network of planted clusters, and the clustering that has one cluster per planted group
+
+    The groups are dense random graphs, two cliques joined by one edge, a cluster of three separate
+    cliques and a sparse group with a low degree tail, so pruning, cutting and splitting all happen.
+    '''
+    rng = random.Random(seed)
+    edges, clustering, nid, groups = set(), [], 0, 0
+
+    def group(size):
+        nonlocal nid, groups
+        nodes = list(range(nid, nid + size))
+        nid += size
+        clustering.extend((u, groups) for u in nodes)
+        groups += 1
+        return nodes
+
+    def dense(nodes, p):
+        edges.update((a, b) for a in nodes for b in nodes if a < b and rng.random() < p)
+
+    for _ in range(3):
+        dense(group(40), 0.5)
+    bridged = group(16)
+    dense(bridged[:8], 1)
+    dense(bridged[8:], 1)
+    edges.add((bridged[7], bridged[8]))
+    split = group(15)
+    for i in range(3):
+        dense(split[5 * i:5 * i + 5], 1)
+    tail = group(30)
+    dense(tail[:20], 0.6)
+    edges.update((tail[i], tail[i + 1]) for i in range(19, 29))
+
+    network = Path(directory) / "network.tsv"
+    network.write_text("".join(f"{a}\t{b}\n" for a, b in sorted(edges)))
+    clustering_file = Path(directory) / "clustering.tsv"
+    clustering_file.write_text("".join(f"{u}\t{c}\n" for u, c in clustering))
+    return network, clustering_file
+
+
+class Outputs:
+    ''' Readers of the outputs of a CM run: the clustering at `output` and the json files next to it '''
+    SUFFIXES = ["", ".before.json", ".after.json", ".tree.json"]
+
+    @staticmethod
+    def partition(output):
+        ''' The output clustering as a sorted list of sorted node lists '''
+        clusters = defaultdict(list)
+        with open(output) as f:
+            for line in f:
+                node, cluster = line.split()
+                clusters[cluster].append(int(node))
+        return sorted(sorted(c) for c in clusters.values())
+
+    @staticmethod
+    def after(output):
+        with open(output + ".after.json") as f:
+            return json.load(f)
+
+    @classmethod
+    def connectivity(cls, output):
+        ''' The connectivity of every cluster of the after json, by node set '''
+        return {frozenset(c["nodes"]): c["connectivity"] for c in cls.after(output)}
+
+    @staticmethod
+    def tree_shape(output):
+        ''' The clusters of the tree by depth, without their labels, which depend on how ties are cut '''
+        def walk(node, depth):
+            yield (depth, node.get("num_nodes"), node.get("cut_size"), node.get("extant"), node.get("cm_valid"))
+            for child in node["children"]:
+                yield from walk(child, depth + 1)
+        return sorted(walk(json.loads(Path(output + ".tree.json").read_text())["root"], 0), key=repr)
+
+    @classmethod
+    def assert_same(cls, output, expected):
+        ''' The clustering, the before and after json and the tree of both runs are identical '''
+        for suffix in cls.SUFFIXES:
+            assert filecmp.cmp(output + suffix, expected + suffix, shallow=False), suffix
+
+    @classmethod
+    def assert_same_clusters(cls, output, expected):
+        ''' Both runs found the same clusters, connectivities and tree, whatever labels they gave them '''
+        assert cls.partition(output) == cls.partition(expected)
+        assert cls.connectivity(output) == cls.connectivity(expected)
+        assert cls.tree_shape(output) == cls.tree_shape(expected)
+
+
+@pytest.fixture(scope="session")
+def three_groups():
+    ''' Make a graph of three dense groups of 20 nodes, as a CSRGraph, and a random number generator '''
+    def three_groups(seed=0):
+        rng = random.Random(seed)
+        edges = {(a, b) for a in range(60) for b in range(a + 1, 60) if rng.random() < (0.4 if a // 20 == b // 20 else 0.05)}
+        src, dst = (np.array(x, dtype=np.int64) for x in zip(*sorted(edges)))
+        return CSRGraph.from_edge_arrays(src, dst, 60), rng
+    return three_groups
+
+
+@pytest.fixture(scope="session")
+def outputs():
+    return Outputs
+
+
+@pytest.fixture(scope="session")
+def environment():
+    ''' The environment of the processes the tests start, with the project on the python path '''
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(PROJECT_ROOT)] + [p for p in [env.get("PYTHONPATH")] if p])
+    return env
+
+
+@pytest.fixture(scope="session")
+def run_cm(environment):
+    ''' Run CM on the dataset in a directory and return the path of its output '''
+    def run_cm(directory, name, *args, clusterer="nop", threshold="1log10", network="network.tsv",
+               clustering="clustering.tsv"):
+        output = str(Path(directory) / name)
+        subprocess.run(
+            [sys.executable, "-m", "hm01.cm", "-i", network, "-e", clustering, "-c", clusterer,
+             "-t", threshold, "-n", "2", "-q", "-o", output, *args],
+            cwd=directory, env=environment, check=True, capture_output=True,
+        )
+        return output
+    return run_cm
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    ''' A directory of its own holding the planted dataset as network.tsv and clustering.tsv '''
+    write_dataset(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture(scope="session")
+def default_run(tmp_path_factory, run_cm):
+    ''' The planted dataset, and the output of CM on it without any optional flag '''
+    directory = tmp_path_factory.mktemp("planted")
+    write_dataset(directory)
+    return directory, run_cm(directory, "default")
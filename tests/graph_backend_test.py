@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from hm01.graph_backend import BACKENDS
+
+
+def state(backend, ordered=True):
+    ''' Everything the backend answers about its graph, with the row order of its CSR when `ordered` '''
+    nodes = backend.node_array()
+    nbrs, lengths = backend.neighbor_slices(nodes)
+    rows = np.split(nbrs, np.cumsum(lengths)[:-1]) if len(nodes) else []
+    offsets, neighbors = backend.csr()
+    rows_of_csr = np.split(neighbors, offsets[1:-1])
+    return (
+        backend.n(), backend.m(), nodes.tolist(), backend.degrees(nodes).tolist(),
+        [sorted(backend.neighbors(u)) for u in nodes.tolist()], [sorted(r.tolist()) for r in rows],
+        sorted(zip(*(a.tolist() for a in backend.edge_arrays()))), offsets.tolist(),
+        [r.tolist() if ordered else sorted(r.tolist()) for r in rows_of_csr],
+    )
+
+
+@pytest.mark.parametrize("name", ["csr", "igraph"])
+def test_backends_agree_with_networkit(name, three_groups):
+    graph, rng = three_groups()
+    reference = BACKENDS["networkit"].from_csr(graph.offsets, graph.neighbors_arr)
+    backend = BACKENDS[name].from_csr(graph.offsets, graph.neighbors_arr)
+    assert state(backend) == state(reference)
+
+    ids = np.arange(10, 50, dtype=np.int64)
+    assert state(backend.induced_subgraph(ids)) == state(reference.induced_subgraph(ids))
+
+    # networkit moves neighbors around when it deletes nodes, so only the adjacency itself has to agree
+    removed = np.array(rng.sample(range(60), 10), dtype=np.int64)
+    reference.remove_nodes(removed)
+    backend.remove_nodes(removed)
+    assert state(backend, ordered=False) == state(reference, ordered=False)
@@ -1,6 +1,10 @@
 from pathlib import Path
 
-from hm01.graph import Graph, RealizedSubgraph, IntangibleSubgraph
+import numpy as np
+import pytest
+
+from hm01.graph import Graph, RealizedSubgraph, IntangibleSubgraph, realize_clusters
+from hm01.mincut import split_components
 
 
 def test_cgraph():
@@ -32,3 +36,124 @@ def test_cgraph():
     assert light.n() == 3
     assert heavy.m() == 9
     assert heavy.n() == 8
+
+
+
+def test_compaction_survives_node_removal():
+    graph_path = Path(Path(__file__).parent, 'clique_dataset', 'network.tsv')
+    G = Graph.from_edgelist(str(graph_path)).to_realized_subgraph()
+    G.recompact()
+
+    for u in sorted(G.nodes())[::3]:
+        G.remove_node(u)
+        assert not G._dirty
+
+        assert sorted(G.hydrator) == sorted(G.nodes())
+        assert all(G.inv[v] == i for i, v in enumerate(G.hydrator))
+        for i, row in enumerate(G.compacted):
+            assert sorted(G.hydrator[j] for j in row) == sorted(G.adj[G.hydrator[i]])
+            assert G._slots[i] == {j: k for k, j in enumerate(row)}
+    assert len(G.compact_edges()) == G.m()
+
+@pytest.mark.parametrize("representation", ["dict", "csr"])
+def test_pruning_a_realization_leaves_the_cluster_labels_alone(representation):
+    graph_path = Path(Path(__file__).parent, 'clique_dataset', 'network.tsv')
+    clustering_path = Path(Path(__file__).parent, 'clique_dataset', 'clustering.tsv')
+    G = Graph.from_edgelist(str(graph_path))
+    clusters = IntangibleSubgraph.from_assignment_file(str(clustering_path))
+    cluster = clusters[0]
+    members = np.array(sorted(cluster.subset), dtype=np.int64)
+
+    realized = cluster.realize(G, representation)
+    realized.remove_nodes(members[:2].tolist())
+
+    assert cluster.contains(members).all()
+    assert realized.contains(members).tolist() == [False, False] + [True] * (len(members) - 2)
+
+
+@pytest.mark.parametrize("backend", ["networkit", "csr", "igraph", pytest.param(None, id="CSRGraph")])
+def test_realize_matches_the_neighbors_in_the_graph(backend, three_groups):
+    csr, rng = three_groups()
+    G = Graph.from_csr(csr, backend) if backend else csr
+    clusters = [IntangibleSubgraph(list(range(i, i + 20)), str(i)) for i in (0, 20, 40)]
+    clusters.append(IntangibleSubgraph(rng.sample(range(60), 25), "mixed"))
+
+    for c in clusters:
+        members = set(c.subset)
+        adj = {u: {v for v in G.neighbors(u) if v in members} for u in members}
+        for representation in ("dict", "csr"):
+            sub = c.realize(G, representation)
+            assert {u: set(sub.neighbors(u)) for u in sub.nodes()} == adj
+            assert sub.m() == sum(map(len, adj.values())) // 2
+        assert c.count_edges(G) == sum(map(len, adj.values())) // 2
+        assert c.count_mcd(G) == min(map(len, adj.values()))
+        assert sorted(c.edges(G)) == sorted((u, v) for u in adj for v in adj[u])
+        assert all(c.internal_degree(u, G) == len(adj[u]) for u in members)
+
+
+@pytest.mark.parametrize("representation", ["dict", "csr"])
+def test_realize_clusters_matches_realize(representation, three_groups):
+    csr, rng = three_groups()
+    nodes = list(range(60))
+    rng.shuffle(nodes)
+    clusters = [IntangibleSubgraph(nodes[i:i + 12], str(i)) for i in range(0, 60, 12)]
+    clusters.append(IntangibleSubgraph([], "empty"))
+    for bulk, c in zip(realize_clusters(clusters, csr, representation), clusters):
+        one = c.realize(csr, representation)
+        assert type(bulk) is type(one) and bulk.index == one.index
+        assert {u: sorted(bulk.neighbors(u)) for u in bulk.nodes()} == {u: sorted(one.neighbors(u)) for u in one.nodes()}
+        assert (bulk.n(), bulk.m()) == (one.n(), one.m())
+
+
+@pytest.mark.parametrize("backend", ["networkit", "csr", "igraph"])
+def test_mincut_arrays_hold_every_edge_both_ways(backend, three_groups):
+    csr, _ = three_groups()
+    G = Graph.from_csr(csr, backend)
+    cluster = IntangibleSubgraph(list(range(0, 40)), "c")
+    graphs = [G]
+    for representation in ("dict", "csr"):
+        sub = cluster.realize(G, representation)
+        for u in (3, 17, 25):
+            sub.remove_node(u)
+        graphs.append(sub)
+
+    for g in graphs:
+        nodes, src, dst = g.mincut_arrays()
+        assert sorted(nodes.tolist()) == sorted(g.nodes())
+        assert sorted(zip(src.tolist(), dst.tolist())) == sorted((u, v) for u in g.nodes() for v in g.neighbors(u))
+    assert graphs[1].find_mincut("cactus")[-1] == graphs[2].find_mincut("cactus")[-1]
+
+
+def components(graph):
+    ''' The connected components of `graph` by a search from every node, as sorted lists '''
+    seen, found = set(), []
+    for start in sorted(graph.nodes()):
+        if start in seen:
+            continue
+        seen.add(start)
+        stack, component = [start], []
+        while stack:
+            u = stack.pop()
+            component.append(u)
+            for v in graph.neighbors(u):
+                if v not in seen:
+                    seen.add(v)
+                    stack.append(v)
+        found.append(sorted(component))
+    return found
+
+
+@pytest.mark.parametrize("representation", ["dict", "csr"])
+def test_split_components_gives_the_components(representation, three_groups):
+    csr, rng = three_groups()
+    G = Graph.from_csr(csr, "networkit")
+    for size in [1, 2, 5, 10, 20, 40]:
+        for _ in range(10):
+            sub = IntangibleSubgraph(rng.sample(range(60), size), "c").realize(G, representation)
+            expected = components(sub)
+            result = split_components(sub)
+            if len(expected) == 1:
+                assert result is None
+            else:
+                # From the smallest to the largest component, ties by their smallest node, then a cut of 0
+                assert result == sorted(expected, key=lambda c: (len(c), c[0])) + [0]
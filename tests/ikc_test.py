@@ -0,0 +1,33 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from hm01.clusterers.ikc_wrapper import IkcClusterer
+from hm01.graph import Graph, IntangibleSubgraph
+
+IKC = Path(__file__).parents[1] / "hm01" / "tools" / "ikc.py"
+
+
+def ikc_script(graph, k, directory):
+    ''' The clusters of graph as found by running tools/ikc.py on its compact edge list, as CM used to '''
+    edgelist, output = directory / "edgelist.tsv", directory / "ikc.csv"
+    edgelist.write_text("".join(f"{u}\t{v}\n" for u, v in graph.compact_edges()))
+    subprocess.run([sys.executable, str(IKC), "-e", str(edgelist), "-o", str(output), "-k", str(k), "-q"],
+                   check=True)
+    hydrator = {v: u for u, v in graph.continuous_ids.items()}
+    clusters = {}
+    for line in output.read_text().splitlines():
+        node, cluster, _, _ = line.split(",")
+        clusters.setdefault(cluster, []).append(hydrator[int(node)])
+    return [(graph.index + label, sorted(nodes)) for label, nodes in clusters.items()]
+
+
+@pytest.mark.parametrize("k", [2, 5])
+def test_in_process_ikc_matches_the_script(dataset, k):
+    graph = Graph.from_edgelist(str(dataset / "network.tsv"))
+    subgraph = IntangibleSubgraph(list(range(120, 181)), "g").realize(graph)
+    for g in (graph, subgraph):
+        clusters = [(c.index, sorted(c.subset)) for c in IkcClusterer(k).cluster(g)]
+        assert clusters == ikc_script(g, k, dataset)
@@ -0,0 +1,45 @@
+import pickle
+import random
+
+import numpy as np
+import pytest
+
+from hm01.graph import IntangibleSubgraph
+
+
+def write_clustering(path, seed, overlapping=False, offset=0):
+    ''' A shuffled "node cluster" file; with `overlapping`, some nodes are in two clusters '''
+    rng = random.Random(seed)
+    pairs = [(offset + u, f"c{rng.randrange(12)}") for u in range(300)]
+    if overlapping:
+        pairs += [(offset + u, f"c{rng.randrange(12)}") for u in rng.sample(range(300), 40)]
+    rng.shuffle(pairs)
+    path.write_text("".join(f"{u}\t{c}\n" for u, c in pairs))
+    return pairs
+
+
+@pytest.mark.parametrize("overlapping", [False, True])
+@pytest.mark.parametrize("offset", [0, 2**33])
+def test_from_assignment_file_matches_the_pairs(tmp_path, overlapping, offset):
+    path = tmp_path / "clustering.tsv"
+    pairs = write_clustering(path, seed=1, overlapping=overlapping, offset=offset)
+    expected = IntangibleSubgraph.from_assignment_pairs(iter(pairs))
+    clusters = IntangibleSubgraph.from_assignment_file(str(path))
+    assert clusters == expected
+    assert all(c.subset.dtype == (np.int32 if offset == 0 else np.int64) for c in clusters)
+    assert all(c._labels is None for c in clusters) == (overlapping or offset > 0)
+
+    # Membership through the shared labels, the fallback and a pickled copy all agree with the node sets,
+    # also for ids the clustering does not have, negative ones included
+    queries = np.arange(offset - 5, offset + 305, dtype=np.int64)
+    for c, e in zip(clusters, expected):
+        truth = np.array([u in set(e.subset) for u in queries.tolist()])
+        assert (c.contains(queries) == truth).all()
+        assert (pickle.loads(pickle.dumps(c)).contains(queries) == truth).all()
+        assert c.nodeset == set(e.subset)
+
+
+def test_from_assignment_file_of_an_empty_file(tmp_path):
+    path = tmp_path / "clustering.tsv"
+    path.write_text("")
+    assert IntangibleSubgraph.from_assignment_file(str(path)) == []
@@ -0,0 +1,64 @@
+import os
+import time
+
+import numpy as np
+
+from hm01.mincut_cache import STALE_TMP_SECONDS, MincutCache
+
+
+def edges(n):
+    ''' Both directions of every edge of a path on n nodes '''
+    src = np.arange(n - 1, dtype=np.int64)
+    return np.arange(n, dtype=np.int64), np.concatenate([src, src + 1]), np.concatenate([src + 1, src])
+
+
+def test_key_ignores_node_and_edge_order():
+    nodes, src, dst = edges(6)
+    order = np.random.default_rng(0).permutation(len(src))
+    assert MincutCache.key(nodes, src, dst, "noi") == MincutCache.key(nodes[::-1], src[order], dst[order], "noi")
+    assert MincutCache.key(nodes, src, dst, "noi") != MincutCache.key(nodes, src, dst, "cactus")
+    assert MincutCache.key(nodes, src, dst, "noi") != MincutCache.key(*edges(7), "noi")
+
+
+def test_put_then_get(tmp_path):
+    cache = MincutCache(str(tmp_path), 1 << 20)
+    key = MincutCache.key(*edges(6), "noi")
+    assert cache.get(key) is None
+    cache.put(key, [[0, 1, 2], [3, 4, 5], 1])
+    assert cache.get(key) == [[0, 1, 2], [3, 4, 5], 1]
+
+
+def test_evict_removes_least_recently_used_entries(tmp_path):
+    cache = MincutCache(str(tmp_path), 1 << 20)
+    keys = [MincutCache.key(*edges(n), "noi") for n in range(3, 9)]
+    for age, key in enumerate(reversed(keys)):
+        cache.put(key, [[0], [1], 1])
+        then = time.time() - 100 * (age + 1)
+        os.utime(cache.entry_path(key), (then, then))
+    size = os.path.getsize(cache.entry_path(keys[0]))
+    cache.get(keys[0])                          # the oldest entry is used again
+
+    cache.max_bytes = 2 * size
+    cache.evict()
+    assert [cache.get(key) is not None for key in keys] == [True, False, False, False, False, True]
+
+
+def test_evict_counts_and_removes_stale_temporary_files(tmp_path):
+    cache = MincutCache(str(tmp_path), 1 << 20)
+    key = MincutCache.key(*edges(6), "noi")
+    cache.put(key, [[0, 1, 2], [3, 4, 5], 1])
+    size = os.path.getsize(cache.entry_path(key))
+    stale = cache.entry_path(key) + ".12345.tmp"
+    live = cache.entry_path(key) + ".12346.tmp"
+    for path in (stale, live):
+        with open(path, "wb") as f:
+            f.write(b"\0" * size)
+    then = time.time() - STALE_TMP_SECONDS - 1
+    os.utime(stale, (then, then))
+
+    # The live temporary file counts towards the size, so the entry has to go
+    cache.max_bytes = size + size // 2
+    cache.evict()
+    assert not os.path.exists(stale)
+    assert os.path.exists(live)
+    assert cache.get(key) is None
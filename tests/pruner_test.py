@@ -0,0 +1,97 @@
+import random
+
+import numpy as np
+import pytest
+
+from hm01.clusterers.nop_clusterer import NopClusterer
+from hm01.graph import CSRGraph, IntangibleSubgraph
+from hm01.mincut_requirement import MincutRequirement
+from hm01.pruner import prune_clusters, prune_graph
+
+
+def random_clusters(seed, count=5):
+    ''' A few dense-ish clusters with low degree tails, and the graph they live in '''
+    rng = random.Random(seed)
+    edges, clusters, nid = set(), [], 0
+    for c in range(count):
+        size = rng.randint(5, 40)
+        nodes = list(range(nid, nid + size))
+        nid += size
+        p = rng.choice([0.1, 0.3, 0.6])
+        edges.update((a, b) for a in nodes for b in nodes if a < b and rng.random() < p)
+        clusters.append(IntangibleSubgraph(nodes, str(c)))
+    for _ in range(nid // 4):                       # a few edges between clusters
+        a, b = rng.randrange(nid), rng.randrange(nid)
+        if a != b:
+            edges.add((min(a, b), max(a, b)))
+    src, dst = (np.array(x, dtype=np.int64) for x in zip(*sorted(edges)))
+    return CSRGraph.from_edge_arrays(src, dst, nid), clusters
+
+
+def fresh(cluster):
+    ''' A copy of `cluster`; the realizations of one intangible subgraph share its node set '''
+    return IntangibleSubgraph(list(cluster.subset), cluster.index)
+
+
+def reference_prune(graph, requirement, clusterer):
+    ''' The pruning of CM done the plain way: remove a node of minimum degree until that degree is above the
+    threshold for the nodes left. Among ties, the node that has had its degree for the longest goes first,
+    then the smallest one. '''
+    if graph.mcd() > requirement.validity_threshold(clusterer, graph):
+        return 0
+    degrees = {u: graph.degree(u) for u in graph.nodes()}
+    since = dict.fromkeys(degrees, 0)
+    deleted = 0
+    while degrees:
+        node = min(degrees, key=lambda u: (degrees[u], since[u], u))
+        degree = degrees.pop(node)
+        if degree > requirement.validity_threshold(clusterer, graph, mcd_override=degree):
+            break
+        deleted += 1
+        for neighbor in graph.neighbors(node):
+            degrees[neighbor] -= 1
+            since[neighbor] = deleted
+        graph.remove_node(node)
+    graph.mcd.cache_clear()
+    return deleted
+
+@pytest.mark.parametrize("threshold", ["1log10", "2log10", "0.5mcd+1log10", "3", "5"])
+@pytest.mark.parametrize("representation", ["dict", "csr"])
+def test_prune_graph_breaks_ties_by_node_id(threshold, representation):
+    # A threshold that depends on the nodes left can stop the peeling partway through a degree
+    requirement, clusterer = MincutRequirement.try_from_str(threshold), NopClusterer()
+    for seed in range(20):
+        graph, clusters = random_clusters(seed)
+        for c in clusters:
+            expected = fresh(c).realize(graph, "dict")
+            expected_count = reference_prune(expected, requirement, clusterer)
+            pruned = fresh(c).realize(graph, representation)
+            assert prune_graph(pruned, requirement, clusterer) == expected_count
+            assert sorted(pruned.nodes()) == sorted(expected.nodes())
+
+@pytest.mark.parametrize("threshold", ["3", "5"])
+@pytest.mark.parametrize("representation", ["dict", "csr"])
+def test_prune_graph_matches_the_reference_for_constant_thresholds(threshold, representation):
+    # With a constant threshold the peeling is a k-core, which does not depend on the order of ties
+    requirement, clusterer = MincutRequirement.try_from_str(threshold), NopClusterer()
+    for seed in range(20):
+        graph, clusters = random_clusters(seed)
+        for c in clusters:
+            expected = fresh(c).realize(graph, "dict")
+            expected_count = reference_prune(expected, requirement, clusterer)
+            pruned = fresh(c).realize(graph, representation)
+            assert prune_graph(pruned, requirement, clusterer) == expected_count
+            assert sorted(pruned.nodes()) == sorted(expected.nodes())
+
+
+def test_prune_clusters_matches_prune_graph():
+    requirement, clusterer = MincutRequirement.try_from_str("1log10"), NopClusterer()
+    for seed in range(20):
+        graph, clusters = random_clusters(seed)
+        for c, result in zip(clusters, prune_clusters(clusters, graph, requirement, clusterer)):
+            sub = fresh(c).realize(graph, "csr")
+            mcd = sub.mcd()
+            if prune_graph(sub, requirement, clusterer) == 0:
+                assert result is None
+            else:
+                assert result[0] == mcd and result[1].tolist() == sorted(sub.nodes())
@@ -0,0 +1,27 @@
+import threading
+from multiprocessing import Pipe
+
+from hm01.coordinator import remote_config
+from hm01.remote_worker import run_session
+
+
+def test_remote_config_leaves_out_the_paths_of_the_coordinator():
+    config = {"working_dir": "network.tsv_working_dir", "mincut_cache": object(), "quiet": True}
+    assert remote_config(config) == {"working_dir": None, "mincut_cache": None, "quiet": True}
+
+
+def test_worker_without_the_clusterer_file_answers_every_task_with_an_error(tmp_path):
+    coordinator, worker = Pipe()
+    session = threading.Thread(target=run_session, args=(worker,))
+    session.start()
+    coordinator.send({"clusterer_source": (str(tmp_path / "clusterer.py"), "")})
+    kinds, errors = [], []
+    for task_id in range(2):
+        coordinator.send((task_id, [], {}))
+        kind, error = coordinator.recv()
+        kinds.append(kind)
+        errors.append(error)
+    coordinator.send(None)
+    session.join()
+    assert kinds == ["error", "error"]
+    assert all(isinstance(e, FileNotFoundError) and "clusterer.py" in str(e) for e in errors)
@@ -0,0 +1,47 @@
+from multiprocessing.pool import ThreadPool
+
+import networkit as nk
+import pytest
+
+from hm01.graph import Graph, IntangibleSubgraph
+from hm01.scheduler import order_by_cost, run_dynamic
+
+
+def countdown(n):
+    if n < 0:
+        raise ValueError("negative")
+    return n
+
+
+def test_run_dynamic_runs_follow_up_tasks():
+    seen = []
+
+    def on_result(n):
+        seen.append(n)
+        return [(n - 1,)] if n > 0 else None
+
+    with ThreadPool(2) as pool:
+        run_dynamic(pool, countdown, [(3,), (1,)], on_result)
+    assert sorted(seen) == [0, 0, 1, 1, 2, 3]
+
+
+def test_run_dynamic_raises_task_errors():
+    with ThreadPool(2) as pool:
+        with pytest.raises(ValueError):
+            run_dynamic(pool, countdown, [(2,), (-1,)], lambda n: None)
+
+
+def test_order_by_cost_puts_the_largest_clusters_first():
+    path = [(i, i + 1) for i in range(10, 19)]
+    clique = [(a, b) for a in range(20, 26) for b in range(a + 1, 26)]
+    nk_graph = nk.Graph(26)
+    for a, b in [(0, 1), (1, 2)] + path + clique:
+        nk_graph.addEdge(a, b)
+    graph = Graph.from_nk(nk_graph)
+    clusters = [
+        IntangibleSubgraph([0, 1, 2], "small"),
+        IntangibleSubgraph(list(range(10, 20)), "path"),
+        IntangibleSubgraph(list(range(20, 26)), "clique"),
+    ]
+    # 10 nodes and 9 edges cost more than 6 nodes and 15 edges, which cost more than a 3 node path
+    assert [c.index for c in order_by_cost(clusters, graph)] == ["path", "clique", "small"]
@@ -0,0 +1,37 @@
+import pickle
+import random
+
+import numpy as np
+
+from hm01.graph import CSRGraph
+from hm01.graph_store import compile_graph, load_csr
+from hm01.shared_graph import SharedGraph, attach
+
+
+def random_csr(seed):
+    rng = random.Random(seed)
+    edges = {(a, b) for a in range(60) for b in range(a + 1, 60) if rng.random() < 0.1}
+    src, dst = (np.array(x, dtype=np.int64) for x in zip(*sorted(edges)))
+    return CSRGraph.from_edge_arrays(src, dst, 60, "g")
+
+
+def assert_same_csr(graph, expected):
+    assert graph.offsets.tolist() == expected.offsets.tolist()
+    assert graph.neighbors_arr.tolist() == expected.neighbors_arr.tolist()
+
+
+def test_attach_sees_the_exported_graph():
+    graph = random_csr(0)
+    with SharedGraph(graph) as shared:
+        attached = attach(pickle.loads(pickle.dumps(shared.handle)))
+        assert attached.index == graph.index
+        assert_same_csr(attached, graph)
+        del attached                    # let go of the blocks before they are unlinked
+
+
+def test_compiled_graphs_are_shared_by_path(dataset):
+    path = str(dataset / "network.csr")
+    graph = compile_graph(str(dataset / "network.tsv"), path)
+    with SharedGraph(load_csr(path)) as shared:
+        assert shared.handle.store_path == path
+        assert_same_csr(attach(shared.handle), graph)